@@ -0,0 +1,66 @@
+"""Checks that every clickless_mouse_filter fires the clicks the unfiltered cursor does.
+
+    python .tools/filter_check.py
+    python .tools/filter_check.py --duration 300 --seed 3 --set clickless_mouse_stop_tolerance=1
+
+The clicks trace is replayed as replay.py does once per filter, with every
+other setting at its default unless overridden with --set. A filter may delay
+a stop, but on a trace without jitter it must not lose one: each filter has to
+inject as many left clicks as with no filter at all.
+"""
+import argparse
+import sys
+
+import harness, replay
+
+
+def run(kind, duration, seed, overrides):
+    module, talon = harness.load_clickless_mouse()
+    harness.apply_settings(talon, overrides)
+    samples = replay.synthetic_trace(
+        kind, duration, seed=seed, radius=talon.settings.get("user.clickless_mouse_radius")
+    )
+    report = replay.Replay(module, talon).run(samples)
+    return report["events"].get("click_0", 0), report["states_entered"].get("DISPLAYING_OPTIONS", 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--synthetic", default="clicks", choices=["clicks", "flicks"], help="trace to replay"
+    )
+    parser.add_argument("--duration", type=float, default=60.0, help="trace length (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override a setting in every run, e.g. clickless_mouse_stop_tolerance=1",
+    )
+    args = parser.parse_args(argv)
+
+    overrides = dict(harness.parse_setting(text) for text in args.set)
+    engine_module = harness.import_module("clickless_mouse_engine")
+    expected = None
+    failed = False
+    for name in engine_module.position_filters:
+        clicks, displays = run(
+            args.synthetic, args.duration, args.seed, dict(overrides, clickless_mouse_filter=name)
+        )
+        if expected is None:
+            expected = clicks
+        missed = clicks < expected or clicks == 0
+        failed = failed or missed
+        print(
+            "{:<9} {:>4} displays {:>4} clicks  {}".format(
+                name, displays, clicks, "missed {}".format(expected - clicks) if missed else "ok"
+            )
+        )
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Loads clickless_mouse.py outside of Talon, against the fakes in .tools/stubs.
+
+The repository directory is mounted as a package named `user`, the same way
+Talon exposes the user directory, so relative imports behave as they do in
+Talon. The tools live in a hidden directory, which Talon doesn't load, and
+are run as scripts, e.g. `python .tools/replay.py`; the fakes are only found
+through the path install_stubs adds.
+"""
+import importlib
+import os
+import sys
+import types
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+STUBS_DIR = os.path.join(TOOLS_DIR, "stubs")
+PACKAGE = "user"
+
+
+def install_stubs():
+    """Makes `import talon` resolve to the headless fakes and returns them"""
+    if STUBS_DIR not in sys.path:
+        sys.path.insert(0, STUBS_DIR)
+    import talon
+
+    return talon
+
+
+def unload_clickless_mouse():
+    for name in [name for name in sys.modules if name == PACKAGE or name.startswith(PACKAGE + ".")]:
+        del sys.modules[name]
+
+
+def mount_package():
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [REPO_DIR]
+        sys.modules[PACKAGE] = package
+
+
+def import_module(name):
+    """Imports a module of the repository that doesn't need talon, such as
+    clickless_mouse_trace"""
+    mount_package()
+    return importlib.import_module(PACKAGE + "." + name)
+
+
+def load_clickless_mouse(reset=True):
+    """Imports a fresh copy of clickless_mouse.py and points its clock at the
+    virtual one. Returns (module, talon)."""
+    talon = install_stubs()
+    if reset:
+        talon.reset()
+
+    unload_clickless_mouse()
+    mount_package()
+
+    module = importlib.import_module(PACKAGE + ".clickless_mouse")
+    module.time = talon.clock
+    return module, talon
+
+
+def apply_settings(talon, overrides):
+    """Applies {"clickless_mouse_radius": 25, ...} style overrides"""
+    for name, value in overrides.items():
+        if not name.startswith("user."):
+            name = "user." + name
+        talon.settings.set(name, value)
+
+
+def engine_settings(overrides):
+    """An engine_settings with {"clickless_mouse_radius": 25, ...} style
+    overrides, for running the engine without loading talon"""
+    engine = import_module("clickless_mouse_engine")
+    s = engine.engine_settings()
+    for name, value in overrides.items():
+        name = name[len("user.") :] if name.startswith("user.") else name
+        name = name[len("clickless_mouse_") :]
+        if name == "filter":
+            name = "position_filter"
+        elif name == "layout":
+            value = engine.parse_layout(value)
+        setattr(s, name, value)
+    return s
+
+
+def parse_setting(text):
+    """Parses name=value from the command line, keeping ints as ints"""
+    name, _, value = text.partition("=")
+    for convert in (int, float):
+        try:
+            return name.strip(), convert(value)
+        except ValueError:
+            pass
+    return name.strip(), value.strip()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
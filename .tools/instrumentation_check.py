@@ -0,0 +1,80 @@
+"""Checks that clickless_mouse_instrumentation times each dwell once.
+
+    python .tools/instrumentation_check.py
+    python .tools/instrumentation_check.py --synthetic scroll --duration 120
+
+Each trace is replayed as replay.py does with instrumentation enabled.
+Scrolling and ka fire on every step while hovered, but only the first firing
+completes a dwell: the dwell complete -> action timings must count every
+hover that fired an action exactly once, and none may take longer than a
+dwell time.
+"""
+import argparse
+import sys
+
+import harness, replay
+
+
+def run(kind, duration, seed, overrides):
+    module, talon = harness.load_clickless_mouse()
+    harness.apply_settings(talon, dict(overrides, clickless_mouse_instrumentation=1))
+    samples = replay.synthetic_trace(
+        kind, duration, seed=seed, radius=talon.settings.get("user.clickless_mouse_radius")
+    )
+
+    # every hover that fired, by when it started
+    hovers = set()
+    perform_action = module.clickless_mouse.perform_action
+
+    def perform_action_counted(cm, s, action, x, y):
+        buttons = cm.engine.buttons
+        if buttons.hit_index >= 0 and buttons.actions[buttons.hit_index] == action:
+            hovers.add(buttons.last_hit_times[buttons.hit_index])
+        return perform_action(cm, s, action, x, y)
+
+    module.clickless_mouse.perform_action = perform_action_counted
+    report = replay.Replay(module, talon).run(samples)
+    return len(hovers), report["dwell_to_action"], talon.settings.get("user.clickless_mouse_dwell_time")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--synthetic",
+        action="append",
+        choices=["clicks", "flicks", "scroll", "rest", "tremor"],
+        help="traces to replay, clicks and scroll by default",
+    )
+    parser.add_argument("--duration", type=float, default=30.0, help="trace length (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override a setting, e.g. clickless_mouse_dwell_time=0.4",
+    )
+    args = parser.parse_args(argv)
+
+    overrides = dict(harness.parse_setting(text) for text in args.set)
+    failed = False
+    for kind in args.synthetic or ["clicks", "scroll"]:
+        hovers, timing, dwell_time = run(kind, args.duration, args.seed, overrides)
+        problems = []
+        if timing["count"] != hovers:
+            problems.append("{} timings for {} hovers".format(timing["count"], hovers))
+        if timing["max_ms"] > dwell_time * 1000:
+            problems.append("longer than the dwell time")
+        failed = failed or bool(problems)
+        print(
+            "{:<7} {:>4} hovers fired {:>4} timed  mean={:.1f}ms max={:.1f}ms  {}".format(
+                kind, hovers, timing["count"], timing["mean_ms"], timing["max_ms"], ", ".join(problems) or "ok"
+            )
+        )
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
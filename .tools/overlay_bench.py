@@ -0,0 +1,274 @@
+"""Draws the options in every layout case and measures what each frame costs.
+
+    python .tools/overlay_bench.py
+    python .tools/overlay_bench.py --radius 15 --radius 40 --set clickless_mouse_sprite_cache=0
+    python .tools/overlay_bench.py --update-goldens
+
+Each session holds the cursor still at one point of a grid over the screen,
+which covers every layout case (corners, edges and the middle), until the
+options are displayed, then hovers each button in turn for half its dwell
+time. Every frame that leaves on screen is drawn through the draw callback
+into render.py's recording canvas, and reported per session:
+
+calls:  draw calls per frame, the blits of sprites included
+paint:  assignments to the paint per frame, and how many of them set a value
+        that was already set
+time:   the median time to draw a frame, on the plain headless canvas
+diff:   pixels that differ from the golden image of the session by more than
+        --tolerance in any channel
+
+The golden images are PNGs in .tools/goldens, one per session, with the frames
+stacked from top to bottom. They are rasterized by render.py, which needs
+NumPy; without it, only calls, paint and time are reported. Sprites and
+direct drawing must give the same pixels, so both are compared against the
+same images. Settings changing the look of the options need new goldens.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import harness, render
+
+GOLDEN_DIR = os.path.join(harness.TOOLS_DIR, "goldens")
+
+# cursor positions, covering the corners, the edges and the middle of the
+# 1920x1080 screen of the fakes
+POSITIONS = tuple((x, y) for y in (10, 540, 1070) for x in (10, 960, 1910))
+
+RADII = (15, 30)
+
+# a session must not fire, hide or learn anything on its own
+SESSION_SETTINGS = {
+    "clickless_mouse_auto_hide": 0,
+    "clickless_mouse_auto_tune": 0,
+    "clickless_mouse_flick": 0,
+    "clickless_mouse_instrumentation": 0,
+}
+
+# how far (s) the virtual clock moves per step while waiting
+STEP = 0.008
+
+# pixels left around the buttons in the golden images
+MARGIN = 4
+
+
+def layout_cases(cm):
+    """The name of the layout case displayed, and of every case there is"""
+    engine = cm.engine
+    table = engine.layout_for(cm.settings_cache.get(), engine.screen)
+    template = table.select(engine.x - engine.screen.x, engine.y - engine.screen.y)
+    return template.name, [case.name for case in table.cases]
+
+
+def wait_until(talon, condition, seconds):
+    end = talon.clock.now + seconds
+    while talon.clock.now < end:
+        talon.cron.advance(STEP)
+        if condition():
+            return True
+    return condition()
+
+
+def frame_window(frame):
+    """The part of the screen (x, y, width, height) the options are drawn in"""
+    reach = frame.radius + frame.stroke_width + MARGIN
+    xs = [frame.x] + [bx for bx, _by, _action in frame.buttons]
+    ys = [frame.y] + [by for _bx, by, _action in frame.buttons]
+    left = max(0, int(min(xs) - reach))
+    top = max(0, int(min(ys) - reach))
+    right = min(1920, int(max(xs) + reach) + 1)
+    bottom = min(1080, int(max(ys) + reach) + 1)
+    return left, top, right - left, bottom - top
+
+
+def time_frame(cm, talon, repeat):
+    canvas = talon.SkiaCanvas(None)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cm.draw(canvas)
+        times.append(time.perf_counter() - start)
+    return harness.percentile(sorted(times), 0.5)
+
+
+def session(x, y, radius, overrides, repeat, directory):
+    """Displays the options at (x, y) and hovers each button. Returns the
+    session's layout case, its recorded frames and what they cost."""
+    module, talon = harness.load_clickless_mouse()
+    module.Surface = render.recording_surface(talon)
+    harness.apply_settings(
+        talon,
+        dict(
+            SESSION_SETTINGS,
+            clickless_mouse_radius=radius,
+            clickless_mouse_auto_tune_path=os.path.join(directory, "tuning.json"),
+            **overrides
+        ),
+    )
+    # the options follow a stop, so the cursor comes from nearby
+    talon.ctrl.x, talon.ctrl.y = x + 50 if x < 960 else x - 50, y
+    talon.actions.user.clickless_mouse_enable()
+    cm = module.cm
+    talon.cron.advance(0.1)
+    talon.ctrl.x, talon.ctrl.y = x, y
+
+    result = {"frames": [], "times": [], "problems": []}
+
+    def capture(label):
+        canvas = render.recording_canvas(talon)
+        cm.draw(canvas)
+        result["frames"].append((label, cm.frame, canvas))
+        result["times"].append(time_frame(cm, talon, repeat))
+
+    displayed = wait_until(talon, lambda: cm.state == module.STATE_DISPLAYING_OPTIONS, 5.0)
+    if not displayed or cm.frame is None:
+        result["problems"].append("the options were never displayed")
+        talon.actions.user.clickless_mouse_disable()
+        return result
+
+    result["layout"], result["cases"] = layout_cases(cm)
+    capture("displayed")
+    for index, (bx, by, action) in enumerate(cm.frame.buttons):
+        talon.ctrl.x, talon.ctrl.y = bx, by
+        if not wait_until(talon, lambda: cm.frame is not None and cm.frame.hit_index == index, 1.0):
+            result["problems"].append("hovering {} was not noticed".format(action))
+            continue
+        hovered = talon.clock.now
+        wait_until(talon, lambda: cm.frame is None or talon.clock.now >= hovered + cm.frame.dwell_time / 2, 5.0)
+        if cm.frame is None or cm.frame.hit_index != index:
+            result["problems"].append("hovering {} didn't last half its dwell".format(action))
+            continue
+        capture(action)
+
+    talon.actions.user.clickless_mouse_disable()
+    return result
+
+
+def rasterize(numpy, frames):
+    """The frames of a session stacked into one 8 bit RGBA image"""
+    left, top, width, height = frame_window(frames[0][1])
+    images = []
+    for _label, _frame, canvas in frames:
+        buffer = render.raster(numpy, left, top, width, height)
+        buffer.draw(canvas.ops)
+        images.append(buffer.rgba())
+    return numpy.concatenate(images, axis=0)
+
+
+def compare(numpy, image, path, tolerance):
+    """The number of pixels differing from the golden image, or None if there
+    is none"""
+    if not os.path.exists(path):
+        return None
+    golden = render.read_png(numpy, path)
+    if golden.shape != image.shape:
+        return max(golden.shape[0] * golden.shape[1], image.shape[0] * image.shape[1])
+    difference = numpy.abs(golden.astype(int) - image.astype(int)).max(axis=2)
+    return int((difference > tolerance).sum())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--radius", type=int, action="append", help="radii to draw at, {} by default".format(RADII))
+    parser.add_argument("--repeat", type=int, default=200, help="draws timed per frame")
+    parser.add_argument("--tolerance", type=int, default=2, help="channel difference still counted as equal")
+    parser.add_argument("--update-goldens", action="store_true", help="write the golden images instead")
+    parser.add_argument("--output", metavar="DIR", help="also write the rendered images here")
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override a setting, e.g. clickless_mouse_sprite_cache=0",
+    )
+    args = parser.parse_args(argv)
+
+    overrides = dict(harness.parse_setting(text) for text in args.set)
+    numpy = harness.import_module("clickless_mouse_engine").load_numpy()
+    if numpy is None:
+        if args.update_goldens:
+            sys.exit("writing golden images needs numpy")
+        print("numpy is not installed, pixels are not compared")
+    for directory in (args.output, GOLDEN_DIR if args.update_goldens else None):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    print(
+        "{:<12} {:>9} {:>6} {:>6} {:>6} {:>13} {:>9} {:>8}".format(
+            "layout", "cursor", "radius", "frames", "calls", "paint/same", "time us", "diff px"
+        )
+    )
+    failures = []
+    layouts = set()
+    cases = []
+    all_calls = []
+    all_times = []
+    for radius in args.radius or RADII:
+        for x, y in POSITIONS:
+            with tempfile.TemporaryDirectory() as directory:
+                result = session(x, y, radius, overrides, max(1, args.repeat), directory)
+            name = "{}_{}_{}_r{}".format(result.get("layout", "none"), x, y, radius)
+            failures.extend("{}: {}".format(name, problem) for problem in result["problems"])
+            frames = result["frames"]
+            if not frames:
+                continue
+            layouts.add(result["layout"])
+            cases = result["cases"]
+
+            calls = [canvas.draw_calls for _label, _frame, canvas in frames]
+            paint = [canvas.paint_changes() for _label, _frame, canvas in frames]
+            all_calls.extend(calls)
+            all_times.extend(result["times"])
+
+            diff = "-"
+            if numpy is not None:
+                image = rasterize(numpy, frames)
+                golden = os.path.join(GOLDEN_DIR, name + ".png")
+                if args.output:
+                    render.write_png(os.path.join(args.output, name + ".png"), image)
+                if args.update_goldens:
+                    render.write_png(golden, image)
+                    diff = "written"
+                else:
+                    differing = compare(numpy, image, golden, args.tolerance)
+                    if differing is None:
+                        diff = "no golden"
+                        failures.append("{}: no golden image".format(name))
+                    else:
+                        diff = differing
+                        if differing:
+                            failures.append("{}: {} pixels differ".format(name, differing))
+
+            print(
+                "{:<12} {:>9} {:>6} {:>6} {:>6.1f} {:>6.1f}/{:<6.1f} {:>9.1f} {:>8}".format(
+                    result["layout"],
+                    "{},{}".format(x, y),
+                    radius,
+                    len(frames),
+                    sum(calls) / len(calls),
+                    sum(changes for changes, _same in paint) / len(paint),
+                    sum(same for _changes, same in paint) / len(paint),
+                    harness.percentile(sorted(result["times"]), 0.5) * 1000000,
+                    diff,
+                )
+            )
+
+    if all_calls:
+        print(
+            "{} frames: {:.1f} draw calls and {:.1f} us per frame (median)".format(
+                len(all_calls), sum(all_calls) / len(all_calls), harness.percentile(sorted(all_times), 0.5) * 1000000
+            )
+        )
+    missing = [name for name in cases if name not in layouts]
+    if missing:
+        failures.append("layout cases never drawn: {}".format(", ".join(missing)))
+    for failure in failures[:10]:
+        print("  FAILED: {}".format(failure))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
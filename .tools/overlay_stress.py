@@ -0,0 +1,184 @@
+"""Runs clickless_mouse.update and the overlay draw callback concurrently.
+
+    python .tools/overlay_stress.py --synthetic clicks --duration 60
+    python .tools/overlay_stress.py --synthetic scroll --set clickless_mouse_sprite_cache=0
+
+One thread replays a trace through update as replay.py does, while
+another calls the draw callback in a loop with a canvas that records what it
+draws, the way the compositor can call it at any time. Every drawn frame
+must match one overlay frame that update published as a whole: the cross,
+each button and the dwell progress circle. A frame mixing two displays, or
+drawn from a display that was already dismissed, counts as torn.
+
+The report also shows how many frames and button tuples were published,
+which should follow the displays and hovers, not the number of draws.
+"""
+import argparse
+import sys
+import threading
+
+import harness, render, replay
+
+
+def drawn_shape(canvas):
+    """What a render.recording_canvas was drawn with, in the form of
+    frame_shape, or None if nothing was drawn"""
+    lines = [entry.args for entry in canvas.ops if entry.kind == "line"]
+    if not lines:
+        return None
+
+    # button centers in the order drawn, and the progress circle
+    centers = []
+    progress = None
+    for kind, args, paint in canvas.ops:
+        if kind == "circle" and paint[0] == "00FF00":
+            progress = args[:2]
+            continue
+        elif kind == "circle":
+            center = args[:2]
+        elif kind == "text":
+            center = args[1:]
+        elif kind == "image":
+            image, x, y = args
+            center = (x + image.width / 2, y + image.height / 2)
+        else:
+            continue
+        if not centers or centers[-1] != center:
+            centers.append(center)
+
+    x1, y, _x2, _y2 = lines[0]
+    radius = lines[1][3] - y
+    return x1 + radius, y, tuple(centers), progress
+
+
+def frame_shape(frame):
+    """What a frame looks like once drawn"""
+    centers = tuple((bx, by) for bx, by, _action in frame.buttons)
+    progress = centers[frame.hit_index] if frame.hit_index >= 0 else None
+    return frame.x, frame.y, centers, progress
+
+
+class stress:
+    def __init__(self, module, talon):
+        self.module = module
+        self.talon = talon
+        self.cm = module.controller()
+        self.shapes = set()
+        self.displays = 0
+        self.published = 0
+        # shape -> number of times it was drawn
+        self.drawn = {}
+        self.empty_draws = 0
+        self.torn = []
+        self.done = threading.Event()
+
+        cm = self.cm
+        publish_frame = cm.publish_frame
+        publish_hit = cm.publish_hit
+
+        def record(publish, new_display):
+            def recorded(s):
+                before = cm.frame
+                publish(s)
+                frame = cm.frame
+                if frame is not before:
+                    self.shapes.add(frame_shape(frame))
+                    self.published += 1
+                    if new_display:
+                        self.displays += 1
+                    elif frame.buttons is not before.buttons:
+                        raise AssertionError("a hover copied the buttons")
+
+            return recorded
+
+        cm.publish_frame = record(publish_frame, True)
+        cm.publish_hit = record(publish_hit, False)
+
+    def draw_loop(self):
+        while not self.done.is_set():
+            canvas = render.recording_canvas(self.talon)
+            self.cm.draw(canvas)
+            shape = drawn_shape(canvas)
+            if shape is None:
+                self.empty_draws += 1
+                continue
+            self.drawn[shape] = self.drawn.get(shape, 0) + 1
+
+    def run(self, samples):
+        run = replay.Replay(self.module, self.talon)
+        # the draw thread is the only one drawing
+        run._render = lambda: None
+        drawer = threading.Thread(target=self.draw_loop)
+        drawer.start()
+        try:
+            run.run(samples)
+        finally:
+            self.done.set()
+            drawer.join()
+
+        # checked afterwards: a frame can be drawn before the wrapper above
+        # has noted it
+        self.torn = [shape for shape in self.drawn if shape not in self.shapes]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--synthetic",
+        default="clicks",
+        choices=["clicks", "scroll", "tremor", "wander"],
+        help="the trace to replay",
+    )
+    parser.add_argument("--duration", type=float, default=60.0, help="trace length (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--switch-interval",
+        type=float,
+        default=1e-6,
+        help="the interpreter's thread switch interval (s) while running; smaller switches more often",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override a setting, e.g. clickless_mouse_sprite_cache=0",
+    )
+    args = parser.parse_args(argv)
+
+    module, talon = harness.load_clickless_mouse()
+    harness.apply_settings(talon, dict(harness.parse_setting(text) for text in args.set))
+    samples = replay.synthetic_trace(
+        args.synthetic,
+        args.duration,
+        seed=args.seed,
+        radius=talon.settings.get("user.clickless_mouse_radius"),
+    )
+
+    test = stress(module, talon)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(args.switch_interval)
+    try:
+        test.run(samples)
+    finally:
+        sys.setswitchinterval(interval)
+
+    print(
+        "{} frames drawn, {} draws with nothing displayed".format(
+            sum(test.drawn.values()), test.empty_draws
+        )
+    )
+    print(
+        "{} frames published over {} displays, buttons copied once per display".format(
+            test.published, test.displays
+        )
+    )
+    print("{} torn frames".format(sum(test.drawn[shape] for shape in test.torn)))
+    for shape in test.torn[:5]:
+        print("  torn: {}".format(shape))
+    if test.torn:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Reloads clickless_mouse.py over and over and checks that nothing piles up.
+
+    python .tools/reload_check.py
+    python .tools/reload_check.py --cycles 200 --no-teardown
+
+Talon runs clickless_mouse.py again every time it is saved. Each cycle here
+imports a fresh copy the same way, against the same fakes, enables it and
+moves the cursor until the options are displayed, then leaves it running
+for the next import to find. Every third cycle disables it instead, and
+checks that user.clickless_mouse_resources() is all zero afterwards; every
+tenth runs clickless_mouse_worker.
+
+Right after each import, the fakes must hold no cron job, canvas, callback
+or thread of the copies before it, and the memory still allocated must not
+grow once the first cycles are past. --no-teardown hides the previous copy
+from the new one, to show what it would leave behind.
+"""
+import argparse
+import gc
+import sys
+import threading
+import time
+import tracemalloc
+
+import harness
+
+# cycles run before the memory baseline is taken, for caches to fill
+WARM_UP = 30
+
+# the cycles repeat what they do every this many, memory is compared between
+# cycles at the same point
+PERIOD = 30
+
+# the memory growth (KiB) over the rest of the cycles that still counts as flat
+MEMORY_SLACK = 64
+
+# the module the tracker of the running copy is kept in
+RUNNING = "clickless_mouse_running"
+
+
+def held(talon):
+    """What the fakes hold on behalf of any copy of the module"""
+
+    def registered(registry):
+        return sum(len(callbacks) for callbacks in registry.callbacks.values())
+
+    return {
+        "cron_jobs": len(talon.cron.jobs),
+        "canvases": len(talon.Canvas.open_canvases),
+        "callbacks": registered(talon.settings)
+        + registered(talon.ui)
+        + len(talon.tap.callbacks)
+        + sum(registered(mcanvas) for mcanvas in talon.Canvas.open_canvases),
+        "threads": threading.active_count() - 1,
+    }
+
+
+def display_options(module, talon, number, threaded):
+    """Moves the cursor and waits until the options are displayed. The worker
+    thread waits in real time, so the virtual clock is held to it."""
+    talon.ctrl.x = 300 + number % 7 * 150
+    talon.ctrl.y = 300 + number % 5 * 100
+    for _ in range(200):
+        if threaded:
+            time.sleep(0.016)
+        talon.cron.advance(0.016)
+        for mcanvas in list(talon.Canvas.open_canvases):
+            mcanvas.render()
+        if module.cm.state == module.STATE_DISPLAYING_OPTIONS:
+            return True
+    return False
+
+
+def cycle(number, teardown):
+    if not teardown:
+        sys.modules.pop(RUNNING, None)
+    module, talon = harness.load_clickless_mouse(reset=False)
+    leftover = held(talon)
+
+    talon.events.clear()
+    threaded = number % 10 == 9
+    harness.apply_settings(talon, {"clickless_mouse_worker": 1 if threaded else 0})
+    talon.actions.user.clickless_mouse_enable()
+    displayed = display_options(module, talon, number, threaded)
+
+    released = None
+    if number % 3 == 2:
+        talon.actions.user.clickless_mouse_disable()
+        released = talon.actions.user.clickless_mouse_resources()
+    return leftover, displayed, released
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cycles", type=int, default=1000, help="reloads to run")
+    parser.add_argument(
+        "--no-teardown",
+        dest="teardown",
+        action="store_false",
+        help="don't let a new copy find the running one",
+    )
+    args = parser.parse_args(argv)
+
+    talon = harness.install_stubs()
+    talon.reset()
+    failures = []
+    worst = {}
+    # (cycle, KiB allocated after it)
+    memory = []
+
+    tracemalloc.start()
+    cycles = max(WARM_UP + PERIOD + 1, args.cycles)
+    for number in range(cycles):
+        leftover, displayed, released = cycle(number, args.teardown)
+        if not displayed:
+            failures.append("cycle {}: the options were never displayed".format(number))
+        if released and any(released.values()):
+            failures.append("cycle {}: still held after disable: {}".format(number, released))
+        for name, count in leftover.items():
+            worst[name] = max(worst.get(name, 0), count)
+
+        if number >= WARM_UP and (number - WARM_UP) % PERIOD == 0:
+            gc.collect()
+            memory.append((number, tracemalloc.get_traced_memory()[0] / 1024))
+    tracemalloc.stop()
+    harness.load_clickless_mouse(reset=False)
+    final = held(talon)
+
+    (first, baseline), (last, allocated) = memory[0], memory[-1]
+    growth = allocated - baseline
+    print("{} reloads".format(cycles))
+    print("  most held by earlier copies after a reload: {}".format(worst))
+    print("  held after the last reload: {}".format(final))
+    print(
+        "  memory {:.1f} KiB after cycle {}, {:.1f} KiB after cycle {} ({:+.1f} KiB)".format(
+            baseline, first, allocated, last, growth
+        )
+    )
+
+    if any(worst.values()) or any(final.values()):
+        failures.append("resources of earlier copies were left behind")
+    if growth > MEMORY_SLACK:
+        failures.append("memory grew by {:.1f} KiB".format(growth))
+    for failure in failures[:10]:
+        print("  FAILED: {}".format(failure))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
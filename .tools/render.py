@@ -0,0 +1,300 @@
+"""A canvas that records what the overlay draws, and an optional rasterizer.
+
+recording_canvas stands in for the skia canvas passed to draw callbacks. It
+keeps every draw call, with the paint state it was drawn with, and every
+assignment to the paint, in the order they were issued. recording_surface
+does the same for the offscreen surfaces sprites are rendered into, so a
+drawn image still knows what is in it.
+
+raster composites the recorded calls into a NumPy RGBA buffer, so frames can
+be compared pixel by pixel. It approximates skia rather than matching it:
+edges are antialiased by their distance to the pixel center, and text, for
+which there is no font, is drawn as a box the size of the string. It takes
+numpy as an argument, from clickless_mouse_engine.load_numpy.
+"""
+import collections
+import struct
+import zlib
+
+# what a recording is made of. kind is "line", "circle", "text", "rect" or
+# "image" with the arguments of the draw call and the paint state it was
+# drawn with, or "paint" with (name, value, previous value) and no state
+op = collections.namedtuple("op", ("kind", "args", "paint"))
+
+# the paint attributes the overlay sets, in the order a paint state lists them
+PAINT_FIELDS = ("color", "style", "stroke_width", "textsize", "text_align")
+
+
+class recording_paint:
+    """A paint that logs every assignment to the canvas it belongs to"""
+
+    def __init__(self, base, ops):
+        object.__setattr__(self, "Style", base.Style)
+        object.__setattr__(self, "TextAlign", base.TextAlign)
+        object.__setattr__(self, "_ops", ops)
+        for name in PAINT_FIELDS:
+            object.__setattr__(self, name, getattr(base, name))
+
+    def __setattr__(self, name, value):
+        self._ops.append(op("paint", (name, value, getattr(self, name, None)), None))
+        object.__setattr__(self, name, value)
+
+    def state(self):
+        return tuple(getattr(self, name) for name in PAINT_FIELDS)
+
+
+class recording_canvas:
+    """Stands in for the skia canvas, keeping every call made to it"""
+
+    def __init__(self, talon, rect=None):
+        self.rect = rect
+        self.ops = []
+        self.paint = recording_paint(talon.SkiaCanvas(rect).paint, self.ops)
+        self.draw_calls = 0
+
+    def add(self, kind, *args):
+        self.ops.append(op(kind, args, self.paint.state()))
+        self.draw_calls += 1
+
+    def draw_line(self, x1, y1, x2, y2):
+        self.add("line", x1, y1, x2, y2)
+
+    def draw_circle(self, x, y, radius):
+        self.add("circle", x, y, radius)
+
+    def draw_text(self, text, x, y):
+        self.add("text", text, x, y)
+
+    def draw_rect(self, rect):
+        self.add("rect", rect)
+
+    def draw_image(self, image, x, y):
+        self.add("image", image, x, y)
+
+    def paint_changes(self):
+        """(assignments, assignments that didn't change the value)"""
+        changes = [entry for entry in self.ops if entry.kind == "paint"]
+        return len(changes), sum(1 for entry in changes if entry.args[1] == entry.args[2])
+
+
+class recorded_image:
+    def __init__(self, width, height, ops, draw_calls):
+        self.width = width
+        self.height = height
+        self.ops = ops
+        self.draw_calls = draw_calls
+
+
+def recording_surface(talon):
+    """A Surface class whose snapshots keep what was drawn into them, to
+    replace the one clickless_mouse.py imported"""
+
+    class surface:
+        def __init__(self, width, height):
+            self.width = width
+            self.height = height
+            self._canvas = recording_canvas(talon, talon.Rect(0, 0, width, height))
+
+        def canvas(self):
+            return self._canvas
+
+        def snapshot(self):
+            canvas = self._canvas
+            return recorded_image(self.width, self.height, list(canvas.ops), canvas.draw_calls)
+
+    return surface
+
+
+def parse_color(text):
+    """"RRGGBB" or "RRGGBBAA" to four floats from 0 to 1"""
+    if len(text) == 6:
+        text += "ff"
+    return tuple(int(text[i : i + 2], 16) / 255 for i in range(0, 8, 2))
+
+
+class raster:
+    """Composites recorded calls into a premultiplied RGBA buffer covering the
+    rectangle (x, y, width, height) of the screen"""
+
+    # text is drawn as a box this wide per character and this tall, in
+    # multiples of the text size, with its bottom on the baseline
+    TEXT_WIDTH = 0.55
+    TEXT_HEIGHT = 0.7
+
+    def __init__(self, numpy, x, y, width, height):
+        self.np = numpy
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.pixels = numpy.zeros((height, width, 4))
+
+    def draw(self, ops, dx=0.0, dy=0.0, clip=None):
+        for entry in ops:
+            kind, args, paint = entry
+            if kind == "line":
+                x1, y1, x2, y2 = args
+                self.line(x1 + dx, y1 + dy, x2 + dx, y2 + dy, paint, clip)
+            elif kind == "circle":
+                x, y, radius = args
+                self.circle(x + dx, y + dy, radius, paint, clip)
+            elif kind == "text":
+                text, x, y = args
+                self.text(text, x + dx, y + dy, paint, clip)
+            elif kind == "rect":
+                rect = args[0]
+                self.box(rect.x + dx, rect.y + dy, rect.x + rect.width + dx, rect.y + rect.height + dy, paint, clip)
+            elif kind == "image":
+                image, x, y = args
+                left, top = x + dx, y + dy
+                bounds = (left, top, left + image.width, top + image.height)
+                # images from the stub surface don't know what is in them
+                self.draw(getattr(image, "ops", ()), left, top, intersect(bounds, clip))
+
+    def grid(self, left, top, right, bottom, clip):
+        """The pixel centers (screen coordinates) of the pixels a shape with
+        these bounds can touch, and where they start in the buffer"""
+        if clip is not None:
+            left, top, right, bottom = intersect((left, top, right, bottom), clip)
+        np = self.np
+        x0 = max(0, int(np.floor(left)) - self.x)
+        y0 = max(0, int(np.floor(top)) - self.y)
+        x1 = min(self.width, int(np.ceil(right)) - self.x)
+        y1 = min(self.height, int(np.ceil(bottom)) - self.y)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        xs = np.arange(x0, x1) + self.x + 0.5
+        ys = np.arange(y0, y1) + self.y + 0.5
+        return x0, y0, xs[None, :], ys[:, None]
+
+    def blend(self, x0, y0, coverage, color):
+        red, green, blue, alpha = parse_color(color)
+        alpha = self.np.clip(coverage, 0.0, 1.0) * alpha
+        height, width = alpha.shape
+        region = self.pixels[y0 : y0 + height, x0 : x0 + width]
+        region *= (1.0 - alpha)[..., None]
+        region += alpha[..., None] * (red, green, blue, 1.0)
+
+    def line(self, x1, y1, x2, y2, paint, clip):
+        color, _style, stroke_width = paint[:3]
+        half = max(stroke_width, 1) / 2
+        pad = half + 1
+        area = self.grid(min(x1, x2) - pad, min(y1, y2) - pad, max(x1, x2) + pad, max(y1, y2) + pad, clip)
+        if area is None:
+            return
+        x0, y0, xs, ys = area
+        np = self.np
+        dx, dy = x2 - x1, y2 - y1
+        length = max(np.hypot(dx, dy), 1e-9)
+        # along the line from its start, and away from it
+        along = ((xs - x1) * dx + (ys - y1) * dy) / length
+        across = np.abs((xs - x1) * dy - (ys - y1) * dx) / length
+        # butt ends, as skia draws lines by default
+        ends = np.clip(np.minimum(along, length - along) + 0.5, 0.0, 1.0)
+        self.blend(x0, y0, np.clip(half + 0.5 - across, 0.0, 1.0) * ends, color)
+
+    def circle(self, x, y, radius, paint, clip):
+        color, style, stroke_width = paint[:3]
+        half = max(stroke_width, 1) / 2
+        pad = radius + half + 1
+        area = self.grid(x - pad, y - pad, x + pad, y + pad, clip)
+        if area is None:
+            return
+        x0, y0, xs, ys = area
+        distance = self.np.hypot(xs - x, ys - y)
+        if style == "stroke":
+            coverage = half + 0.5 - self.np.abs(distance - radius)
+        elif style == "stroke_and_fill":
+            coverage = radius + half + 0.5 - distance
+        else:
+            coverage = radius + 0.5 - distance
+        self.blend(x0, y0, coverage, color)
+
+    def text(self, text, x, y, paint, clip):
+        color, _style, _stroke_width, textsize, text_align = paint
+        width = len(text) * textsize * self.TEXT_WIDTH
+        if text_align == "center":
+            x -= width / 2
+        elif text_align == "right":
+            x -= width
+        self.box(x, y - textsize * self.TEXT_HEIGHT, x + width, y, paint, clip)
+
+    def box(self, left, top, right, bottom, paint, clip):
+        area = self.grid(left, top, right, bottom, clip)
+        if area is None:
+            return
+        x0, y0, xs, ys = area
+        inside = (xs >= left) & (xs < right) & (ys >= top) & (ys < bottom)
+        self.blend(x0, y0, inside.astype(float), paint[0])
+
+    def rgba(self):
+        """The buffer as straight alpha 8 bit RGBA"""
+        np = self.np
+        alpha = self.pixels[..., 3:]
+        rgb = np.divide(self.pixels[..., :3], alpha, out=np.zeros_like(self.pixels[..., :3]), where=alpha > 0)
+        pixels = np.concatenate((rgb, alpha), axis=2)
+        return np.rint(np.clip(pixels, 0.0, 1.0) * 255).astype(np.uint8)
+
+
+def intersect(a, b):
+    if b is None:
+        return a
+    return max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def write_png(path, pixels):
+    """Writes an 8 bit RGBA array, each row filtered by the one above it"""
+    height, width = pixels.shape[:2]
+    rows = pixels.reshape(height, width * 4)
+    # the up filter: each byte minus the one above it, wrapping around
+    filtered = rows.copy()
+    filtered[1:] -= rows[:-1]
+    data = b"".join(b"\x02" + row.tobytes() for row in filtered)
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    with open(path, "wb") as f:
+        f.write(PNG_SIGNATURE)
+        f.write(png_chunk(b"IHDR", header))
+        f.write(png_chunk(b"IDAT", zlib.compress(data, 9)))
+        f.write(png_chunk(b"IEND", b""))
+
+
+def read_png(numpy, path):
+    """Reads a PNG written by write_png back into an 8 bit RGBA array"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("{} is not a PNG".format(path))
+
+    offset = len(PNG_SIGNATURE)
+    header = None
+    compressed = []
+    while offset < len(data):
+        (length,) = struct.unpack(">I", data[offset : offset + 4])
+        kind = data[offset + 4 : offset + 8]
+        body = data[offset + 8 : offset + 8 + length]
+        offset += 12 + length
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif kind == b"IDAT":
+            compressed.append(body)
+    if header is None or header[2:5] != (8, 6, 0) or header[6]:
+        raise ValueError("{} is not 8 bit RGBA without interlacing".format(path))
+
+    width, height = header[:2]
+    raw = numpy.frombuffer(zlib.decompress(b"".join(compressed)), numpy.uint8)
+    rows = raw.reshape(height, width * 4 + 1)
+    pixels = rows[:, 1:].copy()
+    for row in range(height):
+        kind = rows[row, 0]
+        if kind == 2 and row:
+            pixels[row] += pixels[row - 1]
+        elif kind not in (0, 2):
+            raise ValueError("{}: only the none and up filters are read".format(path))
+    return pixels.reshape(height, width, 4)
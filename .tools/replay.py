@@ -0,0 +1,337 @@
+"""Replays cursor traces through clickless_mouse.update without Talon.
+
+    python .tools/replay.py --synthetic clicks --duration 60
+    python .tools/replay.py --trace my_trace.csv --set clickless_mouse_dwell_time=0.4
+    python .tools/replay.py --synthetic tremor --json
+
+Traces are either binary traces recorded with user.clickless_mouse_trace_start
+or CSV files of `t,x,y` rows (seconds, pixels); the cursor stays at a
+sample's position until the next one. The report covers the latency of
+every cron callback, the number of cron wakeups, the state transitions of the state machine and the
+input events the module injected.
+"""
+import argparse
+import csv
+import json
+import math
+import random
+import time
+
+import harness
+
+STATE_NAMES = {0: "IDLE", 1: "MOVING", 2: "STOPPED", 3: "DISPLAYING_OPTIONS"}
+
+FRAME_INTERVAL = 1 / 60
+
+
+def load_trace(path):
+    """Loads a recorded binary trace or a CSV trace as (t, x, y) samples with
+    t relative to the first sample"""
+    clickless_mouse_trace = harness.import_module("clickless_mouse_trace")
+    if not clickless_mouse_trace.is_trace(path):
+        return load_csv_trace(path)
+
+    samples = []
+    origin = None
+    for t, x, y, _state, _action in clickless_mouse_trace.read_trace(path):
+        if origin is None:
+            origin = t
+        samples.append((t - origin, x, y))
+    return samples
+
+
+def load_csv_trace(path):
+    samples = []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().startswith("#"):
+                continue
+            try:
+                t, x, y = float(row[0]), float(row[1]), float(row[2])
+            except ValueError:
+                # header row
+                continue
+            samples.append((t, x, y))
+    return samples
+
+
+class _TraceBuilder:
+    def __init__(self, rate, x, y):
+        self.period = 1 / rate
+        self.t = 0.0
+        self.x = x
+        self.y = y
+        self.samples = [(0.0, x, y)]
+
+    def hold(self, seconds, jitter=0.0, rng=None):
+        end = self.t + seconds
+        while self.t + self.period <= end:
+            self.t += self.period
+            if jitter:
+                self.samples.append(
+                    (
+                        self.t,
+                        round(self.x + rng.uniform(-jitter, jitter)),
+                        round(self.y + rng.uniform(-jitter, jitter)),
+                    )
+                )
+            else:
+                self.samples.append((self.t, self.x, self.y))
+
+    def glide(self, x, y, seconds):
+        """Eased movement to (x, y), decelerating towards the target"""
+        x0, y0 = self.x, self.y
+        steps = max(1, int(seconds / self.period))
+        for step in range(1, steps + 1):
+            progress = step / steps
+            eased = 1 - (1 - progress) ** 3
+            self.t += self.period
+            self.samples.append(
+                (self.t, round(x0 + (x - x0) * eased), round(y0 + (y - y0) * eased))
+            )
+        self.x, self.y = x, y
+
+
+def synthetic_trace(kind, duration, seed=0, rate=60, radius=20, width=1920, height=1080):
+    """Generates a trace of roughly `duration` seconds.
+
+    clicks: glide to a target, wait for the options, dwell on "l"
+    scroll: wait for the options and hover "su" for a while
+    tremor: like clicks but with one or two pixels of jitter while parked
+    flicks: like clicks, but flick out toward "l" and back instead of dwelling
+    short_flicks: like flicks, but the strokes stop short of the button
+    rest:   wait for the options, drift between the buttons and rest there
+            until auto hide dismisses them
+    wander: continuous random movement that never settles
+    idle:   the cursor never moves
+    """
+    rng = random.Random(seed)
+    margin = radius * 6
+    builder = _TraceBuilder(rate, width // 2, height // 2)
+    offset = math.ceil(radius * 2.25)
+
+    def random_target():
+        return rng.randint(margin, width - margin), rng.randint(margin, height - margin)
+
+    while builder.t < duration:
+        if kind == "idle":
+            builder.hold(duration)
+            break
+        elif kind in ("clicks", "tremor"):
+            jitter = 1.5 if kind == "tremor" else 0.0
+            x, y = random_target()
+            builder.glide(x, y, rng.uniform(0.15, 0.4))
+            builder.hold(0.65, jitter, rng)
+            builder.glide(x, y + offset, 0.1)
+            builder.hold(0.45, jitter, rng)
+            builder.hold(rng.uniform(0.1, 0.5), jitter, rng)
+        elif kind in ("flicks", "short_flicks"):
+            reach = radius + 2 if kind == "short_flicks" else offset
+            x, y = random_target()
+            builder.glide(x, y, rng.uniform(0.15, 0.4))
+            builder.hold(0.65)
+            builder.glide(x, y + reach, 0.05)
+            builder.glide(x, y, 0.05)
+            builder.hold(rng.uniform(0.3, 0.7))
+        elif kind == "scroll":
+            x, y = random_target()
+            builder.glide(x, y, 0.3)
+            builder.hold(0.65)
+            builder.glide(x - offset, y - offset, 0.1)
+            builder.hold(2.0)
+        elif kind == "rest":
+            x, y = random_target()
+            builder.glide(x, y, rng.uniform(0.15, 0.4))
+            builder.hold(0.65)
+            builder.glide(x + offset // 2, y + offset // 2, 0.1)
+            builder.hold(rng.uniform(1.5, 2.5))
+        elif kind == "wander":
+            x, y = random_target()
+            builder.glide(x, y, rng.uniform(0.05, 0.2))
+        else:
+            raise ValueError("unknown synthetic trace: {}".format(kind))
+
+    return builder.samples
+
+
+class Replay:
+    """Feeds samples to the fake cursor while the fake cron drives the module"""
+
+    def __init__(self, module, talon):
+        self.module = module
+        self.talon = talon
+        self.callback_latencies = {}
+        self.draw_latencies = []
+        self.transitions = {}
+        self.states_entered = {}
+        self.stats = {}
+
+        talon.cron.run_hook = self._run_job
+
+    def _run_job(self, fn):
+        cm = self.module.cm
+        before = cm.state
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        self.callback_latencies.setdefault(getattr(fn, "__name__", repr(fn)), []).append(elapsed)
+
+        after = cm.state
+        if after != before:
+            key = (STATE_NAMES.get(before, before), STATE_NAMES.get(after, after))
+            self.transitions[key] = self.transitions.get(key, 0) + 1
+            name = STATE_NAMES.get(after, after)
+            self.states_entered[name] = self.states_entered.get(name, 0) + 1
+
+    def _render(self):
+        for canvas in list(self.talon.Canvas.open_canvases):
+            start = time.perf_counter()
+            if canvas.render():
+                self.draw_latencies.append(time.perf_counter() - start)
+
+    def _advance_to(self, t, next_frame):
+        clock = self.talon.clock
+        while next_frame <= t:
+            self.talon.cron.advance(next_frame - clock.now)
+            self._render()
+            next_frame += FRAME_INTERVAL
+        self.talon.cron.advance(t - clock.now)
+        return next_frame
+
+    def run(self, samples, tail=1.0):
+        talon = self.talon
+        if samples:
+            talon.ctrl.x, talon.ctrl.y = samples[0][1], samples[0][2]
+
+        talon.actions.user.clickless_mouse_enable()
+
+        origin = talon.clock.now
+        next_frame = origin + FRAME_INTERVAL
+        for t, x, y in samples:
+            next_frame = self._advance_to(origin + t, next_frame)
+            talon.ctrl.x, talon.ctrl.y = x, y
+
+        end = origin + (samples[-1][0] if samples else 0.0) + tail
+        self._advance_to(end, next_frame)
+        # disabling drops the statistics
+        self.stats = talon.actions.user.clickless_mouse_stats()
+        talon.actions.user.clickless_mouse_disable()
+        return self.report(end - origin, len(samples))
+
+    def report(self, duration, sample_count):
+        def summarize(values):
+            values = sorted(values)
+            return {
+                "count": len(values),
+                "p50_us": harness.percentile(values, 0.5) * 1e6,
+                "p90_us": harness.percentile(values, 0.9) * 1e6,
+                "p99_us": harness.percentile(values, 0.99) * 1e6,
+                "max_us": (values[-1] if values else 0.0) * 1e6,
+            }
+
+        events = {}
+        scroll_distance = 0
+        for _, kind, details in self.talon.events:
+            if kind in ("click", "down", "up"):
+                kind = "{}_{}".format(kind, details)
+            elif kind == "scroll":
+                scroll_distance += abs(details[0]) + abs(details[1])
+            events[kind] = events.get(kind, 0) + 1
+
+        wakeups = sum(len(values) for values in self.callback_latencies.values())
+        return {
+            "duration_s": duration,
+            "samples": sample_count,
+            "wakeups": wakeups,
+            "wakeups_per_minute": wakeups * 60 / duration if duration else 0.0,
+            "callbacks": {
+                name: summarize(values) for name, values in self.callback_latencies.items()
+            },
+            "draw": summarize(self.draw_latencies),
+            "frames": self.talon.Canvas.total_frames,
+            "draw_calls": self.talon.Canvas.total_draw_calls,
+            "transitions": {
+                "{}->{}".format(*key): count for key, count in sorted(self.transitions.items())
+            },
+            "states_entered": dict(sorted(self.states_entered.items())),
+            "events": dict(sorted(events.items())),
+            "scroll_distance": scroll_distance,
+            "dwell_to_action": self.stats.get("dwell_to_action"),
+        }
+
+
+def print_report(report):
+    print("replayed {samples} samples over {duration_s:.1f}s".format(**report))
+    print("{wakeups} cron wakeups, {wakeups_per_minute:.0f} per minute".format(**report))
+    print("\ncallback latency (us)")
+    for name, stats in report["callbacks"].items():
+        print(
+            "  {:<24} n={count:<7} p50={p50_us:8.1f} p90={p90_us:8.1f} p99={p99_us:8.1f} max={max_us:8.1f}".format(
+                name, **stats
+            )
+        )
+    stats = report["draw"]
+    print(
+        "  {:<24} n={count:<7} p50={p50_us:8.1f} p90={p90_us:8.1f} p99={p99_us:8.1f} max={max_us:8.1f}".format(
+            "draw", **stats
+        )
+    )
+    print("  {frames} frames drawn with {draw_calls} draw calls".format(**report))
+    print("\nstate transitions")
+    for name, count in report["transitions"].items():
+        print("  {:<32} {}".format(name, count))
+    print("\ninjected events")
+    for name, count in report["events"].items():
+        print("  {:<32} {}".format(name, count))
+    print("  {:<32} {}".format("scroll distance", report["scroll_distance"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--trace", help="recorded binary trace, or CSV trace of t,x,y rows")
+    source.add_argument(
+        "--synthetic",
+        default="clicks",
+        choices=["clicks", "flicks", "short_flicks", "scroll", "rest", "tremor", "wander", "idle"],
+        help="generate a trace instead of loading one",
+    )
+    parser.add_argument("--duration", type=float, default=30.0, help="synthetic trace length (s)")
+    parser.add_argument("--rate", type=float, default=60.0, help="synthetic sample rate (Hz)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override a setting, e.g. clickless_mouse_dwell_time=0.4",
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    module, talon = harness.load_clickless_mouse()
+    harness.apply_settings(talon, dict(harness.parse_setting(text) for text in args.set))
+
+    if args.trace:
+        samples = load_trace(args.trace)
+    else:
+        main_screen = talon.ui.main_screen()
+        samples = synthetic_trace(
+            args.synthetic,
+            args.duration,
+            seed=args.seed,
+            rate=args.rate,
+            radius=talon.settings.get("user.clickless_mouse_radius"),
+            width=main_screen.width,
+            height=main_screen.height,
+        )
+
+    report = Replay(module, talon).run(samples)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
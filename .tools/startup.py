@@ -0,0 +1,181 @@
+"""Measures what loading the clickless mouse costs, against the headless fakes.
+
+    python .tools/startup.py
+    python .tools/startup.py --repeat 50 --json
+
+Talon imports every script in the user directory on startup, so this is
+paid by everyone who has the clickless mouse installed, whether they use it
+or not. Each repetition imports a fresh copy of every script Talon loads
+from the repository (all .py files outside hidden directories) and reports:
+
+compile: the time to compile each script's source, which an import pays
+         whenever there is no cached bytecode for it
+import:  the time to import all of them, and the memory still allocated
+         afterwards. The first import is also shown on its own, as only it
+         pays for third party modules. Without bytecode caching (e.g. with
+         PYTHONDONTWRITEBYTECODE set), this includes compiling them
+enable:  the time and memory of the first user.clickless_mouse_enable()
+release: the memory still allocated after user.clickless_mouse_disable(),
+         compared with right after the import
+
+The standard library and the talon fakes are imported before anything is
+measured, so only the repository's own modules are counted.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import harness
+
+# standard library modules the repository imports, loaded up front so the
+# first repetition isn't charged for them
+PRELOAD = (
+    "array",
+    "bisect",
+    "collections",
+    "functools",
+    "json",
+    "math",
+    "mmap",
+    "os",
+    "struct",
+    "threading",
+    "types",
+)
+
+
+def talon_scripts():
+    """The module names of the scripts Talon loads from the repository. It
+    skips hidden directories, such as the one these tools are in"""
+    names = []
+    for directory, subdirectories, files in os.walk(harness.REPO_DIR):
+        subdirectories[:] = sorted(
+            name for name in subdirectories if not name.startswith(".") and name != "__pycache__"
+        )
+        for name in sorted(files):
+            if name.endswith(".py"):
+                path = os.path.relpath(os.path.join(directory, name), harness.REPO_DIR)
+                names.append(path[: -len(".py")].replace(os.sep, "."))
+    return names
+
+
+def compile_times(names, repeat):
+    """The median time to compile each script, by name"""
+    times = {}
+    for name in names:
+        path = os.path.join(harness.REPO_DIR, *name.split(".")) + ".py"
+        with open(path, "rb") as f:
+            source = f.read()
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            compile(source, path, "exec", dont_inherit=True)
+            samples.append(time.perf_counter() - start)
+        times[name] = harness.percentile(sorted(samples), 0.5)
+    return times
+
+
+def load_all(names):
+    """Imports a fresh copy of clickless_mouse.py, and of every other script
+    it didn't import itself"""
+    module, talon = harness.load_clickless_mouse()
+    for name in names:
+        harness.import_module(name)
+    return module, talon
+
+
+def measure_once(names):
+    """Times one fresh import and enable, then repeats them with memory
+    tracing, which slows everything down too much to time"""
+    start = time.perf_counter()
+    module, talon = load_all(names)
+    import_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    talon.actions.user.clickless_mouse_enable()
+    enable_time = time.perf_counter() - start
+    talon.actions.user.clickless_mouse_disable()
+
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    module, talon = load_all(names)
+    gc.collect()
+    imported = tracemalloc.get_traced_memory()[0] - base
+    talon.actions.user.clickless_mouse_enable()
+    enabled = tracemalloc.get_traced_memory()[0] - base
+    talon.actions.user.clickless_mouse_disable()
+    # the controller refers to itself through bound methods
+    gc.collect()
+    released = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    return {
+        "import_ms": import_time * 1000,
+        "import_kib": imported / 1024,
+        "enable_ms": enable_time * 1000,
+        "enable_kib": (enabled - imported) / 1024,
+        "left_after_release_kib": (released - imported) / 1024,
+        "controller_alive": module.cm is not None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="fresh imports to measure")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    harness.install_stubs()
+    for name in PRELOAD:
+        __import__(name)
+    already_loaded = set(sys.modules)
+
+    names = talon_scripts()
+    runs = [measure_once(names) for _ in range(max(1, args.repeat))]
+
+    results = {}
+    for key in runs[0]:
+        if key == "controller_alive":
+            results[key] = any(run[key] for run in runs)
+        else:
+            results[key] = harness.percentile(sorted(run[key] for run in runs), 0.5)
+    results["scripts"] = names
+    results["compile_ms"] = {name: value * 1000 for name, value in compile_times(names, max(1, args.repeat)).items()}
+    results["bytecode_cached"] = not sys.dont_write_bytecode
+    # only the first import pays for modules that stay loaded afterwards
+    results["first_import_ms"] = runs[0]["import_ms"]
+    results["third_party_imports"] = sorted(
+        name
+        for name in set(sys.modules) - already_loaded
+        # modules made up at runtime, such as the one the running copy is
+        # kept in, have no spec
+        if "." not in name and name != harness.PACKAGE and getattr(sys.modules[name], "__spec__", None)
+    )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("median of {} fresh imports of {} scripts".format(len(runs), len(names)))
+    for name, value in results["compile_ms"].items():
+        print("  compile  {:8.2f} ms  {}".format(value, name))
+    print("  compile  {:8.2f} ms  in total".format(sum(results["compile_ms"].values())))
+    print(
+        "  import   {import_ms:8.2f} ms  {import_kib:8.1f} KiB{}".format(
+            "" if results["bytecode_cached"] else "  (bytecode isn't cached, compiling included)", **results
+        )
+    )
+    print("  first    {first_import_ms:8.2f} ms".format(**results))
+    print("  enable   {enable_ms:8.2f} ms  {enable_kib:8.1f} KiB".format(**results))
+    print("  released           {left_after_release_kib:8.1f} KiB still allocated".format(**results))
+    print("  controller kept after disable: {}".format(results["controller_alive"]))
+    print("  other modules imported: {}".format(", ".join(results["third_party_imports"]) or "none"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,508 @@
+"""A headless stand-in for the parts of the talon module used by clickless_mouse.py.
+
+Everything is driven by a virtual clock: nothing happens until the harness
+calls cron.advance(), which moves the clock forward and runs every due job.
+Injected input (clicks, scrolls, cursor moves) is appended to `events` so a
+replay can be inspected afterwards.
+"""
+import tempfile
+
+
+class VirtualClock:
+    def __init__(self, start=1000.0):
+        self.now = start
+
+    def perf_counter(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # like a real sleep, this blocks: no cron job runs in the meantime
+        self.now += seconds
+
+
+clock = VirtualClock()
+
+# (time, kind, details) for every input event the module injected
+events = []
+
+
+def parse_duration(spec):
+    """Parses talon style durations such as "16ms", "1s" or "1.5s" into seconds"""
+    if isinstance(spec, (int, float)):
+        return float(spec)
+    spec = spec.strip()
+    if spec.endswith("ms"):
+        return float(spec[:-2]) / 1000
+    if spec.endswith("us"):
+        return float(spec[:-2]) / 1000000
+    if spec.endswith("s"):
+        return float(spec[:-1])
+    if spec.endswith("m"):
+        return float(spec[:-1]) * 60
+    return float(spec) / 1000
+
+
+class _Job:
+    def __init__(self, interval, fn, repeat):
+        self.interval = interval
+        self.fn = fn
+        self.repeat = repeat
+        self.due = clock.now + interval
+        self.cancelled = False
+
+
+class _Cron:
+    def __init__(self):
+        self.jobs = []
+        # optional callable(fn) that runs a job callback, e.g. to time it
+        self.run_hook = None
+
+    def interval(self, spec, fn):
+        job = _Job(max(parse_duration(spec), 0.001), fn, True)
+        self.jobs.append(job)
+        return job
+
+    def after(self, spec, fn):
+        job = _Job(parse_duration(spec), fn, False)
+        self.jobs.append(job)
+        return job
+
+    def cancel(self, job):
+        if job is not None:
+            job.cancelled = True
+            if job in self.jobs:
+                self.jobs.remove(job)
+
+    def next_due(self):
+        return min((job.due for job in self.jobs), default=None)
+
+    def advance(self, seconds):
+        """Moves the clock forward, running due jobs in order"""
+        target = clock.now + seconds
+        while True:
+            job = None
+            for candidate in self.jobs:
+                if candidate.due <= target and (job is None or candidate.due < job.due):
+                    job = candidate
+            if job is None:
+                break
+
+            clock.now = max(clock.now, job.due)
+            if job.repeat:
+                job.due += job.interval
+            else:
+                self.jobs.remove(job)
+
+            if self.run_hook:
+                self.run_hook(job.fn)
+            else:
+                job.fn()
+
+        clock.now = max(clock.now, target)
+
+    def reset(self):
+        self.jobs = []
+        self.run_hook = None
+
+
+cron = _Cron()
+
+
+class _TapEvent:
+    def __init__(self, flags, button=0, x=0, y=0, dx=0, dy=0):
+        self.flags = flags
+        self.button = button
+        self.x = x
+        self.y = y
+        self.dx = dx
+        self.dy = dy
+
+
+class _Tap:
+    """Mouse event hooks. Like the real tap, it also sees the events the
+    module injects through ctrl and actions"""
+
+    MMOVE = 1
+    MCLICK = 2
+    MSCROLL = 4
+    DOWN = 8
+    UP = 16
+
+    def __init__(self):
+        self.callbacks = []
+
+    def register(self, kinds, cb):
+        self.callbacks.append((kinds, cb))
+
+    def unregister(self, kinds, cb):
+        if (kinds, cb) in self.callbacks:
+            self.callbacks.remove((kinds, cb))
+
+    def dispatch(self, kind, event):
+        for kinds, cb in list(self.callbacks):
+            if kinds & kind:
+                cb(kind, event)
+
+    def external_click(self, button=0):
+        """Simulates the user clicking a physical mouse button"""
+        self.dispatch(self.MCLICK, _TapEvent(self.DOWN, button, ctrl.x, ctrl.y))
+        self.dispatch(self.MCLICK, _TapEvent(self.UP, button, ctrl.x, ctrl.y))
+
+    def external_scroll(self, dy=1):
+        self.dispatch(self.MSCROLL, _TapEvent(0, 0, ctrl.x, ctrl.y, dy=dy))
+
+
+tap = _Tap()
+
+
+class _MouseCtrl:
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+        self.buttons = set()
+
+    def mouse_pos(self):
+        return self.x, self.y
+
+    def mouse_move(self, x, y):
+        self.x, self.y = x, y
+        events.append((clock.now, "move", (x, y)))
+
+    def mouse_click(self, button=0, down=False, up=False, times=1):
+        if down:
+            self.buttons.add(button)
+            events.append((clock.now, "down", button))
+            tap.dispatch(tap.MCLICK, _TapEvent(tap.DOWN, button, self.x, self.y))
+        elif up:
+            self.buttons.discard(button)
+            events.append((clock.now, "up", button))
+            tap.dispatch(tap.MCLICK, _TapEvent(tap.UP, button, self.x, self.y))
+        else:
+            for _ in range(times):
+                events.append((clock.now, "click", button))
+                tap.dispatch(tap.MCLICK, _TapEvent(tap.DOWN, button, self.x, self.y))
+                tap.dispatch(tap.MCLICK, _TapEvent(tap.UP, button, self.x, self.y))
+
+    def mouse_buttons_down(self):
+        return list(self.buttons)
+
+
+ctrl = _MouseCtrl()
+
+
+class _Registry:
+    """Shared implementation of register/unregister for app, ui and friends"""
+
+    def __init__(self):
+        self.callbacks = {}
+
+    def register(self, topic, cb):
+        self.callbacks.setdefault(topic, []).append(cb)
+
+    def unregister(self, topic, cb):
+        callbacks = self.callbacks.get(topic, [])
+        if cb in callbacks:
+            callbacks.remove(cb)
+
+    def dispatch(self, topic, *args):
+        for cb in list(self.callbacks.get(topic, [])):
+            cb(*args)
+
+
+class _App(_Registry):
+    platform = "linux"
+
+    def __init__(self):
+        super().__init__()
+        self.notifications = []
+
+    def notify(self, title="", body="", **kwargs):
+        self.notifications.append((title, body))
+
+
+app = _App()
+
+
+class Rect:
+    def __init__(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def contains(self, x, y):
+        return self.x <= x < self.x + self.width and self.y <= y < self.y + self.height
+
+    def __repr__(self):
+        return "Rect({}, {}, {}, {})".format(self.x, self.y, self.width, self.height)
+
+
+class Screen:
+    def __init__(self, x, y, width, height, scale=1.0):
+        self.rect = Rect(x, y, width, height)
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.dpi = 96 * scale
+
+    def __repr__(self):
+        return "Screen({}, {}, {}, {}, scale={})".format(
+            self.x, self.y, self.width, self.height, self.scale
+        )
+
+
+class _Ui(_Registry):
+    def __init__(self):
+        super().__init__()
+        self._screens = [Screen(0, 0, 1920, 1080)]
+
+    def screens(self):
+        return list(self._screens)
+
+    def main_screen(self):
+        return self._screens[0]
+
+    def screen_containing(self, x, y):
+        for candidate in self._screens:
+            if candidate.rect.contains(x, y):
+                return candidate
+        return self._screens[0]
+
+    def set_screens(self, screens):
+        self._screens = list(screens)
+        self.dispatch("screen_change", self._screens)
+
+
+ui = _Ui()
+
+
+class _ScreenModule:
+    Screen = Screen
+
+    def main_screen(self):
+        return ui.main_screen()
+
+    def screens(self):
+        return ui.screens()
+
+
+screen = _ScreenModule()
+
+
+class _Paint:
+    class Style:
+        FILL = "fill"
+        STROKE = "stroke"
+        STROKE_AND_FILL = "stroke_and_fill"
+
+    class TextAlign:
+        LEFT = "left"
+        CENTER = "center"
+        RIGHT = "right"
+
+    def __init__(self):
+        self.color = "000000ff"
+        self.style = self.Style.FILL
+        self.stroke_width = 1
+        self.textsize = 12
+        self.text_align = self.TextAlign.LEFT
+
+
+class SkiaCanvas:
+    """The object passed to draw callbacks; counts the draw calls it receives"""
+
+    def __init__(self, rect):
+        self.rect = rect
+        self.paint = _Paint()
+        self.draw_calls = 0
+
+    def draw_line(self, x1, y1, x2, y2):
+        self.draw_calls += 1
+
+    def draw_circle(self, x, y, radius):
+        self.draw_calls += 1
+
+    def draw_text(self, text, x, y):
+        self.draw_calls += 1
+
+    def draw_rect(self, rect):
+        self.draw_calls += 1
+
+    def draw_image(self, image, x, y):
+        self.draw_calls += 1
+
+
+class Canvas(_Registry):
+    # every canvas that has not been closed yet
+    open_canvases = []
+
+    # totals over all canvases, closed ones included
+    total_frames = 0
+    total_draw_calls = 0
+
+    def __init__(self, rect):
+        super().__init__()
+        self.rect = rect
+        self.shown = True
+        self.frozen = False
+        self.closed = False
+        self.frames = 0
+        self.draw_calls = 0
+        Canvas.open_canvases.append(self)
+
+    @classmethod
+    def from_screen(cls, screen):
+        return cls(screen.rect)
+
+    @classmethod
+    def from_rect(cls, rect):
+        return cls(rect)
+
+    def show(self):
+        self.shown = True
+
+    def hide(self):
+        self.shown = False
+
+    def freeze(self):
+        # a frozen canvas draws one final frame and then stops updating
+        self.render()
+        self.frozen = True
+
+    def resume(self):
+        self.frozen = False
+
+    def close(self):
+        self.closed = True
+        self.callbacks = {}
+        if self in Canvas.open_canvases:
+            Canvas.open_canvases.remove(self)
+
+    def render(self, force=False):
+        """Runs the draw callbacks as the compositor would for one frame"""
+        if self.closed or not self.shown or (self.frozen and not force):
+            return 0
+        if not self.callbacks.get("draw"):
+            return 0
+        skia_canvas = SkiaCanvas(self.rect)
+        self.dispatch("draw", skia_canvas)
+        self.frames += 1
+        self.draw_calls += skia_canvas.draw_calls
+        Canvas.total_frames += 1
+        Canvas.total_draw_calls += skia_canvas.draw_calls
+        return skia_canvas.draw_calls
+
+
+class _CanvasModule:
+    Canvas = Canvas
+
+
+canvas = _CanvasModule()
+
+
+class _Settings(_Registry):
+    def __init__(self):
+        super().__init__()
+        self.defaults = {}
+        self.overrides = {}
+
+    def declare(self, name, default):
+        self.defaults[name] = default
+
+    def get(self, name, default=None):
+        if name in self.overrides:
+            return self.overrides[name]
+        return self.defaults.get(name, default)
+
+    def set(self, name, value):
+        """Simulates a talon file or context changing a setting"""
+        self.overrides[name] = value
+        self.dispatch("", name, value)
+        self.dispatch(name, name, value)
+
+
+settings = _Settings()
+
+
+class _ActionNamespace:
+    def __init__(self):
+        self._actions = {}
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["_actions"][name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class _PathActions:
+    def talon_home(self):
+        return tempfile.gettempdir()
+
+
+class _Actions(_ActionNamespace):
+    def __init__(self):
+        super().__init__()
+        self.user = _ActionNamespace()
+        self.path = _PathActions()
+
+    def sleep(self, spec):
+        clock.sleep(parse_duration(spec))
+
+    def mouse_scroll(self, y=0, x=0, by_lines=False):
+        events.append((clock.now, "scroll", (x, y)))
+        tap.dispatch(tap.MSCROLL, _TapEvent(0, 0, ctrl.x, ctrl.y, dx=x, dy=y))
+
+
+actions = _Actions()
+
+
+class Module:
+    def __init__(self):
+        self.tags = {}
+
+    def setting(self, name, type=None, default=None, desc=None):
+        settings.declare("user." + name, default)
+        return name
+
+    def tag(self, name, desc=None):
+        self.tags[name] = desc
+
+    def action_class(self, cls):
+        for name, fn in vars(cls).items():
+            if callable(fn) and not name.startswith("_"):
+                actions.user._actions[name] = fn
+        return cls
+
+
+class Context:
+    def __init__(self):
+        self.tags = []
+        self.settings = {}
+
+
+def reset():
+    """Returns every fake to a pristine state so a fresh replay can start"""
+    clock.now = 1000.0
+    events.clear()
+    cron.reset()
+    ctrl.x = ctrl.y = 0
+    ctrl.buttons = set()
+    tap.callbacks = []
+    app.callbacks = {}
+    app.notifications = []
+    ui.callbacks = {}
+    ui._screens = [Screen(0, 0, 1920, 1080)]
+    settings.callbacks = {}
+    settings.overrides = {}
+    Canvas.open_canvases = []
+    Canvas.total_frames = 0
+    Canvas.total_draw_calls = 0
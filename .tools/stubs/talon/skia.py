@@ -0,0 +1,23 @@
+"""Offscreen surfaces for the headless talon stand-in"""
+from . import Rect, SkiaCanvas
+
+
+class Image:
+    def __init__(self, width, height, draw_calls=0):
+        self.width = width
+        self.height = height
+        # the draw calls that went into rendering it
+        self.draw_calls = draw_calls
+
+
+class Surface:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._canvas = SkiaCanvas(Rect(0, 0, width, height))
+
+    def canvas(self):
+        return self._canvas
+
+    def snapshot(self):
+        return Image(self.width, self.height, self._canvas.draw_calls)
@@ -0,0 +1,142 @@
+"""Sweeps dwell and stop timing settings over a trace with the batch engine.
+
+    python .tools/sweep.py --synthetic clicks --duration 600
+    python .tools/sweep.py --trace my_trace.csv --dwell 0.2,0.3,0.5 --idle 0.1,0.2
+    python .tools/sweep.py --synthetic tremor --set clickless_mouse_stop_tolerance=1.5 --check
+    python .tools/sweep.py --synthetic rest --check
+
+Every combination of --dwell (clickless_mouse_dwell_time) and --idle
+(clickless_mouse_idle_time_before_display) is run through
+clickless_mouse_engine.run_batch, without talon or its fakes, and reported
+with the number of displays, dismissals and actions and the throughput in
+samples per second. --set takes the same setting names as in Talon.
+--check also steps every sample one at a time and verifies that both give the
+same events.
+"""
+import argparse
+import json
+import time
+
+import harness, replay
+
+
+def parse_values(text):
+    return [float(value) for value in text.split(",") if value.strip()]
+
+
+def step_each(engine_module, s, ts, xs, ys):
+    """The reference for run_batch: engine.step on every sample"""
+    screen = engine_module.screen_area(0, 0, 1920, 1080)
+    reference = engine_module.engine(lambda: s, lambda x, y: screen)
+    reference.reset(xs[0], ys[0])
+    events = []
+    for t, x, y in zip(ts, xs, ys):
+        event = reference.step(t, x, y)
+        if event and event != engine_module.EVENT_WARM_UP:
+            events.append((t, engine_module.EVENT_NAMES[event], reference.action))
+    return events
+
+
+def sweep(overrides, samples, dwell_times, idle_times, check=False):
+    engine_module = harness.import_module("clickless_mouse_engine")
+    ts = [t for t, _, _ in samples]
+    xs = [x for _, x, _ in samples]
+    ys = [y for _, _, y in samples]
+    numpy = engine_module.load_numpy()
+    if numpy:
+        ts, xs, ys = (numpy.asarray(values, dtype=float) for values in (ts, xs, ys))
+
+    rows = []
+    for dwell_time in dwell_times:
+        for idle_time in idle_times:
+            s = harness.engine_settings(overrides)
+            s.dwell_time = dwell_time
+            s.idle_time_before_display = idle_time
+
+            start = time.perf_counter()
+            events = engine_module.run_batch(s, ts, xs, ys)
+            elapsed = time.perf_counter() - start
+
+            counts = {}
+            for _, name, action in events:
+                key = "{}_{}".format(name, action) if name == "action" else name
+                counts[key] = counts.get(key, 0) + 1
+
+            row = {
+                "dwell_time": dwell_time,
+                "mouse_idle": idle_time,
+                "events": dict(sorted(counts.items())),
+                "samples_per_second": len(samples) / elapsed if elapsed else 0.0,
+            }
+            if check:
+                row["matches_step"] = events == step_each(
+                    engine_module, s, list(ts), list(xs), list(ys)
+                )
+            rows.append(row)
+    return rows
+
+
+def print_rows(rows, sample_count):
+    print("{} samples per run".format(sample_count))
+    for row in rows:
+        events = row["events"]
+        actions = sum(count for name, count in events.items() if name.startswith("action_"))
+        line = "dwell={dwell_time:<5} idle={mouse_idle:<5} ".format(**row)
+        line += "shown={:<5} hidden={:<5} actions={:<5} {:>12.0f} samples/s".format(
+            events.get("show", 0), events.get("hide", 0), actions, row["samples_per_second"]
+        )
+        if "matches_step" in row:
+            line += "  matches step: {}".format(row["matches_step"])
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--trace", help="recorded binary trace, or CSV trace of t,x,y rows")
+    source.add_argument(
+        "--synthetic",
+        default="clicks",
+        choices=["clicks", "flicks", "scroll", "rest", "tremor", "wander", "idle"],
+        help="generate a trace instead of loading one",
+    )
+    parser.add_argument("--duration", type=float, default=600.0, help="synthetic trace length (s)")
+    parser.add_argument("--rate", type=float, default=60.0, help="synthetic sample rate (Hz)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dwell", default="0.15,0.25,0.35,0.5", help="dwell times to try (s)")
+    parser.add_argument("--idle", default="0.1,0.2,0.3", help="mouse idle times to try (s)")
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override another setting, e.g. clickless_mouse_stop_tolerance=1.5",
+    )
+    parser.add_argument("--check", action="store_true", help="compare with stepping each sample")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    overrides = dict(harness.parse_setting(text) for text in args.set)
+
+    if args.trace:
+        samples = replay.load_trace(args.trace)
+    else:
+        samples = replay.synthetic_trace(
+            args.synthetic,
+            args.duration,
+            seed=args.seed,
+            rate=args.rate,
+            radius=harness.engine_settings(overrides).radius,
+        )
+    if not samples:
+        parser.error("the trace is empty")
+
+    rows = sweep(overrides, samples, parse_values(args.dwell), parse_values(args.idle), args.check)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_rows(rows, len(samples))
+
+
+if __name__ == "__main__":
+    main()
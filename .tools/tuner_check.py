@@ -0,0 +1,90 @@
+"""Checks that auto tuning records every display the way it was used.
+
+    python .tools/tuner_check.py
+    python .tools/tuner_check.py --synthetic scroll --duration 300
+
+The trace is stepped through the engine with flicks enabled, without talon,
+and every step is shown to a dwell_tuner as clickless_mouse.py does. Each
+display the tuner records has to match the engine's events: used if an
+action other than x fired while it was shown, unused otherwise. On the
+short_flicks trace, the default, displays used by flicks that never hover a
+button follow each other.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import harness, replay
+
+
+def run(kind, duration, seed, overrides, path):
+    engine_module = harness.import_module("clickless_mouse_engine")
+    tuning = harness.import_module("clickless_mouse_tuning")
+    s = harness.engine_settings(dict({"clickless_mouse_flick": 1}, **overrides))
+    screen = engine_module.screen_area(0, 0, 1920, 1080)
+    engine = engine_module.engine(lambda: s, lambda x, y: screen)
+    tuner = tuning.dwell_tuner(path)
+
+    samples = replay.synthetic_trace(kind, duration, seed=seed, radius=s.radius)
+    engine.reset(samples[0][1], samples[0][2])
+    expected = []
+    displaying = False
+    for t, x, y in samples:
+        event = engine.step(t, x, y)
+        if event == engine_module.EVENT_SHOW:
+            displaying = True
+            acted = 0
+        elif event == engine_module.EVENT_ACTION and engine.action != "x":
+            acted = 1
+        if displaying and engine.state != engine_module.STATE_DISPLAYING_OPTIONS:
+            displaying = False
+            expected.append(acted)
+        tuner.observe(engine, event, t)
+    if displaying and acted:
+        # recorded as soon as the action fired
+        expected.append(acted)
+
+    return expected, [acted for acted, _ in tuner.displays], engine.flicks.fired
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--synthetic",
+        default="short_flicks",
+        choices=["clicks", "flicks", "short_flicks", "scroll", "rest", "tremor"],
+        help="trace to step through",
+    )
+    parser.add_argument("--duration", type=float, default=60.0, help="trace length (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override a setting, e.g. clickless_mouse_flick_min_speed=600",
+    )
+    args = parser.parse_args(argv)
+
+    overrides = dict(harness.parse_setting(text) for text in args.set)
+    with tempfile.TemporaryDirectory() as directory:
+        expected, recorded, flicks = run(
+            args.synthetic, args.duration, args.seed, overrides, os.path.join(directory, "tuning.json")
+        )
+
+    print(
+        "{} displays, {} used, {} flicks: tuner recorded {} used of {}".format(
+            len(expected), sum(expected), flicks, sum(recorded), len(recorded)
+        )
+    )
+    if recorded != expected:
+        for index, (a, b) in enumerate(zip(expected, recorded)):
+            if a != b:
+                print("  display {} was {}, recorded as {}".format(index, "used" if a else "unused", "used" if b else "unused"))
+                break
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Checks that clickless_mouse_worker=1 decides exactly what the inline mode does.
+
+    python .tools/worker_check.py
+    python .tools/worker_check.py --synthetic scroll --duration 120 --set clickless_mouse_auto_hide=1
+
+Each trace is replayed twice as replay.py does: once with the engine
+stepped by the cron scheduler, once on the motion worker's thread. The worker
+really runs on its own thread, but in lockstep with the virtual clock: every
+poll it schedules is turned into a fake cron job at exactly that time, which
+lets the thread take one sample and then drains its decisions, the way the
+real drain job would shortly after. Both runs must inject the same clicks,
+moves and scrolls at the same times, go through the same state transitions
+and carry out the same decisions. Each run auto tunes, if enabled, from an
+empty history of its own.
+
+The worker's own numbers are reported too: polls, decisions handed back, and
+how often the queue limit made it skip a poll.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+
+import harness, replay
+
+# how long (s) the main thread waits for the worker before giving up
+TIMEOUT = 10.0
+
+
+def lockstep_worker(module, talon):
+    """A motion_worker whose thread polls when the fake cron says so"""
+
+    class worker(module.motion_worker):
+        def __init__(self, cm):
+            super().__init__(cm)
+            self.go = threading.Event()
+            self.done = threading.Event()
+            self.job = None
+
+        def start(self):
+            self.done.clear()
+            super().start()
+            # the first poll must be scheduled before the clock moves on
+            if not self.done.wait(TIMEOUT):
+                raise RuntimeError("the worker didn't start")
+
+        def stop(self):
+            talon.cron.cancel(self.job)
+            self.job = None
+            super().stop()
+
+        def wait(self):
+            now = talon.clock.now
+            self.job = talon.cron.after(0, self.tick)
+            # set directly, so rounding can't move it off the inline cadence
+            self.job.due = self.schedule(now)
+            self.done.set()
+            while not self.go.wait(0.01):
+                if self.stopping.is_set():
+                    return False
+            self.go.clear()
+            return not self.stopping.is_set()
+
+        def tick(self):
+            self.done.clear()
+            self.go.set()
+            if not self.done.wait(TIMEOUT):
+                raise RuntimeError("the worker didn't finish a poll")
+            self.drain()
+
+    return worker
+
+
+def run(kind, duration, seed, overrides, threaded, directory):
+    module, talon = harness.load_clickless_mouse()
+    engine_module = harness.import_module("clickless_mouse_engine")
+    harness.apply_settings(
+        talon,
+        dict(
+            overrides,
+            clickless_mouse_worker=1 if threaded else 0,
+            clickless_mouse_auto_tune_path=os.path.join(directory, "tuning.json"),
+        ),
+    )
+    if threaded:
+        module.motion_worker = lockstep_worker(module, talon)
+    samples = replay.synthetic_trace(
+        kind, duration, seed=seed, radius=talon.settings.get("user.clickless_mouse_radius")
+    )
+
+    # the decisions carried out, with repeated keep alive and scroll firings
+    # collapsed: the inline mode carries out one on every step
+    decisions = []
+    cm = module.controller()
+    carry_out = cm.carry_out
+
+    def carry_out_logged(s, now, decision):
+        event, action = decision[0], decision[1]
+        if event and event != engine_module.EVENT_WARM_UP:
+            entry = (round(now, 6), engine_module.EVENT_NAMES[event] if event > 0 else "external_input", action)
+            if not (
+                decisions
+                and action in module.actions_keeping_options
+                and decisions[-1][1:] == entry[1:]
+            ):
+                decisions.append(entry)
+        carry_out(s, now, decision)
+
+    cm.carry_out = carry_out_logged
+    report = replay.Replay(module, talon).run(samples)
+    worker = cm.worker.stats() if cm.worker else None
+    return {
+        "transitions": report["transitions"],
+        "events": [(round(t, 6), kind, details) for t, kind, details in talon.events],
+        "decisions": decisions,
+        "worker": worker,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--synthetic",
+        action="append",
+        choices=["clicks", "flicks", "scroll", "rest", "tremor", "wander", "idle"],
+        help="traces to replay, all but idle by default",
+    )
+    parser.add_argument("--duration", type=float, default=60.0, help="trace length (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override a setting in both runs, e.g. clickless_mouse_auto_hide=1",
+    )
+    args = parser.parse_args(argv)
+
+    overrides = dict(harness.parse_setting(text) for text in args.set)
+    failed = False
+    for kind in args.synthetic or ["clicks", "scroll", "rest", "tremor", "wander"]:
+        with tempfile.TemporaryDirectory() as directory:
+            inline = run(kind, args.duration, args.seed, overrides, False, directory)
+        with tempfile.TemporaryDirectory() as directory:
+            threaded = run(kind, args.duration, args.seed, overrides, True, directory)
+        different = [
+            name for name in ("transitions", "events", "decisions") if inline[name] != threaded[name]
+        ]
+        failed = failed or bool(different)
+
+        worker = threaded["worker"]
+        print(
+            "{:<7} {:>5} decisions {:>6} input events  worker: {} polls, {} skipped  {}".format(
+                kind,
+                len(inline["decisions"]),
+                len(inline["events"]),
+                worker["polls"],
+                worker["stalls"],
+                "differs in " + ", ".join(different) if different else "same",
+            )
+        )
+        for name in different:
+            for a, b in zip(inline[name], threaded[name]):
+                if a != b:
+                    print("  first {} difference: inline {} worker {}".format(name, a, b))
+                    break
+            else:
+                print("  {}: {} inline, {} worker".format(name, len(inline[name]), len(threaded[name])))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
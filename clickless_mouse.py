@@ -1,663 +1,2192 @@
-# prototype of a clickless mouse mode using Talon. This does not coexist with the zoom, control mouse or mouse grid
-# todo:
-#  (1) smoother, accelerated scrolling
-#  (2) horizontal scrolling
-#  (3) detect non-clickless mouse events to dismiss
-#  (4) better handling of mixed resolutions - 4k + non-4k etc
-#  (5) Clicking some contexts menus (e.g. run as admin) in the start menu requires a double click???
-from talon import Module, Context, app, canvas, screen, ui, ctrl, cron, actions, settings
-
-import math, time
-
-# l = left click
-# lh = left hold
-# lr = left release. when left is down, all options become lr
-# ld = left double click
-# su = scroll up
-# sd = scroll down
-# r = right click
-# rh = right click old, DISABLED, doesn't work yet.
-# ka = keep alive for e.g. leaving the thing up for easy scroll down/up on webpages. no action
-# x = force an exit when auto hide is disabled
-horizontal_button_order_auto_hide_enabled = [
-    "l",
-    "ld",
-    "lt",
-    "lh",
-    "r",
-    "su",
-    "sd",
-    "ka",
-]
-horizontal_button_order_auto_hide_disabled = [
-    "l",
-    "ld",
-    "lt",
-    "lh",
-    "r",
-    "su",
-    "sd",
-    "x",
-]
-left_mouse_button_index = 0
-right_mouse_button_index = 1
-
-
-mod = Module()
-ctx = Context()
-mod.tag("clickless_mouse_enabled", desc="Indicates the clickless mouse is enabled")
-
-STATE_MOUSE_IDLE = 0
-STATE_MOUSE_MOVING = 1
-STATE_MOUSE_STOPPED = 2
-STATE_DISPLAYING_OPTIONS = 3
-
-dwell_time = mod.setting(
-    "clickless_mouse_dwell_time",
-    type=float,
-    default=0.250,
-    desc="The required dwell time before triggering the action",
-)
-
-auto_hide = mod.setting(
-    "clickless_mouse_auto_hide",
-    type=int,
-    default=1,
-    desc="toggles the functionality to auto hide within the bounds",
-)
-
-auto_hide_time = mod.setting(
-    "clickless_mouse_auto_hide_time",
-    type=float,
-    default=1.25,
-    desc="The time before the clickless mouse is auto-hidden",
-)
-
-mouse_idle = mod.setting(
-    "clickless_mouse_idle_time_before_display",
-    type=float,
-    default=0.5,
-    desc="The time the mouse must be idle before the clickless mouse options are displayed",
-)
-
-radius = mod.setting(
-    "clickless_mouse_radius",
-    type=int,
-    default=15 if app.platform == "mac" else 20,
-    desc="The size of the options in the clickless mouse",
-)
-
-release_button_delay = mod.setting(
-    "clickless_mouse_release_delay",
-    type=int,
-    default=150,
-    desc="The delay (ms) before releasing the held mouse button. Allows apps time to 'revert' selection changes due to selecting release option",
-)
-
-
-prevent_redisplay_for_minor_motions = mod.setting(
-    "clickless_mouse_prevent_redisplay_for_minor_motions",
-    type=int,
-    default=0,
-    desc="A value of 1 or more prevents re-display for minor motions",
-)
-
-vertical_offset = mod.setting(
-    "clickless_mouse_vertical_offset",
-    type=float,
-    default=2.25,
-    desc="when drawing the options horizontally, this determines the vertical distance from the mouse. The total distance is the value times the radius.",
-)
-
-horizontal_offset = mod.setting(
-    "clickless_mouse_horizontal_offset",
-    type=float,
-    default=2.25,
-    desc="when drawing the options horizontally, this determines the distance between the options. The total distance is the value times the radius.",
-)
-
-stroke_width = mod.setting(
-    "clickless_mouse_stroke_width",
-    type=int,
-    default=3,
-    desc="The width the stroke for the cursor position.",
-)
-scroll_distance = mod.setting(
-    "clickless_mouse_scroll_distance",
-    type=int,
-    default=5,
-    desc="The amount to scroll on each update",
-)
-
-class dwell_button:
-    def __init__(self, x, y, action="l"):
-        self.x = x
-        self.y = y
-        self.hit = False
-        self.action = action
-        self.last_hit_time = None
-
-    def hit_check(self, hit):
-        if hit:
-            if not self.last_hit_time:
-                self.last_hit_time = time.perf_counter()
-        else:
-            hit = False
-            self.last_hit_time = None
-
-        self.hit = hit
-
-
-class clickless_mouse:
-    def __init__(self):
-        self.button_positions = []
-        self.screen = None
-        self.mcanvas = None
-        self.x, self.y = ctrl.mouse_pos()
-        self._dwell_x, self._dwell_y = ctrl.mouse_pos()
-        self.state = STATE_MOUSE_IDLE
-        self.last_time = 0
-        self.enabled = False
-        self.update_cron = None
-        self.draw_registered = False
-
-        # after moving the mouse to perform an action,
-        # avoid a state change in the first update.
-        # this prevents an unnecessary re-display
-        self.suppress_next_update = False
-
-        # the bounds around the displayed options. if you go outside, options
-        # are hidden
-        self.y_min = self.y_max = self.x_min = self.x_max = 0
-
-    def is_left_down(self):
-        return left_mouse_button_index in ctrl.mouse_buttons_down()
-
-    def enable(self, _enable):
-        if _enable == self.enabled:
-            return
-
-        self.enabled = _enable
-
-        if self.enabled:
-            ctx.tags = ["user.clickless_mouse_enabled"]
-        else:
-            ctx.tags = []
-
-        if self.enabled:
-            self.x, self.y = ctrl.mouse_pos()
-            self.update_cron = cron.interval("16ms", self.update)
-        elif self.update_cron:
-            cron.cancel(self.update_cron)
-            self.update_cron = None
-            self.state = STATE_MOUSE_IDLE
-            if self.draw_registered:
-                self.mcanvas.unregister("draw", self.draw)
-                self.mcanvas.close()
-                self.mcanvas = None
-                self.draw_registered = False
-
-    def toggle(self):
-        self.enable(not self.enabled)
-
-    def get_max_horizontal_distance(self):
-        return 2 * settings.get("user.clickless_mouse_radius") * (len(self.get_horizontal_button_order()) + 1.5)
-
-    def get_horizontal_button_order(self):
-        if settings.get("user.clickless_mouse_auto_hide") >= 1:
-            return horizontal_button_order_auto_hide_enabled
-        else:
-            return horizontal_button_order_auto_hide_disabled
-
-    def set_horizontal_button_positions_and_bounds(self, x, y, draw_right, draw_above):
-        x_pos = None
-
-        if draw_above:
-            y_pos = y - math.ceil(settings.get("user.clickless_mouse_radius") * settings.get("user.clickless_mouse_vertical_offset"))  
-            self.y_min = y - math.ceil(settings.get("user.clickless_mouse_radius") * 5)
-            self.y_max = y + math.ceil(settings.get("user.clickless_mouse_radius") * 2)      
-        else:
-            y_pos = y + math.ceil(settings.get("user.clickless_mouse_radius") * settings.get("user.clickless_mouse_vertical_offset"))
-            self.y_min = y - math.ceil(settings.get("user.clickless_mouse_radius") * 2)
-            self.y_max = y + math.ceil(settings.get("user.clickless_mouse_radius") * 5) 
-
-        if draw_right:
-            self.x_min = x - math.ceil(settings.get("user.clickless_mouse_radius") * 2.25) 
-            self.x_max = x + self.get_max_horizontal_distance()          
-        else:
-            self.x_min = x - self.get_max_horizontal_distance()
-            self.x_max = x + math.ceil(settings.get("user.clickless_mouse_radius") * 2.25)
-
-        for index, button_label in enumerate(
-            self.get_horizontal_button_order()
-        ):
-            if draw_right:
-                x_pos = x + math.ceil(settings.get("user.clickless_mouse_radius") * (2.5 + settings.get("user.clickless_mouse_horizontal_offset") * (index - 1)))
-            else:
-                x_pos = x - math.ceil(settings.get("user.clickless_mouse_radius") * (2.5 + settings.get("user.clickless_mouse_horizontal_offset") * (index - 1)))
-            
-            self.button_positions.append(
-                dwell_button(
-                    x_pos,
-                    y_pos,
-                    button_label if not self.is_left_down() else "lr",
-                )
-            )
-
-    def set_button_positions(self):
-        self.button_positions = []
-        self.x, self.y = ctrl.mouse_pos()
-
-        self._dwell_x, self._dwell_y = self.x, self.y
-
-        # alias the cursor position for convenience
-        x = self.x
-        y = self.y
-
-        # calculate the screen coordinates
-        x_screen = self.x - self.screen.x
-        y_screen = self.y - self.screen.y
-
-        # top left corner
-        if x_screen <= settings.get("user.clickless_mouse_radius") * 3.5 and y_screen <= settings.get("user.clickless_mouse_radius") * 3.25:
-            # print("case 1")
-            self.set_horizontal_button_positions_and_bounds(x, y, True, False)
-
-        # top right corner
-        elif (
-            x_screen + settings.get("user.clickless_mouse_radius") * 3.5 >= self.screen.width
-            and y_screen <= settings.get("user.clickless_mouse_radius") * 3.25
-        ):
-            # print("case 2")
-            self.set_horizontal_button_positions_and_bounds(x, y, False, False)
-
-        # bottom left corner
-        elif (
-            x_screen <= settings.get("user.clickless_mouse_radius") * 3.5
-            and y_screen + settings.get("user.clickless_mouse_radius") * 3.25 >= self.screen.height
-        ):
-            # print("case 3")
-            self.set_horizontal_button_positions_and_bounds(x, y, True, True)
-
-        # bottom right corner
-        elif (
-            x_screen + settings.get("user.clickless_mouse_radius") * 3.5 >= self.screen.width
-            and y_screen + math.ceil(settings.get("user.clickless_mouse_radius") * 3.25) >= self.screen.height
-        ):
-            # print("case 4")
-            self.set_horizontal_button_positions_and_bounds(x, y, False, True)
-
-        # bottom edge, sufficient space to draw to the right
-        elif (
-            y_screen + math.ceil(settings.get("user.clickless_mouse_radius") * 3.25) >= self.screen.height
-            and x_screen
-            + math.ceil(settings.get("user.clickless_mouse_radius") * len(self.get_horizontal_button_order()) * 2)
-            <= self.screen.width
-        ):
-            # print("case 5")
-            self.set_horizontal_button_positions_and_bounds(x, y, True, True)
-
-        # bottom edge, insufficient space to draw to the right
-        elif (
-            y_screen + math.ceil(settings.get("user.clickless_mouse_radius") * 3.25) >= self.screen.height
-            and x_screen
-            + math.ceil(settings.get("user.clickless_mouse_radius") * len(self.get_horizontal_button_order()) * 2)
-            >= self.screen.width
-        ):
-            # print("case 6")
-            self.set_horizontal_button_positions_and_bounds(x, y, False, True)
-
-        # left edge, not in corner
-        elif x_screen <= settings.get("user.clickless_mouse_radius") * 3.5:
-            # print("case 7")
-            self.set_horizontal_button_positions_and_bounds(x, y, True, False)
-
-        # right edge, not in corner
-        elif x_screen + settings.get("user.clickless_mouse_radius") * 3.5 >= self.screen.width:
-            # print("case 8")
-            self.set_horizontal_button_positions_and_bounds(x, y, False, False)
-
-        # not along edges and not in corner
-        # draw all around cursor
-        elif (
-            not y_screen <= settings.get("user.clickless_mouse_radius") * 3.25
-            and x_screen + settings.get("user.clickless_mouse_radius") * 3.5 <= self.screen.width
-        ):
-            # print("case 9")
-            self.button_positions.append(
-                dwell_button(
-                    x - math.ceil(settings.get("user.clickless_mouse_radius") * 2.25),
-                    y - math.ceil(settings.get("user.clickless_mouse_radius") * 2.25),
-                    "su" if not self.is_left_down() else "lr",
-                )
-            )
-            self.button_positions.append(
-                dwell_button(
-                    x + math.ceil(settings.get("user.clickless_mouse_radius") * 2.25),
-                    y - math.ceil(settings.get("user.clickless_mouse_radius") * 2.25),
-                    "sd" if not self.is_left_down() else "lr",
-                )
-            )
-            self.button_positions.append(
-                dwell_button(
-                    x,
-                    y - math.ceil(settings.get("user.clickless_mouse_radius") * 2.25),
-                    "lt" if not self.is_left_down() else "lr",
-                )
-            )
-
-            self.button_positions.append(
-                dwell_button(
-                    x - math.ceil(settings.get("user.clickless_mouse_radius") * 3.5),
-                    y,
-                    "lh" if not self.is_left_down() else "lr",
-                )
-            )
-            self.button_positions.append(
-                dwell_button(
-                    x - math.ceil(settings.get("user.clickless_mouse_radius") * 2.25),
-                    y + math.ceil(settings.get("user.clickless_mouse_radius") * 2.25),
-                    "ld" if not self.is_left_down() else "lr",
-                )
-            )
-
-            self.button_positions.append(
-                dwell_button(
-                    x,
-                    y + math.ceil(settings.get("user.clickless_mouse_radius") * 2.25),
-                    "l" if not self.is_left_down() else "lr",
-                )
-            )
-
-            self.button_positions.append(
-                dwell_button(
-                    x + math.ceil(settings.get("user.clickless_mouse_radius") * 2.25),
-                    y + math.ceil(settings.get("user.clickless_mouse_radius") * 2.25),
-                    "r" if not self.is_left_down() else "lr",
-                )
-            )
-
-            action = "ka" if settings.get("user.clickless_mouse_auto_hide") >= 1 else "x"
-            self.button_positions.append(
-                dwell_button(x + math.ceil(settings.get("user.clickless_mouse_radius") * 3.5), y, action)
-            )
-
-            self.y_min = y - math.ceil(settings.get("user.clickless_mouse_radius") * 5)
-            self.y_max = y + math.ceil(settings.get("user.clickless_mouse_radius") * 5)
-            self.x_min = x - math.ceil(settings.get("user.clickless_mouse_radius") * 5)
-            self.x_max = x + math.ceil(settings.get("user.clickless_mouse_radius") * 5)
-
-        # top edge, sufficient space to the right
-        elif (
-            y_screen <= settings.get("user.clickless_mouse_radius") * 3.25
-            and x_screen + settings.get("user.clickless_mouse_radius") * 3.5 <= self.screen.width
-            and x_screen
-            + math.ceil(settings.get("user.clickless_mouse_radius") * len(self.get_horizontal_button_order()) * 2)
-            <= self.screen.width
-        ):
-            # print("case 10")
-            self.set_horizontal_button_positions_and_bounds(x, y, True, False)
-
-        # top edge, insufficient space to the right
-        elif (
-            x_screen + settings.get("user.clickless_mouse_radius") * 3.5 <= self.screen.width
-            and (
-                x_screen
-                + math.ceil(
-                    settings.get("user.clickless_mouse_radius") * len(self.get_horizontal_button_order()) * 2
-                )
-                >= self.screen.width
-            )
-            and y_screen <= settings.get("user.clickless_mouse_radius") * 3.25
-        ):
-            # print("case 11")
-            self.set_horizontal_button_positions_and_bounds(x, y, False, False)
-
-        else:
-            print("not handled: {},{}".format(x, y))
-
-        # print(self.button_positions)
-
-    def update(self):
-        # print("update")
-        x, y = ctrl.mouse_pos()
-        now = time.perf_counter()
-        # print("({},{})".format(x, y))
-        if self.state == STATE_MOUSE_IDLE:
-            # print("idle")
-            if self.suppress_next_update:
-                self.suppress_next_update = False
-                self.x, self.y = ctrl.mouse_pos()
-                return
-            elif math.fabs(self.x - x) > 1 or math.fabs(self.y - y) > 1:
-                self.x, self.y = ctrl.mouse_pos()
-                self.state = STATE_MOUSE_MOVING
-
-        elif self.state == STATE_MOUSE_MOVING:
-            # print("moving")
-
-            if x == self.x and y == self.y:
-                self.x, self.y = ctrl.mouse_pos()
-                self.last_time = now
-                self.state = STATE_MOUSE_STOPPED
-            else:
-                self.x, self.y = ctrl.mouse_pos()
-
-        elif self.state == STATE_MOUSE_STOPPED:
-            # print("stopped")
-
-            if x == self.x and y == self.y:
-                if now - self.last_time >= settings.get("user.clickless_mouse_idle_time_before_display"):
-                    self.last_time = now
-                    self._dwell_x, self._dwell_y = ctrl.mouse_pos()
-                    screen = ui.screen_containing(self.x, self.y)
-
-                    # if the screen is cached, it won't always appear over
-                    # certain windows
-                    if True:  # screen != self.screen:
-                        self.screen = screen
-                        if self.mcanvas:
-                            self.mcanvas.close()
-                            self.mcanvas = None
-                        self.mcanvas = canvas.Canvas.from_screen(self.screen)
-                    self.x, self.y = ctrl.mouse_pos()
-                    self.set_button_positions()
-                    self.state = STATE_DISPLAYING_OPTIONS
-            else:
-                self.x, self.y = ctrl.mouse_pos()
-                self.state = STATE_MOUSE_MOVING
-                self.button_positions = []
-        elif self.state == STATE_DISPLAYING_OPTIONS:
-            # print("display")
-            item_hit = None
-            draw_options = True
-            for b in self.button_positions:
-                if (x <= b.x + settings.get("user.clickless_mouse_radius") and b.x - settings.get("user.clickless_mouse_radius") <= x) and (
-                    y <= b.y + settings.get("user.clickless_mouse_radius") and b.y - settings.get("user.clickless_mouse_radius") <= y
-                ):
-                    b.hit_check(True)
-                    self.last_time = now
-                    item_hit = b
-                else:
-                    b.hit_check(False)
-
-            if (
-                settings.get("user.clickless_mouse_auto_hide") >= 1
-                and not item_hit
-                and now - self.last_time >= settings.get("user.clickless_mouse_auto_hide_time")
-                and (self._dwell_x == x or self._dwell_y == y)
-            ):
-                # update the position to prevent re-display for minor moves within the bounds
-                # this may not be preferred.
-                if settings.get("user.clickless_mouse_prevent_redisplay_for_minor_motions") >= 1:
-                    self.x, self.y = ctrl.mouse_pos()
-
-                self.state = STATE_MOUSE_IDLE
-
-                draw_options = False
-
-            elif item_hit and now - item_hit.last_hit_time >= settings.get("user.clickless_mouse_dwell_time"):
-                draw_options = False
-
-                # print("performing action...")
-                action = item_hit.action
-                if (
-                    action != "su"
-                    and action != "sd"
-                    and action != "ka"
-                    and action != "x"
-                ):
-                    self.suppress_next_update = True
-                    ctrl.mouse_move(self.x, self.y)
-
-                if item_hit.action == "lh":
-                    # print("left hold")
-                    if not self.is_left_down():
-                        # print("pressing button 0 down")
-                        ctrl.mouse_click(button=left_mouse_button_index, down=True)
-                    else:
-                        # print("pressing button 0 up")
-                        actions.sleep("{}ms".format(settings.get("user.clickless_mouse_release_delay")))
-                        ctrl.mouse_click(button=left_mouse_button_index, up=True)
-
-                    # print(str(ctrl.mouse_buttons_down()))
-                elif item_hit.action == "lr":
-                    if self.is_left_down():
-                        actions.sleep("{}ms".format(settings.get("user.clickless_mouse_release_delay")))
-                        ctrl.mouse_click(button=left_mouse_button_index, up=True)
-
-                elif item_hit.action == "l":
-                    ctrl.mouse_click(button=left_mouse_button_index)
-
-                elif item_hit.action == "ld":
-                    ctrl.mouse_click(button=left_mouse_button_index)
-                    ctrl.mouse_click(button=left_mouse_button_index)
-
-                elif item_hit.action == "lt":
-                    ctrl.mouse_click(button=left_mouse_button_index)
-                    ctrl.mouse_click(button=left_mouse_button_index)
-                    ctrl.mouse_click(button=left_mouse_button_index)
-
-                elif item_hit.action == "r":
-                    ctrl.mouse_click(button=right_mouse_button_index)
-
-                elif item_hit.action == "rh":
-                    if right_mouse_button_index not in ctrl.mouse_buttons_down():
-                        ctrl.mouse_click(button=right_mouse_button_index, down=True)
-                    else:
-                        actions.sleep("{}ms".format(settings.get("user.clickless_mouse_release_delay")))
-                        ctrl.mouse_click(button=right_mouse_button_index, up=True)
-                elif item_hit.action == "su":
-                    actions.mouse_scroll(y=-settings.get("user.clickless_mouse_scroll_distance"))
-                    draw_options = True
-
-                elif item_hit.action == "sd":
-                    actions.mouse_scroll(settings.get("user.clickless_mouse_scroll_distance"))
-                    draw_options = True
-                elif item_hit.action == "ka":
-                    draw_options = True
-                elif item_hit.action == "x":
-                    draw_options = False
-                    self.x, self.y = ctrl.mouse_pos()
-                    self.state = STATE_MOUSE_IDLE
-
-                if action != "su" and action != "sd" and action != "ka":
-                    # print("({},{})".format(self.x, self.y))
-                    self.x, self.y = ctrl.mouse_pos()
-                    # print("({},{})".format(self.x, self.y))
-                    self.state = STATE_MOUSE_IDLE
-
-            elif x > self.x_max or x < self.x_min or y > self.y_max or y < self.y_min:
-                draw_options = False
-                self.state = STATE_MOUSE_IDLE
-
-            if draw_options:
-                if self._dwell_x != x or self._dwell_y != y:
-                    self.last_time = now
-                    self._dwell_x, self._dwell_y = ctrl.mouse_pos()
-
-                if not self.draw_registered:
-                    self.mcanvas.register("draw", self.draw)
-                    self.draw_registered = True
-            elif self.draw_registered:
-                self.mcanvas.unregister("draw", self.draw)
-                self.draw_registered = False
-
-    def draw(self, canvas):
-        self.draw_options(canvas)
-
-    def draw_options(self, canvas):
-        x = self.x
-        y = self.y
-        paint = canvas.paint
-        paint.color = "ff0000dd"
-        paint.style = paint.Style.FILL
-        # print("{},{}".format(self.x, self.y))
-        # print(canvas.rect)
-        paint.stroke_width = settings.get("user.clickless_mouse_stroke_width")
-        canvas.draw_line(x - settings.get("user.clickless_mouse_radius"), y, x + settings.get("user.clickless_mouse_radius"), y)
-        canvas.draw_line(x, y - settings.get("user.clickless_mouse_radius"), x, y + settings.get("user.clickless_mouse_radius"))
-
-        for b in self.button_positions:
-            # draw outer circle
-            paint.color = "ffffffaa"
-            paint.style = paint.Style.STROKE
-            canvas.draw_circle(b.x, b.y, settings.get("user.clickless_mouse_radius") + 1)
-
-            # draw inner circle
-            paint.color = "000000AA"
-            paint.style = paint.Style.FILL
-            canvas.draw_circle(b.x, b.y, settings.get("user.clickless_mouse_radius"))
-
-            # draw hit circle
-            if b.last_hit_time:
-                paint.color = "00FF00"
-                paint.style = paint.Style.FILL
-
-                _radius = min(
-                    math.ceil(
-                        settings.get("user.clickless_mouse_radius")
-                        * (time.perf_counter() - b.last_hit_time)
-                        / settings.get("user.clickless_mouse_dwell_time")
-                    ),
-                    settings.get("user.clickless_mouse_radius"),
-                )
-                canvas.draw_circle(b.x, b.y, _radius)
-
-            canvas.paint.text_align = canvas.paint.TextAlign.CENTER
-            text_string = b.action
-            paint.textsize = settings.get("user.clickless_mouse_radius")
-            paint.color = "ffffffff"
-
-            canvas.draw_text(text_string, b.x, b.y)
-
-
-cm = clickless_mouse()
-
-
-@mod.action_class
-class Actions:
-    def clickless_mouse_toggle():
-        """Toggles the click less mouse"""
-        cm.toggle()
-
-    def clickless_mouse_enable():
-        """Toggles the click less mouse"""
-        cm.enable(True)
-
-    def clickless_mouse_disable():
-        """Toggles the click less mouse"""
-        cm.enable(False)
-    
-    def clickless_mouse_is_enabled():
-        """Returns whether or not the click less mouse is enabled"""
-        return cm.enabled
-        
-
-
-# uncomment the following for quick testing
-# def on_ready():
-#     cm.enable(True)
-
-
-# app.register("ready", on_ready)
+# prototype of a clickless mouse mode using Talon. This does not coexist with the zoom, control mouse or mouse grid
+# todo:
+#  (1) Clicking some contexts menus (e.g. run as admin) in the start menu requires a double click???
+from talon import Module, Context, app, canvas, screen, ui, ctrl, cron, actions, settings
+
+import array, bisect, collections, functools, math, os, sys, threading, time, types
+
+from .clickless_mouse_engine import (
+    EVENT_ACTION,
+    EVENT_HIDE,
+    EVENT_NONE,
+    EVENT_SHOW,
+    EVENT_WARM_UP,
+    STATE_DISPLAYING_OPTIONS,
+    STATE_MOUSE_IDLE,
+    STATE_MOUSE_STOPPED,
+    STATE_NAMES,
+    actions_keeping_options,
+    engine,
+    engine_settings,
+    parse_layout,
+    scroll_directions,
+    timings,
+)
+from .clickless_mouse_trace import ACTION_CODES, trace_recorder
+from .clickless_mouse_tuning import dwell_tuner
+
+try:
+    from talon import tap
+except ImportError:
+    # external clicks and scrolls can't be noticed without it
+    tap = None
+
+try:
+    from talon.skia import Surface
+except ImportError:
+    # the buttons are drawn directly on every frame instead
+    Surface = None
+
+left_mouse_button_index = 0
+right_mouse_button_index = 1
+
+# the steps performed for each action, played by action_executor:
+#   click, toggle (press, or release after the release delay if already down),
+#   release (after the release delay, if down) and delay (the named timing in
+#   settings_snapshot). scrolling is left to scroll_engine
+action_steps = {
+    "l": (("click", left_mouse_button_index),),
+    "ld": (
+        ("click", left_mouse_button_index),
+        ("delay", "click_interval"),
+        ("click", left_mouse_button_index),
+    ),
+    "lt": (
+        ("click", left_mouse_button_index),
+        ("delay", "click_interval"),
+        ("click", left_mouse_button_index),
+        ("delay", "click_interval"),
+        ("click", left_mouse_button_index),
+    ),
+    "lh": (("toggle", left_mouse_button_index),),
+    "lr": (("release", left_mouse_button_index),),
+    "r": (("click", right_mouse_button_index),),
+    "rh": (("toggle", right_mouse_button_index),),
+    "ka": (),
+    "x": (),
+}
+
+
+mod = Module()
+ctx = Context()
+defaults = engine_settings()
+mod.tag("clickless_mouse_enabled", desc="Indicates the clickless mouse is enabled")
+
+dwell_time = mod.setting(
+    "clickless_mouse_dwell_time",
+    type=float,
+    default=defaults.dwell_time,
+    desc="The required dwell time before triggering the action",
+)
+
+auto_hide = mod.setting(
+    "clickless_mouse_auto_hide",
+    type=int,
+    default=defaults.auto_hide,
+    desc="toggles the functionality to auto hide within the bounds",
+)
+
+auto_hide_time = mod.setting(
+    "clickless_mouse_auto_hide_time",
+    type=float,
+    default=defaults.auto_hide_time,
+    desc="The time before the clickless mouse is auto-hidden",
+)
+
+mouse_idle = mod.setting(
+    "clickless_mouse_idle_time_before_display",
+    type=float,
+    default=defaults.idle_time_before_display,
+    desc="The time the mouse must be idle before the clickless mouse options are displayed",
+)
+
+radius = mod.setting(
+    "clickless_mouse_radius",
+    type=int,
+    default=15 if app.platform == "mac" else defaults.radius,
+    desc="The size of the options in the clickless mouse",
+)
+
+release_button_delay = mod.setting(
+    "clickless_mouse_release_delay",
+    type=int,
+    default=defaults.release_delay,
+    desc="The delay (ms) before releasing the held mouse button. Allows apps time to 'revert' selection changes due to selecting release option",
+)
+
+
+prevent_redisplay_for_minor_motions = mod.setting(
+    "clickless_mouse_prevent_redisplay_for_minor_motions",
+    type=int,
+    default=defaults.prevent_redisplay_for_minor_motions,
+    desc="A value of 1 or more prevents re-display for minor motions",
+)
+
+vertical_offset = mod.setting(
+    "clickless_mouse_vertical_offset",
+    type=float,
+    default=defaults.vertical_offset,
+    desc="when drawing the options horizontally, this determines the vertical distance from the mouse. The total distance is the value times the radius.",
+)
+
+horizontal_offset = mod.setting(
+    "clickless_mouse_horizontal_offset",
+    type=float,
+    default=defaults.horizontal_offset,
+    desc="when drawing the options horizontally, this determines the distance between the options. The total distance is the value times the radius.",
+)
+
+stroke_width = mod.setting(
+    "clickless_mouse_stroke_width",
+    type=int,
+    default=defaults.stroke_width,
+    desc="The width the stroke for the cursor position.",
+)
+scroll_distance = mod.setting(
+    "clickless_mouse_scroll_distance",
+    type=int,
+    default=defaults.scroll_distance,
+    desc="The starting scroll speed, as the amount scrolled every 1/60 s",
+)
+
+scroll_interval = mod.setting(
+    "clickless_mouse_scroll_interval",
+    type=int,
+    default=defaults.scroll_interval,
+    desc="The time (ms) between scroll events. The amount scrolled in between is sent as one event",
+)
+
+scroll_acceleration = mod.setting(
+    "clickless_mouse_scroll_acceleration",
+    type=float,
+    default=defaults.scroll_acceleration,
+    desc="How much the scroll speed grows every second of hovering, as a multiple of the starting speed",
+)
+
+scroll_max_speed = mod.setting(
+    "clickless_mouse_scroll_max_speed",
+    type=float,
+    default=defaults.scroll_max_speed,
+    desc="The highest scroll speed, as a multiple of the starting speed",
+)
+
+scroll_deceleration = mod.setting(
+    "clickless_mouse_scroll_deceleration",
+    type=float,
+    default=defaults.scroll_deceleration,
+    desc="The time (s) scrolling takes to come to a stop after leaving a scroll option. 0 stops right away",
+)
+
+horizontal_scroll = mod.setting(
+    "clickless_mouse_horizontal_scroll",
+    type=int,
+    default=defaults.horizontal_scroll,
+    desc="A value of 1 or more adds the sl and sr options to scroll left and right",
+)
+
+layout = mod.setting(
+    "clickless_mouse_layout",
+    type=str,
+    default="",
+    desc="A layout replacing the built in ones: radial, horizontal or grid, then the options with optional weights, e.g. 'radial l=10 r=3 ld=2 lh su sd x'. Heavier options are placed closer to the cursor",
+)
+
+layout_spacing = mod.setting(
+    "clickless_mouse_layout_spacing",
+    type=float,
+    default=defaults.layout_spacing,
+    desc="The distance between neighboring options of clickless_mouse_layout, and from the cursor to the closest ones. The total distance is the value times the radius, at least 2",
+)
+
+layout_adapt = mod.setting(
+    "clickless_mouse_layout_adapt",
+    type=int,
+    default=defaults.layout_adapt,
+    desc="A value of 1 or more adds each use of an option to its weight in clickless_mouse_layout, so the options used most this session move closest to the cursor",
+)
+
+idle_poll_interval = mod.setting(
+    "clickless_mouse_idle_poll_interval",
+    type=int,
+    default=defaults.idle_poll_interval,
+    desc="The time (ms) between cursor samples while the mouse is idle. Motion after an idle period is noticed up to this much later, which delays the options by as much",
+)
+
+active_poll_interval = mod.setting(
+    "clickless_mouse_active_poll_interval",
+    type=int,
+    default=defaults.active_poll_interval,
+    desc="The time (ms) between cursor samples while the mouse is moving, stopped or the options are displayed",
+)
+
+burst_poll_interval = mod.setting(
+    "clickless_mouse_burst_poll_interval",
+    type=int,
+    default=defaults.burst_poll_interval,
+    desc="The time (ms) between cursor samples right after motion starts. Values below the rate of the pointing device cause spurious stops",
+)
+
+worker = mod.setting(
+    "clickless_mouse_worker",
+    type=int,
+    default=defaults.worker,
+    desc="A value of 1 or more samples the cursor and runs stop detection and dwell timing on a thread of its own instead of in a cron callback, so neither holds up speech recognition",
+)
+
+poll_burst_time = mod.setting(
+    "clickless_mouse_poll_burst_time",
+    type=float,
+    default=defaults.poll_burst_time,
+    desc="How long (s) to sample at the burst interval after motion starts. 0 disables the burst",
+)
+
+warm_up = mod.setting(
+    "clickless_mouse_warm_up",
+    type=int,
+    default=defaults.warm_up,
+    desc="A value of 1 or more prepares the canvas and layout while the idle timer counts down, so the options appear as soon as it expires",
+)
+
+position_filter = mod.setting(
+    "clickless_mouse_filter",
+    type=str,
+    default=defaults.position_filter,
+    desc="How the cursor position is smoothed before detecting stops: none, ema (exponential moving average) or one_euro",
+)
+
+filter_smoothing = mod.setting(
+    "clickless_mouse_filter_smoothing",
+    type=float,
+    default=defaults.filter_smoothing,
+    desc="For the ema filter, the weight (0-1] of each new sample. Lower values smooth more",
+)
+
+filter_min_cutoff = mod.setting(
+    "clickless_mouse_filter_min_cutoff",
+    type=float,
+    default=defaults.filter_min_cutoff,
+    desc="For the one_euro filter, the cutoff frequency (Hz) while the cursor is still. Lower values smooth more",
+)
+
+filter_beta = mod.setting(
+    "clickless_mouse_filter_beta",
+    type=float,
+    default=defaults.filter_beta,
+    desc="For the one_euro filter, how quickly the cutoff rises with the cursor speed. Higher values lag less",
+)
+
+stop_tolerance = mod.setting(
+    "clickless_mouse_stop_tolerance",
+    type=float,
+    default=defaults.stop_tolerance,
+    desc="The distance (px) the filtered cursor may drift between updates and still count as stopped",
+)
+
+predictive_display = mod.setting(
+    "clickless_mouse_predictive_display",
+    type=int,
+    default=defaults.predictive_display,
+    desc="A value of 1 or more shows the options after clickless_mouse_predictive_idle_time when the cursor decelerated smoothly into its stop",
+)
+
+predictive_idle_time = mod.setting(
+    "clickless_mouse_predictive_idle_time",
+    type=float,
+    default=defaults.predictive_idle_time,
+    desc="The idle time (s) before the options display after a predicted stop",
+)
+
+flick = mod.setting(
+    "clickless_mouse_flick",
+    type=int,
+    default=defaults.flick,
+    desc="A value of 1 or more fires an option right away on a quick flick toward it, or out toward it and back, while the options are displayed",
+)
+
+flick_min_speed = mod.setting(
+    "clickless_mouse_flick_min_speed",
+    type=float,
+    default=defaults.flick_min_speed,
+    desc="The speed (px/s) a motion must reach to count as a flick",
+)
+
+flick_min_distance = mod.setting(
+    "clickless_mouse_flick_min_distance",
+    type=float,
+    default=defaults.flick_min_distance,
+    desc="How far, in option radii, a flick must reach",
+)
+
+flick_angle = mod.setting(
+    "clickless_mouse_flick_angle",
+    type=float,
+    default=defaults.flick_angle,
+    desc="How far (degrees) a flick may point away from an option and still select it. Flicks within this angle of more than one option are ignored",
+)
+
+flick_max_time = mod.setting(
+    "clickless_mouse_flick_max_time",
+    type=float,
+    default=defaults.flick_max_time,
+    desc="The longest (s) a flick may take from start to end",
+)
+
+dismiss_on_external_input = mod.setting(
+    "clickless_mouse_dismiss_on_external_input",
+    type=int,
+    default=defaults.dismiss_on_external_input,
+    desc="A value of 1 or more hides the options as soon as a click or scroll is made outside the clickless mouse",
+)
+
+sprite_cache_enabled = mod.setting(
+    "clickless_mouse_sprite_cache",
+    type=int,
+    default=defaults.sprite_cache,
+    desc="A value of 1 or more renders each button once into an image that is reused on every frame",
+)
+
+dpi_scaling = mod.setting(
+    "clickless_mouse_dpi_scaling",
+    type=int,
+    default=defaults.dpi_scaling,
+    desc="A value of 1 or more scales the options by each screen's scale factor relative to the main screen, so they have the same physical size on mixed DPI setups",
+)
+
+click_interval = mod.setting(
+    "clickless_mouse_click_interval",
+    type=int,
+    default=defaults.click_interval,
+    desc="The delay (ms) between the clicks of a double or triple click",
+)
+
+action_delays = mod.setting(
+    "clickless_mouse_action_delays",
+    type=str,
+    default="",
+    desc="Per action delays (ms) replacing the click interval or release delay of that action, e.g. 'ld=40 lr=250'",
+)
+
+auto_tune = mod.setting(
+    "clickless_mouse_auto_tune",
+    type=int,
+    default=defaults.auto_tune,
+    desc="A value of 1 or more learns the dwell, idle and auto hide times from how the options are used, within bounds around their settings",
+)
+
+auto_tune_path = mod.setting(
+    "clickless_mouse_auto_tune_path",
+    type=str,
+    default=defaults.auto_tune_path,
+    desc="The file the auto tune history is kept in. Defaults to clickless_mouse_tuning.json in the Talon home directory",
+)
+
+auto_tune_min_dwell_time = mod.setting(
+    "clickless_mouse_auto_tune_min_dwell_time",
+    type=float,
+    default=defaults.auto_tune_min_dwell_time,
+    desc="The shortest dwell time (s) auto tuning may learn",
+)
+
+trace_path = mod.setting(
+    "clickless_mouse_trace_path",
+    type=str,
+    default=defaults.trace_path,
+    desc="The file cursor traces are recorded to. Defaults to clickless_mouse.trace in the Talon home directory",
+)
+
+instrumentation_enabled = mod.setting(
+    "clickless_mouse_instrumentation",
+    type=int,
+    default=defaults.instrumentation,
+    desc="A value of 1 or more collects the latency statistics returned by user.clickless_mouse_stats",
+)
+
+trace_records = mod.setting(
+    "clickless_mouse_trace_records",
+    type=int,
+    default=defaults.trace_records,
+    desc="The number of samples kept in the trace file; older samples are overwritten",
+)
+
+
+class settings_snapshot(engine_settings):
+    """Typed view of all clickless mouse settings, resolved in one pass"""
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__()
+        self.radius = settings.get("user.clickless_mouse_radius")
+        self.dwell_time = settings.get("user.clickless_mouse_dwell_time")
+        self.idle_time_before_display = settings.get(
+            "user.clickless_mouse_idle_time_before_display"
+        )
+        self.auto_hide = settings.get("user.clickless_mouse_auto_hide")
+        self.auto_hide_time = settings.get("user.clickless_mouse_auto_hide_time")
+        self.prevent_redisplay_for_minor_motions = settings.get(
+            "user.clickless_mouse_prevent_redisplay_for_minor_motions"
+        )
+        self.release_delay = settings.get("user.clickless_mouse_release_delay")
+        self.vertical_offset = settings.get("user.clickless_mouse_vertical_offset")
+        self.horizontal_offset = settings.get("user.clickless_mouse_horizontal_offset")
+        self.stroke_width = settings.get("user.clickless_mouse_stroke_width")
+        self.scroll_distance = settings.get("user.clickless_mouse_scroll_distance")
+        self.scroll_interval = settings.get("user.clickless_mouse_scroll_interval")
+        self.scroll_acceleration = settings.get("user.clickless_mouse_scroll_acceleration")
+        self.scroll_max_speed = settings.get("user.clickless_mouse_scroll_max_speed")
+        self.scroll_deceleration = settings.get("user.clickless_mouse_scroll_deceleration")
+        self.horizontal_scroll = settings.get("user.clickless_mouse_horizontal_scroll")
+        self.layout = parse_layout(settings.get("user.clickless_mouse_layout"))
+        self.layout_spacing = settings.get("user.clickless_mouse_layout_spacing")
+        self.layout_adapt = settings.get("user.clickless_mouse_layout_adapt")
+        self.idle_poll_interval = settings.get("user.clickless_mouse_idle_poll_interval")
+        self.active_poll_interval = settings.get("user.clickless_mouse_active_poll_interval")
+        self.burst_poll_interval = settings.get("user.clickless_mouse_burst_poll_interval")
+        self.poll_burst_time = settings.get("user.clickless_mouse_poll_burst_time")
+        self.worker = settings.get("user.clickless_mouse_worker")
+        self.warm_up = settings.get("user.clickless_mouse_warm_up")
+        self.position_filter = settings.get("user.clickless_mouse_filter")
+        self.filter_smoothing = settings.get("user.clickless_mouse_filter_smoothing")
+        self.filter_min_cutoff = settings.get("user.clickless_mouse_filter_min_cutoff")
+        self.filter_beta = settings.get("user.clickless_mouse_filter_beta")
+        self.stop_tolerance = settings.get("user.clickless_mouse_stop_tolerance")
+        self.predictive_display = settings.get("user.clickless_mouse_predictive_display")
+        self.predictive_idle_time = settings.get("user.clickless_mouse_predictive_idle_time")
+        self.flick = settings.get("user.clickless_mouse_flick")
+        self.flick_min_speed = settings.get("user.clickless_mouse_flick_min_speed")
+        self.flick_min_distance = settings.get("user.clickless_mouse_flick_min_distance")
+        self.flick_angle = settings.get("user.clickless_mouse_flick_angle")
+        self.flick_max_time = settings.get("user.clickless_mouse_flick_max_time")
+        self.dismiss_on_external_input = settings.get(
+            "user.clickless_mouse_dismiss_on_external_input"
+        )
+        self.sprite_cache = settings.get("user.clickless_mouse_sprite_cache")
+        self.dpi_scaling = settings.get("user.clickless_mouse_dpi_scaling")
+        self.auto_tune = settings.get("user.clickless_mouse_auto_tune")
+        self.auto_tune_path = settings.get("user.clickless_mouse_auto_tune_path")
+        self.auto_tune_min_dwell_time = settings.get(
+            "user.clickless_mouse_auto_tune_min_dwell_time"
+        )
+        self.trace_path = settings.get("user.clickless_mouse_trace_path")
+        self.trace_records = settings.get("user.clickless_mouse_trace_records")
+        self.instrumentation = settings.get("user.clickless_mouse_instrumentation")
+        self.click_interval = settings.get("user.clickless_mouse_click_interval")
+        self.action_delays = parse_action_delays(
+            settings.get("user.clickless_mouse_action_delays")
+        )
+
+
+def parse_action_delays(text):
+    """Parses 'ld=40 lr=250' into {"ld": 40, "lr": 250}"""
+    delays = {}
+    for item in text.replace(",", " ").split():
+        action, _, delay = item.partition("=")
+        if action not in action_steps or not delay.isdigit():
+            # scroll actions have no delays, see scroll_engine
+            print("clickless mouse: ignoring action delay {}".format(item))
+            continue
+        delays[action] = int(delay)
+    return delays
+
+
+class settings_cache:
+    """Hands out the current settings_snapshot, rebuilding it only after Talon
+    reports a settings change (which includes context driven changes)"""
+
+    def __init__(self):
+        self.snapshot = None
+
+        # counters for verifying the hot paths hit the cache
+        self.rebuilds = 0
+        self.reads = 0
+
+    def invalidate(self, *_args):
+        self.snapshot = None
+
+    def get(self):
+        self.reads += 1
+        if self.snapshot is None:
+            self.snapshot = settings_snapshot()
+            self.rebuilds += 1
+        return self.snapshot
+
+    def stats(self):
+        return {"rebuilds": self.rebuilds, "reads": self.reads}
+
+
+class resource_tracker:
+    """Creates the cron jobs, canvases, callbacks and threads of the clickless
+    mouse and keeps the ones still held, so they can be counted and all torn
+    down together when Talon reloads this file"""
+
+    def __init__(self):
+        self.jobs = set()
+        self.canvases = set()
+        # (registry, topic, callback)
+        self.callbacks = set()
+        self.threads = set()
+
+        # called first by close_all, for an orderly shutdown
+        self.teardown = None
+
+    def interval(self, spec, fn):
+        job = cron.interval(spec, fn)
+        self.jobs.add(job)
+        return job
+
+    def after(self, spec, fn):
+        @functools.wraps(fn)
+        def fire():
+            self.jobs.discard(job)
+            fn()
+
+        job = cron.after(spec, fire)
+        self.jobs.add(job)
+        return job
+
+    def cancel(self, job):
+        if job is not None:
+            cron.cancel(job)
+            self.jobs.discard(job)
+
+    def open_canvas(self, screen):
+        mcanvas = canvas.Canvas.from_screen(screen)
+        self.canvases.add(mcanvas)
+        return mcanvas
+
+    def close_canvas(self, mcanvas):
+        mcanvas.close()
+        self.canvases.discard(mcanvas)
+        # closing drops its callbacks too
+        self.callbacks = {entry for entry in self.callbacks if entry[0] is not mcanvas}
+
+    def register(self, registry, topic, cb):
+        registry.register(topic, cb)
+        self.callbacks.add((registry, topic, cb))
+
+    def unregister(self, registry, topic, cb):
+        registry.unregister(topic, cb)
+        self.callbacks.discard((registry, topic, cb))
+
+    def start_thread(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        self.threads.add(thread)
+        thread.start()
+        return thread
+
+    def join_thread(self, thread, timeout):
+        thread.join(timeout)
+        if not thread.is_alive():
+            self.threads.discard(thread)
+
+    def held(self):
+        """The number of each kind of resource held right now"""
+        self.threads = {thread for thread in self.threads if thread.is_alive()}
+        return {
+            "cron_jobs": len(self.jobs),
+            "canvases": len(self.canvases),
+            "callbacks": len(self.callbacks),
+            "threads": len(self.threads),
+        }
+
+    def close_all(self):
+        """Shuts down through teardown, then releases whatever it left"""
+        teardown = self.teardown
+        self.teardown = None
+        if teardown:
+            teardown()
+
+        for job in list(self.jobs):
+            self.cancel(job)
+        for registry, topic, cb in list(self.callbacks):
+            self.unregister(registry, topic, cb)
+        for mcanvas in list(self.canvases):
+            self.close_canvas(mcanvas)
+        for thread in list(self.threads):
+            self.join_thread(thread, 0)
+
+
+resources = resource_tracker()
+
+
+class poll_scheduler:
+    """Runs the update callback on a cron interval whose rate is picked after
+    every tick, so an idle cursor is sampled far less often than a moving one"""
+
+    def __init__(self, callback, choose_interval):
+        self.callback = callback
+        self.choose_interval = choose_interval
+        self.job = None
+        self.interval = None
+
+        # wakeup accounting, for measuring the savings of the slower rates
+        self.wakeups = 0
+        self.window_start = None
+        self.window_wakeups = 0
+        self.wakeups_last_minute = None
+
+    def start(self):
+        self.window_start = time.perf_counter()
+        self.window_wakeups = 0
+        self.reschedule(self.choose_interval())
+
+    def stop(self):
+        if self.job:
+            resources.cancel(self.job)
+        self.job = None
+        self.interval = None
+
+    def reschedule(self, interval):
+        if interval == self.interval and self.job:
+            return
+
+        if self.job:
+            resources.cancel(self.job)
+        self.interval = interval
+        self.job = resources.interval("{}ms".format(interval), self.tick)
+
+    def tick(self):
+        self.wakeups += 1
+        self.window_wakeups += 1
+
+        self.callback()
+
+        now = time.perf_counter()
+        if now - self.window_start >= 60:
+            self.wakeups_last_minute = self.window_wakeups
+            self.window_start = now
+            self.window_wakeups = 0
+
+        if self.job:
+            self.reschedule(self.choose_interval())
+
+    def wakeups_per_minute(self):
+        if self.wakeups_last_minute is not None:
+            return self.wakeups_last_minute
+
+        # never started, as while the worker polls
+        if self.window_start is None:
+            return 0
+
+        # less than a minute in, extrapolate from the current window
+        elapsed = time.perf_counter() - self.window_start
+        return self.window_wakeups * 60 / elapsed if elapsed > 0 else 0
+
+    def stats(self):
+        return {
+            "interval_ms": self.interval,
+            "wakeups": self.wakeups,
+            "wakeups_per_minute": self.wakeups_per_minute(),
+        }
+
+
+class indexed_screen:
+    """A screen's bounds and scale, resolved once when the index is built"""
+
+    __slots__ = ("screen", "x", "y", "width", "height", "right", "bottom", "layout_scale")
+
+    def __init__(self, screen, layout_scale):
+        self.screen = screen
+        self.x = screen.x
+        self.y = screen.y
+        self.width = screen.width
+        self.height = screen.height
+        self.right = screen.x + screen.width
+        self.bottom = screen.y + screen.height
+
+        # the factor applied to the radius and the stroke width on this screen
+        self.layout_scale = layout_scale
+
+    def contains(self, x, y):
+        return self.x <= x < self.right and self.y <= y < self.bottom
+
+
+def screen_layout_scale(screen, main_screen, dpi_scaling):
+    # macOS coordinates are already in points, so only other platforms need
+    # to account for the scale factor. the radius is chosen on the main
+    # screen, so only the difference to its scale counts
+    if dpi_scaling < 1 or app.platform == "mac":
+        return 1.0
+    main_scale = getattr(main_screen, "scale", 1.0) or 1.0
+    return (getattr(screen, "scale", 1.0) or 1.0) / main_scale
+
+
+class screen_index:
+    """Maps points to screens. The desktop is cut into vertical strips at
+    every screen's left and right edge, each strip listing its screens top to
+    bottom, so a lookup is two binary searches. Rebuilt on screen_change."""
+
+    def __init__(self, screens, main_screen, dpi_scaling):
+        self.dpi_scaling = dpi_scaling
+        self.entries = [
+            indexed_screen(screen, screen_layout_scale(screen, main_screen, dpi_scaling)) for screen in screens
+        ]
+
+        self.edges = sorted({entry.x for entry in self.entries} | {entry.right for entry in self.entries})
+        # per strip: the screens' top edges and the screens, sorted by y
+        self.strips = []
+        for left, right in zip(self.edges, self.edges[1:]):
+            column = sorted(
+                (entry for entry in self.entries if entry.x < right and entry.right > left),
+                key=lambda entry: entry.y,
+            )
+            self.strips.append(([entry.y for entry in column], column))
+
+        # the cursor tends to stay on one screen
+        self.last = None
+
+    def lookup(self, x, y):
+        """Returns the indexed_screen containing (x, y), or the closest one"""
+        last = self.last
+        if last is not None and last.contains(x, y):
+            return last
+
+        entry = None
+        strip = bisect.bisect_right(self.edges, x) - 1
+        if 0 <= strip < len(self.strips):
+            tops, column = self.strips[strip]
+            row = bisect.bisect_right(tops, y) - 1
+            if row >= 0 and column[row].contains(x, y):
+                entry = column[row]
+
+        if entry is None:
+            entry = self.closest(x, y)
+        self.last = entry
+        return entry
+
+    def closest(self, x, y):
+        def distance(entry):
+            dx = max(entry.x - x, 0, x - entry.right + 1)
+            dy = max(entry.y - y, 0, y - entry.bottom + 1)
+            return dx * dx + dy * dy
+
+        return min(self.entries, key=distance)
+
+
+class canvas_pool:
+    """One reusable canvas per screen. Canvases are hidden rather than closed
+    when the options go away; showing a hidden canvas again puts it back on
+    top of other windows, which recreating it on every display used to do."""
+
+    def __init__(self):
+        self.canvases = {}
+
+    def prepare(self, screen):
+        """Returns the canvas for the screen, creating it hidden if needed"""
+        key = (screen.x, screen.y, screen.width, screen.height)
+        mcanvas = self.canvases.get(key)
+        if mcanvas is None:
+            mcanvas = self.canvases[key] = resources.open_canvas(screen)
+            mcanvas.hide()
+        return mcanvas
+
+    def acquire(self, screen):
+        """Returns the canvas for the screen, shown above other windows"""
+        mcanvas = self.prepare(screen)
+        mcanvas.show()
+        return mcanvas
+
+    def close_all(self):
+        for mcanvas in self.canvases.values():
+            resources.close_canvas(mcanvas)
+        self.canvases = {}
+
+
+def draw_button_face(canvas, x, y, radius):
+    paint = canvas.paint
+
+    # draw outer circle
+    paint.color = "ffffffaa"
+    paint.style = paint.Style.STROKE
+    canvas.draw_circle(x, y, radius + 1)
+
+    # draw inner circle
+    paint.color = "000000AA"
+    paint.style = paint.Style.FILL
+    canvas.draw_circle(x, y, radius)
+
+
+def draw_button_label(canvas, x, y, radius, label):
+    paint = canvas.paint
+    paint.style = paint.Style.FILL
+    paint.text_align = paint.TextAlign.CENTER
+    paint.textsize = radius
+    paint.color = "ffffffff"
+    canvas.draw_text(label, x, y)
+
+
+class sprite_cache:
+    """Buttons rendered once into images, keyed by action, radius and stroke
+    width. A frame then blits one image per button instead of drawing two
+    circles and shaping a label. The label is also kept on its own, to go
+    on top of a dwell progress circle."""
+
+    def __init__(self):
+        # (kind, action, radius, stroke width) -> (image, half of its size)
+        self.sprites = {}
+        self.settings = None
+        self.renders = 0
+        self.blits = 0
+
+    def available(self, s):
+        if s is not self.settings:
+            # the look of the buttons may have changed
+            self.sprites = {}
+            self.settings = s
+        return Surface is not None and s.sprite_cache >= 1
+
+    def get(self, kind, action, radius, stroke_width):
+        key = (kind, action, radius, stroke_width)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.sprites[key] = self.render(kind, action, radius, stroke_width)
+        self.blits += 1
+        return sprite
+
+    def render(self, kind, action, radius, stroke_width):
+        half = math.ceil(radius + 2 + stroke_width)
+        surface = Surface(half * 2, half * 2)
+        canvas = surface.canvas()
+        canvas.paint.stroke_width = stroke_width
+        if kind == "button":
+            draw_button_face(canvas, half, half, radius)
+        draw_button_label(canvas, half, half, radius, action)
+        self.renders += 1
+        return surface.snapshot(), half
+
+    def stats(self):
+        return {"sprites": len(self.sprites), "renders": self.renders, "blits": self.blits}
+
+
+# everything the draw callback needs to draw the options, published by update.
+# frames are immutable: update swaps in a new one when the hovered button
+# changes, sharing the buttons tuple, so a draw callback that runs while
+# update does still sees one whole frame. buttons holds an (x, y, action)
+# tuple per button; while a button is hovered, its dwell progress is drawn
+# from hit_time and dwell_time
+overlay_frame = collections.namedtuple(
+    "overlay_frame",
+    ("x", "y", "radius", "stroke_width", "buttons", "hit_index", "hit_time", "dwell_time"),
+)
+
+
+class draw_counter:
+    """Counts the overlay frames drawn and the draw calls issued for them"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.draw_calls = 0
+        self.since = time.perf_counter()
+
+    def add_frame(self, draw_calls):
+        self.frames += 1
+        self.draw_calls += draw_calls
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.since
+        return {
+            "frames": self.frames,
+            "draw_calls": self.draw_calls,
+            "frames_per_second": self.frames / elapsed if elapsed > 0 else 0,
+            "draw_calls_per_second": self.draw_calls / elapsed if elapsed > 0 else 0,
+        }
+
+
+class latency_histogram:
+    """Fixed memory latency histogram with power of two microsecond buckets"""
+
+    BUCKETS = 25
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        microseconds = int(seconds * 1000000)
+        bucket = microseconds.bit_length() if microseconds > 0 else 0
+        self.counts[min(bucket, self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """The upper bound (ms) of the bucket holding the percentile"""
+        if not self.count:
+            return 0.0
+
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min((1 << bucket) / 1000, self.max * 1000)
+        return self.max * 1000
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total * 1000 / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max * 1000,
+        }
+
+
+class instrumentation:
+    """Latency histograms, state transition counts and end to end timings for
+    a clickless_mouse. While detached, none of the hot paths are wrapped, so
+    turning it off costs nothing."""
+
+    TIMED = ("update", "draw_options", "perform_action")
+    ENGINE_TIMED = ("place_options",)
+    # with clickless_mouse_worker, poll takes the place of update on the
+    # worker thread, and drain carries out its decisions on the main thread
+    WORKER_TIMED = ("poll", "drain")
+
+    def __init__(self):
+        self.attached = False
+        self.reset()
+
+    def reset(self):
+        self.histograms = {
+            name: latency_histogram() for name in self.TIMED + self.ENGINE_TIMED + self.WORKER_TIMED
+        }
+        self.transitions = {}
+
+        # mouse stop -> options drawn, and dwell complete -> action performed
+        self.stop_to_visible = latency_histogram()
+        self.dwell_to_action = latency_histogram()
+        self.stopped_at = None
+        # the hover whose dwell was last timed
+        self.timed_hit = None
+
+    def attach(self, cm):
+        if self.attached:
+            return
+
+        for name in self.TIMED:
+            setattr(cm, name, self.timed(name, getattr(cm, name)))
+        for name in self.ENGINE_TIMED:
+            setattr(cm.engine, name, self.timed(name, getattr(cm.engine, name)))
+
+        update = cm.update
+        draw_options = cm.draw_options
+        perform_action = cm.perform_action
+
+        def update_instrumented():
+            before = cm.state
+            update()
+            self.count_transition(before, cm.state)
+
+        def draw_options_instrumented(canvas):
+            draw_options(canvas)
+            if self.stopped_at is not None and cm.state == STATE_DISPLAYING_OPTIONS:
+                self.stop_to_visible.add(time.perf_counter() - self.stopped_at)
+                self.stopped_at = None
+
+        def perform_action_instrumented(s, action, x, y):
+            buttons = cm.engine.buttons
+            # flicks fire without a dwell
+            if buttons.hit_index >= 0 and buttons.actions[buttons.hit_index] == action:
+                # scrolling and ka fire on every step while hovered, only the
+                # first firing completes the dwell
+                hit_time = buttons.last_hit_times[buttons.hit_index]
+                if action not in actions_keeping_options or hit_time != self.timed_hit:
+                    self.timed_hit = hit_time
+                    dwell_complete = hit_time + cm.engine.timings.dwell(s, action)
+                    self.dwell_to_action.add(max(0.0, time.perf_counter() - dwell_complete))
+            return perform_action(s, action, x, y)
+
+        cm.update = update_instrumented
+        cm.draw_options = draw_options_instrumented
+        cm.perform_action = perform_action_instrumented
+        cm.scheduler.callback = cm.update
+        self.attached = True
+        if cm.worker:
+            self.attach_worker(cm.worker)
+
+    def attach_worker(self, worker):
+        """Wraps the polls and drains of a motion_worker the way attach wraps
+        update. Polls count transitions on the worker thread."""
+        cm = worker.cm
+        for name in self.WORKER_TIMED:
+            setattr(worker, name, self.timed(name, getattr(worker, name)))
+        poll = worker.poll
+
+        def poll_instrumented():
+            before = cm.state
+            poll()
+            self.count_transition(before, cm.state)
+
+        worker.poll = poll_instrumented
+
+    def count_transition(self, before, after):
+        if after != before:
+            key = (before, after)
+            self.transitions[key] = self.transitions.get(key, 0) + 1
+            if after == STATE_MOUSE_STOPPED:
+                self.stopped_at = time.perf_counter()
+            elif after != STATE_DISPLAYING_OPTIONS:
+                self.stopped_at = None
+
+    def detach(self, cm):
+        if not self.attached:
+            return
+
+        for name in self.TIMED:
+            del cm.__dict__[name]
+        for name in self.ENGINE_TIMED:
+            del cm.engine.__dict__[name]
+        if cm.worker:
+            for name in self.WORKER_TIMED:
+                del cm.worker.__dict__[name]
+        cm.scheduler.callback = cm.update
+        self.stopped_at = None
+        self.attached = False
+
+    def timed(self, name, fn):
+        histogram = self.histograms[name]
+
+        def timed_fn(*args):
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                histogram.add(time.perf_counter() - start)
+
+        return timed_fn
+
+    def stats(self):
+        return {
+            "latency": {name: histogram.summary() for name, histogram in self.histograms.items()},
+            "transitions": {
+                "{}->{}".format(STATE_NAMES[before], STATE_NAMES[after]): count
+                for (before, after), count in sorted(self.transitions.items())
+            },
+            "stop_to_visible": self.stop_to_visible.summary(),
+            "dwell_to_action": self.dwell_to_action.summary(),
+        }
+
+
+class input_snapshot:
+    """The cursor position and mouse buttons, read once per update and shared
+    by everything that needs them during it"""
+
+    __slots__ = ("x", "y", "left_down")
+
+    def __init__(self):
+        self.x = self.y = 0
+        self.left_down = None
+
+    def sample(self):
+        self.x, self.y = ctrl.mouse_pos()
+        # the buttons are only needed when the options are placed
+        self.left_down = None
+
+    def is_left_down(self):
+        if self.left_down is None:
+            self.left_down = left_mouse_button_index in ctrl.mouse_buttons_down()
+        return self.left_down
+
+
+class input_tracker:
+    """Notices clicks and scrolls that don't come from the clickless mouse,
+    through a tap on the mouse events. The tap callback only sets a flag,
+    the next update acts on it"""
+
+    # events this long (s) after one of our own injections are assumed to be
+    # that injection coming back through the tap
+    INJECTION_GRACE = 0.1
+
+    def __init__(self):
+        self.registered = False
+        self.external = False
+        self.ignore_until = 0
+        self.events = 0
+
+    def start(self):
+        if tap is None or self.registered:
+            return
+        resources.register(tap, tap.MCLICK | tap.MSCROLL, self.on_event)
+        self.registered = True
+
+    def stop(self):
+        if self.registered:
+            resources.unregister(tap, tap.MCLICK | tap.MSCROLL, self.on_event)
+            self.registered = False
+        self.external = False
+
+    def injected(self):
+        """Called right before the clickless mouse sends an event"""
+        self.ignore_until = time.perf_counter() + self.INJECTION_GRACE
+
+    def on_event(self, _type, _event):
+        if time.perf_counter() >= self.ignore_until:
+            self.external = True
+
+    def take(self):
+        """Returns whether external input happened since the last call"""
+        if not self.external:
+            return False
+        self.external = False
+        self.events += 1
+        return True
+
+
+class action_executor:
+    """Plays the steps of actions on their own cron schedule, so the delays
+    between steps never block the update loop"""
+
+    def __init__(self, tracker):
+        # (kind, argument, delay in ms) for each pending step
+        self.queue = collections.deque()
+        self.job = None
+        self.tracker = tracker
+
+        # the cursor position the action was performed at. the cursor is put
+        # back there before a click that follows a delay, so a double or
+        # triple click is never split by the cursor drifting in between
+        self.anchor_x = self.anchor_y = 0
+
+    def start(self, s, action, x, y):
+        override = s.action_delays.get(action)
+        for kind, argument in action_steps[action]:
+            if kind == "delay":
+                delay = override if override is not None else getattr(s, argument)
+            elif kind in ("toggle", "release"):
+                delay = override if override is not None else s.release_delay
+            else:
+                delay = 0
+            self.queue.append((kind, argument, delay))
+
+        self.anchor_x, self.anchor_y = x, y
+        if not self.job:
+            self.run()
+
+    def resume(self):
+        self.job = None
+        if self.queue and self.queue[0][0] == "click" and ctrl.mouse_pos() != (self.anchor_x, self.anchor_y):
+            self.tracker.injected()
+            ctrl.mouse_move(self.anchor_x, self.anchor_y)
+        self.run()
+
+    def run(self):
+        queue = self.queue
+        while queue:
+            kind, argument, delay = queue.popleft()
+            if kind == "click":
+                self.tracker.injected()
+                ctrl.mouse_click(button=argument)
+            elif kind == "toggle" and argument not in ctrl.mouse_buttons_down():
+                self.tracker.injected()
+                ctrl.mouse_click(button=argument, down=True)
+            elif kind == "toggle" or kind == "release":
+                if argument in ctrl.mouse_buttons_down():
+                    queue.appendleft(("up", argument, 0))
+                    queue.appendleft(("delay", None, delay))
+            elif kind == "up":
+                self.tracker.injected()
+                ctrl.mouse_click(button=argument, up=True)
+            elif kind == "delay" and delay > 0:
+                self.job = resources.after("{}ms".format(delay), self.resume)
+                return
+
+    def cancel(self):
+        """Drops the pending steps. Buttons waiting to be released are
+        released right away, so nothing is left held down."""
+        if self.job:
+            resources.cancel(self.job)
+            self.job = None
+
+        pending = self.queue
+        self.queue = collections.deque()
+        for kind, argument, _delay in pending:
+            if kind in ("release", "up") and argument in ctrl.mouse_buttons_down():
+                self.tracker.injected()
+                ctrl.mouse_click(button=argument, up=True)
+
+
+class scroll_engine:
+    """Scrolls on its own cron timer while a scroll option is hovered. The
+    speed grows the longer the option is hovered, and the distance covered
+    between two timer ticks is sent as a single event. After leaving the
+    option, the speed runs down to zero over the deceleration time."""
+
+    def __init__(self, tracker):
+        self.job = None
+        self.tracker = tracker
+        self.holding = False
+        self.direction_x = self.direction_y = 0
+
+        # in scroll units per second
+        self.start_speed = 0.0
+        self.max_speed = 0.0
+        self.acceleration = 0.0
+        self.speed = 0.0
+        self.release_speed = 0.0
+        self.deceleration = 0.0
+
+        self.hold_start = 0
+        self.last_step = 0
+
+        # the part of the distance too small to be sent yet
+        self.pending = 0.0
+
+        self.events = 0
+        self.distance = 0
+
+    def hover(self, s, direction_x, direction_y):
+        """Called on every update while a scroll option is dwelled on"""
+        if self.holding and (direction_x, direction_y) == (self.direction_x, self.direction_y):
+            return
+
+        now = time.perf_counter()
+        self.holding = True
+        self.hold_start = now
+        self.last_step = now
+        self.direction_x, self.direction_y = direction_x, direction_y
+        self.pending = 0.0
+
+        # the old behavior scrolled scroll_distance on every 1/60 s update
+        self.start_speed = s.scroll_distance * 60.0
+        self.max_speed = self.start_speed * max(1.0, s.scroll_max_speed)
+        self.acceleration = self.start_speed * s.scroll_acceleration
+        self.deceleration = s.scroll_deceleration
+        self.speed = self.start_speed
+
+        # respond right away, then keep going at the scroll interval
+        self.emit(s.scroll_distance)
+        if self.job:
+            resources.cancel(self.job)
+        self.job = resources.interval("{}ms".format(max(1, s.scroll_interval)), self.step)
+
+    def release(self):
+        """Starts slowing down after leaving the scroll option"""
+        if self.holding:
+            self.holding = False
+            self.release_speed = self.speed
+
+    def stop(self):
+        if self.job:
+            resources.cancel(self.job)
+            self.job = None
+        self.holding = False
+        self.speed = 0.0
+        self.pending = 0.0
+
+    def step(self):
+        now = time.perf_counter()
+        elapsed = now - self.last_step
+        self.last_step = now
+
+        if self.holding:
+            self.speed = min(
+                self.start_speed + self.acceleration * (now - self.hold_start), self.max_speed
+            )
+        elif self.deceleration > 0:
+            self.speed -= self.release_speed * elapsed / self.deceleration
+        else:
+            self.speed = 0.0
+
+        if self.speed <= 0:
+            self.stop()
+            return
+
+        self.pending += self.speed * elapsed
+        amount = int(self.pending)
+        if amount:
+            self.pending -= amount
+            self.emit(amount)
+
+    def emit(self, amount):
+        self.events += 1
+        self.distance += amount
+        self.tracker.injected()
+        actions.mouse_scroll(x=self.direction_x * amount, y=self.direction_y * amount)
+
+    def stats(self):
+        return {"events": self.events, "distance": self.distance}
+
+    def reset(self):
+        self.events = 0
+        self.distance = 0
+
+
+class sample_ring:
+    """Cursor samples, with the state and action after each, in preallocated
+    arrays. One thread writes and others read without a lock: a sample is
+    only published by bumping written after it is stored, and a reader that
+    fell more than the capacity behind skips what was overwritten."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.ts = array.array("d", bytes(8 * capacity))
+        self.xs = array.array("d", bytes(8 * capacity))
+        self.ys = array.array("d", bytes(8 * capacity))
+        self.states = array.array("B", bytes(capacity))
+        self.action_codes = array.array("B", bytes(capacity))
+        self.written = 0
+
+    def write(self, t, x, y, state, action_code):
+        index = self.written % self.capacity
+        self.ts[index] = t
+        self.xs[index] = x
+        self.ys[index] = y
+        self.states[index] = state
+        self.action_codes[index] = action_code
+        self.written += 1
+
+    def read(self, start, record):
+        """Passes the samples from number start on to record(t, x, y, state,
+        action code) and returns the number to start from next time"""
+        written = self.written
+        start = max(start, written - self.capacity)
+        capacity = self.capacity
+        for number in range(start, written):
+            index = number % capacity
+            record(
+                self.ts[index],
+                self.xs[index],
+                self.ys[index],
+                self.states[index],
+                self.action_codes[index],
+            )
+        return written
+
+
+# a decision from the worker: dismiss everything after an external click or
+# scroll, see clickless_mouse.on_external_input
+EVENT_EXTERNAL_INPUT = -1
+
+
+class motion_worker:
+    """Samples the cursor and runs the engine on a thread of its own, waking
+    at the same rates as the inline update. Only decisions that need the main
+    thread, such as showing the canvas or clicking, are handed back through
+    a queue that a cron job drains; the overlay frames are published as
+    usual. Each decision is (event, action, screen, x, y, displaying before,
+    displaying after). The drain job only runs while there is something to
+    drain or the options are displayed."""
+
+    # samples kept for the main thread, e.g. to record a trace
+    RING_CAPACITY = 1024
+
+    # decisions the main thread may fall behind by before the worker pauses
+    QUEUE_LIMIT = 32
+
+    # how often (ms) the main thread takes the decisions, while it has to
+    DRAIN_INTERVAL = 16
+
+    # how long (s) stopping waits for the thread to finish
+    JOIN_TIMEOUT = 1.0
+
+    def __init__(self, cm):
+        self.cm = cm
+        self.ring = sample_ring(self.RING_CAPACITY)
+        self.ring_read = 0
+        self.decisions = collections.deque()
+        self.thread = None
+        self.stopping = threading.Event()
+        self.drain_job = None
+
+        # the worker starts the drain job when it has something for it, and
+        # the main thread stops it once there is nothing left
+        self.drain_lock = threading.Lock()
+
+        # whether the last decision drained left the options displayed
+        self.showing = False
+
+        # the hover whose scroll or keep alive action already fired; those
+        # fire on every step but are handed back once
+        self.fired_hover = None
+
+        # the interval (s) and due time of the next poll
+        self.interval = None
+        self.due = 0
+
+        # the worker owns the tuner while it runs, and saves it
+        self.save_tuning_at = None
+
+        self.polls = 0
+        self.stalls = 0
+
+    def start(self):
+        self.stopping.clear()
+        self.interval = None
+        self.thread = resources.start_thread(self.run, "clickless mouse")
+
+    def stop(self):
+        """Stops the thread and waits for it, dropping undrained decisions"""
+        self.stopping.set()
+        if self.thread:
+            resources.join_thread(self.thread, self.JOIN_TIMEOUT)
+            self.thread = None
+        with self.drain_lock:
+            resources.cancel(self.drain_job)
+            self.drain_job = None
+        self.decisions.clear()
+        self.showing = False
+        self.fired_hover = None
+
+    def run(self):
+        while self.wait():
+            self.poll()
+
+    def schedule(self, now):
+        """Returns when the next poll is due. Like a cron interval, an
+        unchanged interval keeps its cadence and a new one starts from now"""
+        interval = max(1, self.cm.poll_interval()) / 1000
+        if interval != self.interval or self.due < now:
+            self.interval = interval
+            self.due = now
+        self.due += interval
+        return self.due
+
+    def wait(self):
+        """Sleeps until the next poll is due. Returns False when stopping."""
+        now = time.perf_counter()
+        return not self.stopping.wait(max(0.0, self.schedule(now) - now))
+
+    def poll(self):
+        if len(self.decisions) >= self.QUEUE_LIMIT:
+            # the main thread is stalled, don't pile up more for it
+            self.stalls += 1
+            return
+
+        cm = self.cm
+        s = cm.settings_cache.get()
+        snapshot = cm.input
+        snapshot.sample()
+        x = snapshot.x
+        y = snapshot.y
+        now = time.perf_counter()
+        engine = cm.engine
+        decisions = self.decisions
+
+        if cm.input_tracker.take():
+            cm.frame = None
+            engine.reset(x, y)
+            self.fired_hover = None
+            decisions.append((EVENT_EXTERNAL_INPUT, None, None, x, y, False, False))
+
+        displaying = engine.state == STATE_DISPLAYING_OPTIONS
+        hit = engine.buttons.hit_index
+        event = cm.step(s, now, x, y)
+        still_displaying = engine.state == STATE_DISPLAYING_OPTIONS
+        hover_changed = displaying and (not still_displaying or engine.buttons.hit_index != hit)
+
+        if event == EVENT_ACTION and engine.action in actions_keeping_options:
+            hover = (engine.buttons.hit_index, engine.action)
+            if hover == self.fired_hover:
+                event = EVENT_NONE
+            self.fired_hover = hover
+        elif hover_changed:
+            self.fired_hover = None
+
+        if event or hover_changed:
+            decisions.append(
+                (
+                    event,
+                    engine.action,
+                    engine.screen if event == EVENT_SHOW else engine.warm_screen,
+                    engine.x,
+                    engine.y,
+                    displaying,
+                    still_displaying,
+                )
+            )
+
+        self.ring.write(now, x, y, engine.state, ACTION_CODES.get(engine.action, 0))
+        self.polls += 1
+        if decisions or cm.recorder:
+            self.wake()
+
+        if self.save_tuning_at is not None and now >= self.save_tuning_at:
+            self.save_tuning_at = None
+            cm.write_tuning()
+
+    def wake(self):
+        """Starts the drain job unless it is running"""
+        with self.drain_lock:
+            if self.drain_job is None and not self.stopping.is_set():
+                self.drain_job = resources.interval("{}ms".format(self.DRAIN_INTERVAL), self.drain_tick)
+
+    def drain_tick(self):
+        # looked up on every tick, so instrumentation can wrap drain
+        self.drain()
+
+    def drain(self):
+        """Carries out the decisions on the main thread"""
+        cm = self.cm
+        s = cm.settings_cache.get()
+        now = time.perf_counter()
+        decisions = self.decisions
+        while decisions:
+            decision = decisions.popleft()
+            cm.carry_out(s, now, decision)
+            if decision[0] == EVENT_SHOW:
+                self.showing = True
+            elif decision[5] and not decision[6] or decision[0] == EVENT_EXTERNAL_INPUT:
+                self.showing = False
+
+        # what update does on every sample while the options are displayed
+        if self.showing:
+            cm.show_overlay(now)
+
+        if cm.recorder:
+            self.ring_read = self.ring.read(self.ring_read, cm.recorder.record)
+        elif not self.showing:
+            with self.drain_lock:
+                # checked under the lock, as the worker adds to it first
+                if not decisions:
+                    resources.cancel(self.drain_job)
+                    self.drain_job = None
+
+    def stats(self):
+        return {
+            "running": self.thread is not None,
+            "polls": self.polls,
+            "stalls": self.stalls,
+            "queued": len(self.decisions),
+            "draining": self.drain_job is not None,
+        }
+
+
+class clickless_mouse:
+    """Feeds the live cursor to a clickless_mouse_engine.engine and carries
+    out what it decides: showing the overlay, clicking and scrolling"""
+
+    def __init__(self):
+        self.mcanvas = None
+        self.canvas_pool = canvas_pool()
+        self.enabled = False
+        self.draw_registered = False
+        self.draw_counter = draw_counter()
+        self.sprites = sprite_cache()
+
+        # the canvas only redraws while a dwell progress circle is filling.
+        # otherwise it is frozen on the last frame, which showed the hit
+        # state in drawn_hit_index
+        self.overlay_frozen = False
+        self.drawn_hit_index = None
+
+        # the overlay_frame being displayed, None while nothing is. update
+        # only ever replaces it, draw reads it once per frame
+        self.frame = None
+        self.settings_cache = settings_cache()
+        self.scheduler = poll_scheduler(self.update, self.poll_interval)
+
+        # samples and steps the engine on its own thread instead of the
+        # scheduler, with clickless_mouse_worker
+        self.worker = None
+
+        # the screens, built on first use and dropped on screen_change
+        self.screens = None
+
+        self.input = input_snapshot()
+        self.input_tracker = input_tracker()
+        self.engine = engine(
+            self.settings_cache.get, self.screen_at, self.input.is_left_down, self.now
+        )
+
+        self.instrumentation = instrumentation()
+        self.executor = action_executor(self.input_tracker)
+        self.scroller = scroll_engine(self.input_tracker)
+
+        # records every sample while tracing
+        self.recorder = None
+
+        # learns the timings while auto tuning, and the pending save of its
+        # history
+        self.tuner = None
+        self.tuning_save_job = None
+
+    @property
+    def state(self):
+        return self.engine.state
+
+    def now(self):
+        return time.perf_counter()
+
+    def enable(self, _enable):
+        if _enable == self.enabled:
+            return
+
+        self.enabled = _enable
+
+        if self.enabled:
+            ctx.tags = ["user.clickless_mouse_enabled"]
+        else:
+            ctx.tags = []
+
+        if self.enabled:
+            self.engine.reset(*ctrl.mouse_pos())
+            self.sync_instrumentation()
+            self.sync_input_tracker()
+            self.sync_tuning()
+            self.start_polling()
+        elif self.scheduler.job or self.worker_running():
+            self.stop_polling()
+            self.input_tracker.stop()
+            self.save_tuning()
+            self.executor.cancel()
+            self.scroller.stop()
+            self.engine.state = STATE_MOUSE_IDLE
+            self.frame = None
+            self.hide_options()
+            self.canvas_pool.close_all()
+            self.mcanvas = None
+            self.engine.warm_screen = None
+
+    def toggle(self):
+        self.enable(not self.enabled)
+
+    def worker_running(self):
+        return self.worker is not None and self.worker.thread is not None
+
+    def start_polling(self):
+        if self.settings_cache.get().worker >= 1:
+            if self.worker is None:
+                self.worker = motion_worker(self)
+                if self.instrumentation.attached:
+                    self.instrumentation.attach_worker(self.worker)
+            self.worker.start()
+        else:
+            self.scheduler.start()
+
+    def stop_polling(self):
+        if self.worker:
+            self.worker.stop()
+        self.scheduler.stop()
+
+    def on_settings_change(self, *_args):
+        self.settings_cache.invalidate()
+        if self.enabled and self.worker_running() != (self.settings_cache.get().worker >= 1):
+            # starts over with the new way of polling
+            self.enable(False)
+            self.enable(True)
+        elif self.enabled:
+            self.sync_instrumentation()
+            self.sync_input_tracker()
+            self.sync_tuning()
+
+    def sync_input_tracker(self):
+        if self.settings_cache.get().dismiss_on_external_input >= 1:
+            self.input_tracker.start()
+        else:
+            self.input_tracker.stop()
+
+    def sync_instrumentation(self):
+        if self.settings_cache.get().instrumentation >= 1:
+            self.instrumentation.attach(self)
+        else:
+            self.instrumentation.detach(self)
+
+    def sync_tuning(self):
+        s = self.settings_cache.get()
+        if s.auto_tune >= 1:
+            path = tuning_path(s)
+            if self.tuner is None or self.tuner.path != path:
+                self.save_tuning()
+                self.tuner = dwell_tuner(path)
+            self.engine.timings = self.tuner.timings(s)
+        else:
+            self.save_tuning()
+            self.tuner = None
+            self.engine.timings = timings()
+
+    def save_tuning(self):
+        resources.cancel(self.tuning_save_job)
+        self.tuning_save_job = None
+        self.write_tuning()
+
+    def write_tuning(self):
+        tuner = self.tuner
+        if tuner:
+            try:
+                tuner.save()
+            except OSError as e:
+                print("clickless mouse: could not save the auto tune history: {}".format(e))
+
+    def on_display_end(self, s, now):
+        """Applies what the tuner learned from the display that just ended,
+        and saves the history soon after"""
+        self.engine.timings = self.tuner.timings(s)
+        if self.worker_running():
+            # cron belongs to the main thread, the worker saves it itself
+            if self.worker.save_tuning_at is None:
+                self.worker.save_tuning_at = now + 10
+        elif self.tuning_save_job is None:
+            self.tuning_save_job = resources.after("10s", self.save_tuning)
+
+    def revert_tuning(self):
+        resources.cancel(self.tuning_save_job)
+        self.tuning_save_job = None
+        self.tuner.revert()
+        self.engine.timings = timings()
+
+    def stats(self):
+        stats = self.instrumentation.stats()
+        stats["instrumentation"] = self.instrumentation.attached
+        stats["settings"] = self.settings_cache.stats()
+        stats["polling"] = self.scheduler.stats()
+        stats["overlay"] = self.draw_counter.stats()
+        stats["overlay"]["sprites"] = self.sprites.stats()
+        stats["scrolling"] = self.scroller.stats()
+        stats["worker"] = self.worker.stats() if self.worker else {"running": False}
+        stats["resources"] = resources.held()
+        stats["prediction"] = {
+            "predicted": self.engine.predicted_displays,
+            "timed": self.engine.timed_displays,
+        }
+        stats["flicks"] = self.engine.flicks.fired
+        stats["layout_uses"] = dict(self.engine.uses)
+        stats["external_input"] = {
+            "tracking": self.input_tracker.registered,
+            "dismissals": self.input_tracker.events,
+        }
+        return stats
+
+    def reset_stats(self):
+        self.instrumentation.reset()
+        self.draw_counter.reset()
+        self.scroller.reset()
+        self.engine.predicted_displays = self.engine.timed_displays = 0
+        self.engine.flicks.fired = 0
+
+    def start_trace(self):
+        s = self.settings_cache.get()
+        path = s.trace_path or os.path.join(actions.path.talon_home(), "clickless_mouse.trace")
+
+        self.stop_trace()
+        self.recorder = trace_recorder(path, max(1, s.trace_records))
+        return path
+
+    def stop_trace(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def poll_interval(self):
+        """The cron interval (ms) suited to the current state"""
+        s = self.settings_cache.get()
+        burst_until = self.engine.burst_until
+        if burst_until and time.perf_counter() < burst_until:
+            return s.burst_poll_interval
+        elif self.engine.state == STATE_MOUSE_IDLE:
+            return s.idle_poll_interval
+
+        return s.active_poll_interval
+
+    def screen_at(self, x, y):
+        """Returns the indexed_screen containing (x, y)"""
+        dpi_scaling = self.settings_cache.get().dpi_scaling
+        if self.screens is None or self.screens.dpi_scaling != dpi_scaling:
+            self.screens = screen_index(ui.screens(), ui.main_screen(), dpi_scaling)
+        return self.screens.lookup(x, y)
+
+    def on_screen_change(self, *_args):
+        # the engine is only changed while the worker is stopped
+        threaded = self.worker_running()
+        if threaded:
+            self.worker.stop()
+
+        self.engine.clear_layouts()
+        self.screens = None
+
+        # the pooled canvases cover the old screen geometry
+        if self.engine.state == STATE_DISPLAYING_OPTIONS:
+            self.engine.state = STATE_MOUSE_IDLE
+        self.frame = None
+        self.hide_options()
+        self.canvas_pool.close_all()
+        self.mcanvas = None
+        self.engine.warm_screen = None
+
+        if threaded:
+            self.worker.start()
+
+    def hide_options(self):
+        if self.draw_registered:
+            resources.unregister(self.mcanvas, "draw", self.draw)
+            # don't keep the last frame around for the next display
+            if self.overlay_frozen:
+                self.mcanvas.resume()
+                self.overlay_frozen = False
+            self.mcanvas.hide()
+            self.draw_registered = False
+
+    def publish_frame(self, s):
+        """Publishes the options the engine just placed as a new frame"""
+        engine = self.engine
+        buttons = engine.buttons
+        self.frame = overlay_frame(
+            engine.x,
+            engine.y,
+            buttons.radius,
+            s.stroke_width * engine.screen.layout_scale,
+            tuple(
+                (buttons.xs[index], buttons.ys[index], buttons.actions[index])
+                for index in range(buttons.count)
+            ),
+            -1,
+            0,
+            0,
+        )
+
+    def publish_hit(self, s):
+        """Publishes a frame for the button that is hovered now, if it
+        changed"""
+        buttons = self.engine.buttons
+        hit = buttons.hit_index
+        frame = self.frame
+        if hit == frame.hit_index:
+            return
+        if hit >= 0:
+            self.frame = frame._replace(
+                hit_index=hit,
+                hit_time=buttons.last_hit_times[hit],
+                dwell_time=self.engine.timings.dwell(s, buttons.actions[hit]),
+            )
+        else:
+            self.frame = frame._replace(hit_index=-1, hit_time=0, dwell_time=0)
+
+    def refresh_overlay(self, now):
+        """Animates the canvas only while a dwell progress circle is filling,
+        and freezes it on a final frame once nothing changes"""
+        frame = self.frame
+        if frame is None:
+            # the worker already dismissed it, the decision follows
+            return
+        hit = frame.hit_index
+        if hit >= 0 and now - frame.hit_time < frame.dwell_time:
+            if self.overlay_frozen:
+                self.mcanvas.resume()
+                self.overlay_frozen = False
+            self.drawn_hit_index = hit
+        elif not self.overlay_frozen or hit != self.drawn_hit_index:
+            # freezing draws the final frame
+            self.mcanvas.freeze()
+            self.overlay_frozen = True
+            self.drawn_hit_index = hit
+
+    def update(self):
+        s = self.settings_cache.get()
+        snapshot = self.input
+        snapshot.sample()
+        x = snapshot.x
+        y = snapshot.y
+        now = time.perf_counter()
+        engine = self.engine
+
+        if self.input_tracker.take():
+            self.on_external_input()
+
+        displaying = engine.state == STATE_DISPLAYING_OPTIONS
+        event = self.step(s, now, x, y)
+        self.carry_out(
+            s,
+            now,
+            (
+                event,
+                engine.action,
+                engine.screen if event == EVENT_SHOW else engine.warm_screen,
+                engine.x,
+                engine.y,
+                displaying,
+                engine.state == STATE_DISPLAYING_OPTIONS,
+            ),
+        )
+
+        if self.recorder:
+            self.recorder.record(now, x, y, engine.state, ACTION_CODES.get(engine.action, 0))
+
+    def step(self, s, now, x, y):
+        """Steps the engine and publishes the overlay frame. This is all that
+        runs on the worker thread, carry_out does the rest."""
+        engine = self.engine
+        displaying = engine.state == STATE_DISPLAYING_OPTIONS
+        event = engine.step(now, x, y)
+
+        if event == EVENT_SHOW:
+            self.publish_frame(s)
+        elif (
+            event == EVENT_ACTION
+            and engine.action not in actions_keeping_options
+            and engine.action != "x"
+        ):
+            # before the next sample, which must not see the jump as movement
+            ctrl.mouse_move(engine.x, engine.y)
+
+        if displaying:
+            if engine.state == STATE_DISPLAYING_OPTIONS:
+                self.publish_hit(s)
+            else:
+                self.frame = None
+
+        tuner = self.tuner
+        if tuner and tuner.observe(engine, event, now):
+            self.on_display_end(s, now)
+        return event
+
+    def carry_out(self, s, now, decision):
+        """Shows the options, clicks and scrolls as decided by a step"""
+        event, action, screen, x, y, was_displaying, displaying = decision
+        if event == EVENT_SHOW:
+            self.mcanvas = self.canvas_pool.acquire(screen.screen)
+        elif event == EVENT_WARM_UP:
+            self.canvas_pool.prepare(screen.screen)
+        elif event == EVENT_HIDE:
+            self.executor.cancel()
+        elif event == EVENT_ACTION:
+            self.perform_action(s, action, x, y)
+        elif event == EVENT_EXTERNAL_INPUT:
+            self.stop_actions()
+
+        if was_displaying:
+            # leaving a scroll option, or the options, lets scrolling run down
+            if self.scroller.holding and action not in scroll_directions:
+                self.scroller.release()
+
+            if displaying:
+                self.show_overlay(now)
+            else:
+                self.hide_options()
+
+    def show_overlay(self, now):
+        if not self.draw_registered:
+            resources.register(self.mcanvas, "draw", self.draw)
+            self.draw_registered = True
+            self.drawn_hit_index = None
+        self.refresh_overlay(now)
+
+    def on_external_input(self):
+        """A click or scroll was made outside the clickless mouse: hide the
+        options, and don't show them again until the cursor moves"""
+        self.stop_actions()
+        self.frame = None
+        self.engine.reset(self.input.x, self.input.y)
+
+    def stop_actions(self):
+        self.executor.cancel()
+        self.scroller.stop()
+        self.hide_options()
+
+    def perform_action(self, s, action, x, y):
+        """Carries out an action fired by the engine at the options centered
+        on (x, y)"""
+        direction = scroll_directions.get(action)
+        if direction:
+            self.scroller.hover(s, *direction)
+        elif action == "x":
+            # dismissing the options drops whatever is still pending
+            self.executor.cancel()
+        else:
+            self.executor.start(s, action, x, y)
+
+    def draw(self, canvas):
+        self.draw_options(canvas)
+
+    def draw_options(self, canvas):
+        # a single read: update may publish another frame meanwhile
+        frame = self.frame
+        if frame is None:
+            return
+
+        s = self.settings_cache.get()
+        radius = frame.radius
+        x = frame.x
+        y = frame.y
+        paint = canvas.paint
+        paint.color = "ff0000dd"
+        paint.style = paint.Style.FILL
+        # print("{},{}".format(x, y))
+        # print(canvas.rect)
+        stroke_width = frame.stroke_width
+        paint.stroke_width = stroke_width
+        canvas.draw_line(x - radius, y, x + radius, y)
+        canvas.draw_line(x, y - radius, x, y + radius)
+        draw_calls = 2
+
+        use_sprites = self.sprites.available(s)
+        hit_index = frame.hit_index
+        for index, (bx, by, action) in enumerate(frame.buttons):
+            if use_sprites:
+                image, half = self.sprites.get("button", action, radius, stroke_width)
+                canvas.draw_image(image, bx - half, by - half)
+                draw_calls += 1
+            else:
+                draw_button_face(canvas, bx, by, radius)
+                draw_calls += 2
+
+            # draw hit circle
+            if index == hit_index:
+                paint.color = "00FF00"
+                paint.style = paint.Style.FILL
+
+                _radius = min(
+                    math.ceil(
+                        radius
+                        * (time.perf_counter() - frame.hit_time)
+                        / frame.dwell_time
+                    ),
+                    radius,
+                )
+                canvas.draw_circle(bx, by, _radius)
+                draw_calls += 1
+            elif use_sprites:
+                # the label is part of the button sprite
+                continue
+
+            if use_sprites:
+                image, half = self.sprites.get("label", action, radius, stroke_width)
+                canvas.draw_image(image, bx - half, by - half)
+            else:
+                draw_button_label(canvas, bx, by, radius, action)
+            draw_calls += 1
+
+        self.draw_counter.add_frame(draw_calls)
+
+
+def tuning_path(s):
+    return s.auto_tune_path or os.path.join(actions.path.talon_home(), "clickless_mouse_tuning.json")
+
+
+# the clickless mouse, created by the first enable and dropped again once it
+# is disabled and not tracing, so loading this file costs little for anyone
+# who doesn't use it
+cm = None
+
+
+def controller():
+    global cm
+    if cm is None:
+        cm = clickless_mouse()
+        resources.register(settings, "", cm.on_settings_change)
+        resources.register(ui, "screen_change", cm.on_screen_change)
+    return cm
+
+
+def release():
+    """Drops the clickless mouse with its canvases, layouts and caches if
+    it is no longer in use"""
+    global cm
+    if cm is None or cm.enabled or cm.recorder:
+        return
+    resources.unregister(settings, "", cm.on_settings_change)
+    resources.unregister(ui, "screen_change", cm.on_screen_change)
+    cm = None
+
+
+def unload():
+    """Shuts the clickless mouse down before this copy of the file is replaced"""
+    if cm:
+        cm.enable(False)
+        cm.stop_trace()
+        release()
+
+
+# Talon runs this file again whenever it is saved, and the copy that was
+# running would keep its timers, canvases and callbacks. Its resource tracker
+# is kept outside the module, so the new copy can tear it down first
+running = sys.modules.setdefault("clickless_mouse_running", types.ModuleType("clickless_mouse_running"))
+if getattr(running, "resources", None):
+    running.resources.close_all()
+running.resources = resources
+resources.teardown = unload
+
+
+@mod.action_class
+class Actions:
+    def clickless_mouse_toggle():
+        """Toggles the click less mouse"""
+        controller().toggle()
+        release()
+
+    def clickless_mouse_enable():
+        """Toggles the click less mouse"""
+        controller().enable(True)
+
+    def clickless_mouse_disable():
+        """Toggles the click less mouse"""
+        if cm:
+            cm.enable(False)
+            release()
+    
+    def clickless_mouse_is_enabled():
+        """Returns whether or not the click less mouse is enabled"""
+        return cm is not None and cm.enabled
+
+    def clickless_mouse_stats() -> dict:
+        """Returns latency, state transition, polling and overlay statistics. Latencies
+        are only collected while user.clickless_mouse_instrumentation is enabled, and
+        everything is dropped when the click less mouse is disabled"""
+        return cm.stats() if cm else {}
+
+    def clickless_mouse_resources() -> dict:
+        """Returns the number of cron jobs, canvases, callbacks and threads the click
+        less mouse holds"""
+        return resources.held()
+
+    def clickless_mouse_stats_reset():
+        """Resets the statistics returned by user.clickless_mouse_stats"""
+        if cm:
+            cm.reset_stats()
+
+    def clickless_mouse_trace_start() -> str:
+        """Starts recording cursor samples to the trace file and returns its path"""
+        return controller().start_trace()
+
+    def clickless_mouse_trace_stop():
+        """Stops recording cursor samples"""
+        if cm:
+            cm.stop_trace()
+            release()
+
+    def clickless_mouse_tuning_show() -> dict:
+        """Shows and returns the dwell, idle and auto hide times learned by
+        user.clickless_mouse_auto_tune, with the history behind them"""
+        s = settings_snapshot()
+        tuner = cm.tuner if cm else None
+        summary = (tuner or dwell_tuner(tuning_path(s))).summary(s)
+        summary["enabled"] = s.auto_tune >= 1
+        dwell_times = " ".join(
+            "{}={:.2f}".format(action, values["dwell_time"])
+            for action, values in summary["actions"].items()
+            if values["learned"]
+        )
+        app.notify(
+            title="Clickless mouse tuning" + ("" if summary["enabled"] else " (disabled)"),
+            body="dwell {:.2f}s {}\nidle {:.2f}s, auto hide {:.2f}s\n{} displays, {} unused".format(
+                summary["dwell_time"],
+                dwell_times,
+                summary["idle_time_before_display"],
+                summary["auto_hide_time"],
+                summary["displays"],
+                summary["unused_displays"],
+            ),
+        )
+        return summary
+
+    def clickless_mouse_tuning_revert():
+        """Forgets the learned times, going back to the settings"""
+        if cm and cm.tuner:
+            cm.revert_tuning()
+        else:
+            dwell_tuner(tuning_path(settings_snapshot())).revert()
+        
+
+
+# uncomment the following for quick testing
+# def on_ready():
+#     controller().enable(True)
+
+
+# app.register("ready", on_ready)
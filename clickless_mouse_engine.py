@@ -0,0 +1,1462 @@
+# the clickless mouse state machine, without talon. clickless_mouse.py feeds
+# it the live cursor and carries out what it decides; anything else can feed it
+# recorded samples, e.g. to sweep settings over large traces offline:
+#
+#   events = run_batch(settings, ts, xs, ys)
+#
+# settings is an engine_settings, or anything with the same attributes. numpy
+# is optional, with it run_batch skips over the samples where nothing can
+# happen.
+import bisect
+import math
+
+# numpy, once load_numpy has imported it, or False when it isn't installed.
+# talon loads this module on startup but only batch runs need numpy, so it
+# isn't imported until then
+numpy = None
+
+# l = left click
+# lh = left hold
+# lr = left release. when left is down, all options become lr
+# ld = left double click
+# su = scroll up
+# sd = scroll down
+# sl = scroll left, when horizontal scrolling is enabled
+# sr = scroll right, when horizontal scrolling is enabled
+# r = right click
+# rh = right click old, DISABLED, doesn't work yet.
+# ka = keep alive for e.g. leaving the thing up for easy scroll down/up on webpages. no action
+# x = force an exit when auto hide is disabled
+horizontal_button_order_auto_hide_enabled = [
+    "l",
+    "ld",
+    "lt",
+    "lh",
+    "r",
+    "su",
+    "sd",
+    "ka",
+]
+horizontal_button_order_auto_hide_disabled = [
+    "l",
+    "ld",
+    "lt",
+    "lh",
+    "r",
+    "su",
+    "sd",
+    "x",
+]
+
+# the (x, y) direction of each scroll action
+scroll_directions = {"su": (0, -1), "sd": (0, 1), "sl": (-1, 0), "sr": (1, 0)}
+
+# actions that leave the options displayed
+actions_keeping_options = ("su", "sd", "sl", "sr", "ka")
+
+# every action an option can have
+option_actions = ("l", "ld", "lt", "lh", "lr", "r", "rh", "ka", "x") + tuple(scroll_directions)
+
+STATE_MOUSE_IDLE = 0
+STATE_MOUSE_MOVING = 1
+STATE_MOUSE_STOPPED = 2
+STATE_DISPLAYING_OPTIONS = 3
+STATE_NAMES = ("IDLE", "MOVING", "STOPPED", "DISPLAYING_OPTIONS")
+
+# the fraction of the idle time after which the display is prepared when
+# warm up is enabled. brief pauses while moving never get this far.
+WARM_UP_FRACTION = 0.5
+
+
+def load_numpy():
+    """Returns numpy, importing it on first use, or None without it"""
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as module
+        except ImportError:
+            module = False
+        numpy = module
+    return numpy or None
+
+
+class no_filter:
+    """Passes the cursor position through unchanged"""
+
+    __slots__ = ("x", "y")
+
+    def __init__(self, s):
+        self.x = self.y = 0
+
+    def reset(self):
+        pass
+
+    def add(self, x, y, t):
+        self.x = x
+        self.y = y
+
+
+# a smoothed position only ever approaches the cursor, it never reaches it.
+# within this distance (px) of the cursor it's taken as the cursor, so that a
+# cursor at rest counts as stopped even with no stop tolerance
+SNAP_DISTANCE = 0.25
+
+
+def snap(position, x, y):
+    if math.fabs(x - position.x) < SNAP_DISTANCE and math.fabs(y - position.y) < SNAP_DISTANCE:
+        position.x = x
+        position.y = y
+
+
+class exponential_filter:
+    """Exponential moving average of the cursor position"""
+
+    __slots__ = ("alpha", "x", "y", "primed")
+
+    def __init__(self, s):
+        self.alpha = min(max(s.filter_smoothing, 0.01), 1.0)
+        self.x = self.y = 0
+        self.primed = False
+
+    def reset(self):
+        self.primed = False
+
+    def add(self, x, y, t):
+        if not self.primed:
+            self.x = x
+            self.y = y
+            self.primed = True
+            return
+
+        alpha = self.alpha
+        self.x += alpha * (x - self.x)
+        self.y += alpha * (y - self.y)
+        snap(self, x, y)
+
+
+def smoothing_factor(elapsed, cutoff):
+    r = 2 * math.pi * cutoff * elapsed
+    return r / (r + 1)
+
+
+class one_euro_filter:
+    """One Euro filter (Casiez et al., 2012): an exponential filter whose
+    cutoff rises with the cursor speed, so tremor while still is smoothed
+    heavily while deliberate motion barely lags"""
+
+    __slots__ = ("min_cutoff", "beta", "x", "y", "dx", "dy", "last_t", "primed")
+
+    # the cutoff (Hz) used to smooth the speed itself
+    DERIVATIVE_CUTOFF = 1.0
+
+    def __init__(self, s):
+        self.min_cutoff = max(s.filter_min_cutoff, 0.001)
+        self.beta = max(s.filter_beta, 0.0)
+        self.x = self.y = 0
+        self.dx = self.dy = 0.0
+        self.last_t = 0
+        self.primed = False
+
+    def reset(self):
+        self.primed = False
+
+    def add(self, x, y, t):
+        if not self.primed:
+            self.x = x
+            self.y = y
+            self.dx = self.dy = 0.0
+            self.last_t = t
+            self.primed = True
+            return
+
+        elapsed = t - self.last_t
+        if elapsed <= 0:
+            return
+        self.last_t = t
+
+        alpha = smoothing_factor(elapsed, self.DERIVATIVE_CUTOFF)
+        self.dx += alpha * ((x - self.x) / elapsed - self.dx)
+        self.dy += alpha * ((y - self.y) / elapsed - self.dy)
+
+        cutoff = self.min_cutoff + self.beta * math.hypot(self.dx, self.dy)
+        alpha = smoothing_factor(elapsed, cutoff)
+        self.x += alpha * (x - self.x)
+        self.y += alpha * (y - self.y)
+        snap(self, x, y)
+
+
+position_filters = {
+    "none": no_filter,
+    "ema": exponential_filter,
+    "one_euro": one_euro_filter,
+}
+
+
+class motion_history:
+    """The last few cursor samples while moving, in a fixed ring, used to
+    recognize a motion that decelerated into its stop"""
+
+    __slots__ = ("ts", "xs", "ys", "count", "next")
+
+    CAPACITY = 8
+
+    # the slowest peak speed (px/s) that counts as a deliberate motion
+    MIN_PEAK_SPEED = 300
+
+    # the final speed, as a fraction of the peak, that counts as settling
+    SETTLED_FRACTION = 0.25
+
+    # how much the speed may rise again while decelerating, as a fraction
+    SPEED_SLACK = 0.1
+
+    def __init__(self):
+        self.ts = [0.0] * self.CAPACITY
+        self.xs = [0.0] * self.CAPACITY
+        self.ys = [0.0] * self.CAPACITY
+        self.count = 0
+        self.next = 0
+
+    def clear(self):
+        self.count = 0
+        self.next = 0
+
+    def add(self, t, x, y):
+        index = self.next
+        self.ts[index] = t
+        self.xs[index] = x
+        self.ys[index] = y
+        self.next = (index + 1) % self.CAPACITY
+        if self.count < self.CAPACITY:
+            self.count += 1
+
+    def settling(self):
+        """True when the speed peaked and then fell steadily to near zero.
+        Anything else, such as a short or erratic motion, is ambiguous."""
+        if self.count < 4:
+            return False
+
+        capacity = self.CAPACITY
+        first = (self.next - self.count) % capacity
+        peak = 0.0
+        last = 0.0
+        for step in range(1, self.count):
+            index = (first + step) % capacity
+            previous = (index - 1) % capacity
+            elapsed = self.ts[index] - self.ts[previous]
+            if elapsed <= 0:
+                continue
+            speed = math.hypot(self.xs[index] - self.xs[previous], self.ys[index] - self.ys[previous]) / elapsed
+            if speed >= peak:
+                peak = speed
+            elif speed > last * (1 + self.SPEED_SLACK) and last < peak:
+                # sped up again after slowing down
+                return False
+            last = speed
+
+        return peak >= self.MIN_PEAK_SPEED and last <= peak * self.SETTLED_FRACTION
+
+
+class flick_detector:
+    """Recognizes quick strokes toward a button while the options are
+    displayed. A stroke starts when the cursor moves faster than
+    clickless_mouse_flick_min_speed and ends when it slows down or heads back
+    to where it started; the farthest point it reached gives its direction.
+    Each sample only updates a few running values, there is no history."""
+
+    __slots__ = (
+        "last_t",
+        "last_x",
+        "last_y",
+        "active",
+        "start_t",
+        "start_x",
+        "start_y",
+        "peak_speed",
+        "far_x",
+        "far_y",
+        "far_distance",
+        "fired",
+    )
+
+    # a stroke ends once its speed falls to this fraction of the peak
+    END_FRACTION = 0.25
+
+    # or once it is back within this fraction of its farthest distance
+    RETURN_FRACTION = 0.5
+
+    def __init__(self):
+        self.reset(0, 0, 0)
+        self.fired = 0
+
+    def reset(self, t, x, y):
+        self.last_t = t
+        self.last_x = x
+        self.last_y = y
+        self.active = False
+
+    def add(self, s, t, x, y, buttons):
+        """Returns the index of the button flicked at by the stroke that ended
+        with this sample, or -1"""
+        elapsed = t - self.last_t
+        if elapsed <= 0:
+            return -1
+        speed = math.hypot(x - self.last_x, y - self.last_y) / elapsed
+
+        if not self.active:
+            if speed >= s.flick_min_speed:
+                self.active = True
+                self.start_t = self.last_t
+                self.start_x = self.last_x
+                self.start_y = self.last_y
+                self.peak_speed = speed
+                self.far_x, self.far_y = x, y
+                self.far_distance = math.hypot(x - self.start_x, y - self.start_y)
+            self.last_t, self.last_x, self.last_y = t, x, y
+            return -1
+
+        self.last_t, self.last_x, self.last_y = t, x, y
+        if t - self.start_t > s.flick_max_time:
+            # too slow for a flick, such as a deliberate move to a button
+            self.active = False
+            return -1
+
+        distance = math.hypot(x - self.start_x, y - self.start_y)
+        if distance > self.far_distance:
+            self.far_x, self.far_y = x, y
+            self.far_distance = distance
+        if speed > self.peak_speed:
+            self.peak_speed = speed
+        if speed > self.peak_speed * self.END_FRACTION and distance > self.far_distance * self.RETURN_FRACTION:
+            return -1
+
+        self.active = False
+        return self.target(s, buttons)
+
+    def target(self, s, buttons):
+        """The one button in the direction of the stroke, or -1 if it is too
+        short, or points at no button or more than one"""
+        reach = self.far_distance
+        if reach < s.flick_min_distance * buttons.radius:
+            return -1
+
+        vx = self.far_x - self.start_x
+        vy = self.far_y - self.start_y
+        min_cosine = math.cos(math.radians(s.flick_angle))
+        found = -1
+        for index in range(buttons.count):
+            bx = buttons.xs[index] - self.start_x
+            by = buttons.ys[index] - self.start_y
+            length = math.hypot(bx, by)
+            if length and (vx * bx + vy * by) / (reach * length) >= min_cosine:
+                if found >= 0:
+                    return -1
+                found = index
+
+        # scrolling and ka only make sense while hovered
+        if found >= 0 and buttons.actions[found] in actions_keeping_options:
+            return -1
+        return found
+
+
+def horizontal_button_order(s):
+    if s.auto_hide >= 1:
+        order = horizontal_button_order_auto_hide_enabled
+    else:
+        order = horizontal_button_order_auto_hide_disabled
+
+    if s.horizontal_scroll >= 1:
+        index = order.index("sd") + 1
+        order = order[:index] + ["sl", "sr"] + order[index:]
+    return order
+
+
+class layout_template:
+    """The buttons and the dismiss bounds of one placement case, as offsets
+    from the cursor"""
+
+    __slots__ = ("name", "offsets", "actions", "left_down_actions", "extents", "x_min", "x_max", "y_min", "y_max")
+
+    def __init__(self, name, offsets, actions, left_down_actions, x_min, x_max, y_min, y_max):
+        # where the buttons go, e.g. around or right_below
+        self.name = name
+        self.offsets = offsets
+        self.actions = actions
+        # when left is down, the options become lr
+        self.left_down_actions = left_down_actions
+        # the smallest and largest offsets, (dx_min, dx_max, dy_min, dy_max)
+        if offsets:
+            dxs = [dx for dx, _dy in offsets]
+            dys = [dy for _dx, dy in offsets]
+            self.extents = (min(dxs), max(dxs), min(dys), max(dys))
+        else:
+            self.extents = (0, 0, 0, 0)
+        self.x_min = x_min
+        self.x_max = x_max
+        self.y_min = y_min
+        self.y_max = y_max
+
+
+def compile_horizontal_layout(s, radius, draw_right, draw_above):
+    order = horizontal_button_order(s)
+    max_horizontal_distance = 2 * radius * (len(order) + 1.5)
+
+    if draw_above:
+        y_pos = -math.ceil(radius * s.vertical_offset)
+        y_min = -math.ceil(radius * 5)
+        y_max = math.ceil(radius * 2)
+    else:
+        y_pos = math.ceil(radius * s.vertical_offset)
+        y_min = -math.ceil(radius * 2)
+        y_max = math.ceil(radius * 5)
+
+    if draw_right:
+        x_min = -math.ceil(radius * 2.25)
+        x_max = max_horizontal_distance
+    else:
+        x_min = -max_horizontal_distance
+        x_max = math.ceil(radius * 2.25)
+
+    offsets = []
+    for index in range(len(order)):
+        x_pos = math.ceil(radius * (2.5 + s.horizontal_offset * (index - 1)))
+        offsets.append((x_pos if draw_right else -x_pos, y_pos))
+
+    name = ("right" if draw_right else "left") + ("_above" if draw_above else "_below")
+    return layout_template(
+        name, tuple(offsets), tuple(order), ("lr",) * len(order), x_min, x_max, y_min, y_max
+    )
+
+
+def compile_around_layout(s, radius):
+    near = math.ceil(radius * 2.25)
+    far = math.ceil(radius * 3.5)
+    bounds = math.ceil(radius * 5)
+    x_bounds = bounds
+    exit_action = "ka" if s.auto_hide >= 1 else "x"
+
+    offsets = (
+        (-near, -near),
+        (near, -near),
+        (0, -near),
+        (-far, 0),
+        (-near, near),
+        (0, near),
+        (near, near),
+        (far, 0),
+    )
+    actions = ("su", "sd", "lt", "lh", "ld", "l", "r", exit_action)
+    left_down_actions = ("lr",) * 7 + (exit_action,)
+
+    if s.horizontal_scroll >= 1:
+        # either end of the top row
+        offsets += ((-2 * near, -near), (2 * near, -near))
+        actions += ("sl", "sr")
+        left_down_actions += ("lr", "lr")
+        x_bounds = 2 * near + math.ceil(radius * 1.5)
+
+    return layout_template("around", offsets, actions, left_down_actions, -x_bounds, x_bounds, -bounds, bounds)
+
+
+class layout_table:
+    """Every placement case compiled for one set of settings and one screen
+    size and scale. select() picks the case for a cursor position with a few
+    comparisons against precomputed thresholds"""
+
+    def __init__(self, s, width, height, scale=1.0):
+        radius = s.radius * scale
+        self.radius = radius
+
+        # how close to an edge the cursor must be to count as being on it
+        corner_x = radius * 3.5
+        if s.horizontal_scroll >= 1:
+            # sl and sr reach past the rest, at either end of the top row
+            corner_x = 2 * math.ceil(radius * 2.25) + radius
+        edge_y = radius * 3.25
+        edge_y_ceil = math.ceil(radius * 3.25)
+        horizontal_span = math.ceil(radius * len(horizontal_button_order(s)) * 2)
+
+        self.left_edge = corner_x
+        self.right_edge = width - corner_x
+        self.top_edge = edge_y
+        self.bottom_edge = height - edge_y
+        self.bottom_edge_ceil = height - edge_y_ceil
+        self.right_space = width - horizontal_span
+
+        self.around = compile_around_layout(s, radius)
+        self.right_below = compile_horizontal_layout(s, radius, True, False)
+        self.left_below = compile_horizontal_layout(s, radius, False, False)
+        self.right_above = compile_horizontal_layout(s, radius, True, True)
+        self.left_above = compile_horizontal_layout(s, radius, False, True)
+        self.cases = (self.around, self.right_below, self.left_below, self.right_above, self.left_above)
+
+    def select(self, x_screen, y_screen):
+        top = y_screen <= self.top_edge
+        left = x_screen <= self.left_edge
+        right = x_screen >= self.right_edge
+
+        # corners
+        if top and left:
+            return self.right_below
+        elif top and right:
+            return self.left_below
+        elif left and y_screen >= self.bottom_edge:
+            return self.right_above
+        elif right and y_screen >= self.bottom_edge_ceil:
+            return self.left_above
+
+        # bottom edge, draw to the right when there is space for it
+        elif y_screen >= self.bottom_edge_ceil:
+            if x_screen <= self.right_space:
+                return self.right_above
+            return self.left_above
+
+        # left and right edges, not in a corner
+        elif left:
+            return self.right_below
+        elif right:
+            return self.left_below
+
+        # not along edges and not in a corner: draw all around the cursor
+        elif not top:
+            return self.around
+
+        # top edge, draw to the right when there is space for it
+        elif x_screen <= self.right_space:
+            return self.right_below
+        return self.left_below
+
+
+# the shapes a user-defined layout can take
+LAYOUT_SHAPES = ("radial", "horizontal", "grid")
+
+# how far (radii) the dismiss bounds of a user-defined layout reach past the
+# centers of its outermost buttons
+LAYOUT_BOUNDS_MARGIN = 1.5
+
+
+class layout_spec:
+    """A user-defined layout, parsed from clickless_mouse_layout: a shape and
+    the actions on it, each with a weight. The heavier an action, the closer
+    to the cursor it is placed"""
+
+    __slots__ = ("shape", "actions", "weights")
+
+    def __init__(self, shape, actions, weights):
+        self.shape = shape
+        self.actions = actions
+        self.weights = weights
+
+    def ranked(self, uses=None):
+        """The actions from the heaviest to the lightest, ties in the order
+        they were listed. uses adds how often each action was used to its
+        weight"""
+        weights = self.weights
+        if uses:
+            weights = [weight + uses.get(action, 0) for action, weight in zip(self.actions, weights)]
+        order = sorted(range(len(self.actions)), key=lambda index: -weights[index])
+        return tuple(self.actions[index] for index in order)
+
+
+def parse_layout(text):
+    """Parses 'radial l=10 r=3 lh su sd x' into a layout_spec, or returns None
+    for the built in layouts. Options without a weight weigh 1"""
+    items = text.replace(",", " ").split()
+    if not items:
+        return None
+    if items[0] not in LAYOUT_SHAPES:
+        print("clickless mouse: ignoring layout {}, it must start with {}".format(text, " or ".join(LAYOUT_SHAPES)))
+        return None
+
+    actions = []
+    weights = []
+    for item in items[1:]:
+        action, _, weight = item.partition("=")
+        try:
+            weight = float(weight) if weight else 1.0
+        except ValueError:
+            weight = -1.0
+        if action not in option_actions or action in actions or not (math.isfinite(weight) and weight >= 0):
+            print("clickless mouse: ignoring layout option {}".format(item))
+            continue
+        actions.append(action)
+        weights.append(weight)
+
+    if not actions:
+        print("clickless mouse: ignoring layout {}, it has no options".format(text))
+        return None
+    return layout_spec(items[0], tuple(actions), tuple(weights))
+
+
+def shape_positions(shape, rings, count, pitch):
+    """The positions a shape offers, out to the given number of rings, with
+    the key they are taken in. Positions are pitch apart on at least one
+    axis, from each other and from the cursor, so no two buttons overlap"""
+    if shape == "radial":
+        # ring k is k * sqrt(2) pitches out, with as many positions as keep
+        # them sqrt(2) pitches apart
+        for ring in range(1, rings + 1):
+            distance = ring * math.sqrt(2) * pitch
+            count_on_ring = int(math.pi / math.asin(1 / (2 * ring)) + 1e-9)
+            for index in range(count_on_ring):
+                angle = 2 * math.pi * index / count_on_ring
+                yield distance * math.sin(angle), -distance * math.cos(angle), (ring, index)
+        return
+
+    for row in range(-rings, rings + 1):
+        columns = count if shape == "horizontal" else rings
+        for column in range(-columns, columns + 1):
+            if row or column:
+                dx, dy = column * pitch, row * pitch
+                distance = math.hypot(dx, dy)
+                # clockwise from the top
+                angle = math.atan2(dx, -dy) % (2 * math.pi)
+                if shape == "horizontal":
+                    # the row of the cursor fills up before the next one
+                    yield dx, dy, (abs(row), distance, angle)
+                else:
+                    yield dx, dy, (round(distance, 9), angle)
+
+
+def layout_positions(shape, count, pitch, side_x, side_y):
+    """The count positions of a shape that are closest to the cursor, closest
+    first. side_x is 1 or -1 to keep every button at least a pitch right or
+    left of the cursor, to stay clear of a screen edge, and 0 otherwise;
+    side_y does the same below or above it."""
+
+    def fitting(rings):
+        positions = [
+            (key, dx, dy)
+            for dx, dy, key in shape_positions(shape, rings, count, pitch)
+            if (not side_x or dx * side_x >= pitch - 1e-6) and (not side_y or dy * side_y >= pitch - 1e-6)
+        ]
+        positions.sort()
+        return positions
+
+    rings = 1
+    while len(fitting(rings)) < count:
+        rings *= 2
+    # a grid position of an outer ring can be closer than one of an inner
+    # ring, but not closer than any of twice as many rings
+    return tuple((round(dx), round(dy)) for _key, dx, dy in fitting(rings * 2)[:count])
+
+
+class custom_layout_table:
+    """layout_table for a user-defined layout. Each of the nine placement
+    cases, the middle of the screen and every edge and corner, is compiled
+    once into positions ordered by distance from the cursor, and the ranked
+    actions are put on them in order: the heaviest action needs the
+    shortest move. assign() puts them in another order without compiling
+    again."""
+
+    # (name, side_x, side_y), see layout_positions
+    CASES = (
+        ("around", 0, 0),
+        ("right", 1, 0),
+        ("left", -1, 0),
+        ("below", 0, 1),
+        ("above", 0, -1),
+        ("right_below", 1, 1),
+        ("left_below", -1, 1),
+        ("right_above", 1, -1),
+        ("left_above", -1, -1),
+    )
+
+    def __init__(self, s, width, height, scale=1.0, order=None):
+        radius = s.radius * scale
+        self.radius = radius
+        spec = s.layout
+        # buttons closer than two radii would overlap
+        pitch = radius * max(2.0, s.layout_spacing)
+        self.positions = [
+            layout_positions(spec.shape, len(spec.actions), pitch, side_x, side_y)
+            for _name, side_x, side_y in self.CASES
+        ]
+
+        # how far the buttons reach past the cursor in each direction, in
+        # the cases allowed to place them there. closer to an edge than that,
+        # the buttons are kept to the other side
+        def reach(axis, direction):
+            return radius + max(
+                max(0, max(position[axis] * direction for position in positions))
+                for (_name, *sides), positions in zip(self.CASES, self.positions)
+                if sides[axis] != -direction
+            )
+
+        self.left_edge = reach(0, -1)
+        self.right_edge = width - reach(0, 1)
+        self.top_edge = reach(1, -1)
+        self.bottom_edge = height - reach(1, 1)
+        self.assign(order or spec.ranked())
+
+    def assign(self, order):
+        """Places the actions, heaviest first, on the positions of every case"""
+        # when left is down, the options become lr, but x and ka stay a way out
+        left_down_actions = tuple(action if action in ("x", "ka") else "lr" for action in order)
+        margin = self.radius * LAYOUT_BOUNDS_MARGIN
+        self.cases = tuple(
+            layout_template(
+                name,
+                positions,
+                order,
+                left_down_actions,
+                min(0, min(dx for dx, _dy in positions)) - margin,
+                max(0, max(dx for dx, _dy in positions)) + margin,
+                min(0, min(dy for _dx, dy in positions)) - margin,
+                max(0, max(dy for _dx, dy in positions)) + margin,
+            )
+            for (name, _side_x, _side_y), positions in zip(self.CASES, self.positions)
+        )
+        self.by_sides = {
+            (side_x, side_y): template
+            for (_name, side_x, side_y), template in zip(self.CASES, self.cases)
+        }
+
+    def select(self, x_screen, y_screen):
+        # on a screen too small for the layout both edges can be near, and
+        # then neither side has more room
+        side_x = int(x_screen < self.left_edge) - int(x_screen > self.right_edge)
+        side_y = int(y_screen < self.top_edge) - int(y_screen > self.bottom_edge)
+        return self.by_sides[side_x, side_y]
+
+
+class button_set:
+    """The displayed buttons as parallel arrays that are reused across
+    displays, so showing the options and hit testing don't allocate"""
+
+    __slots__ = (
+        "count",
+        "xs",
+        "ys",
+        "actions",
+        "last_hit_times",
+        "hit_index",
+        "radius",
+        "x_min",
+        "x_max",
+        "y_min",
+        "y_max",
+    )
+
+    def __init__(self, capacity=16):
+        self.count = 0
+        self.xs = [0] * capacity
+        self.ys = [0] * capacity
+        self.actions = [None] * capacity
+        self.last_hit_times = [None] * capacity
+        self.hit_index = -1
+        self.radius = 0
+
+        # the box around all buttons, anything outside it hits nothing
+        self.x_min = self.x_max = self.y_min = self.y_max = 0
+
+    def clear(self):
+        self.count = 0
+        self.hit_index = -1
+
+    def load(self, template, actions, x, y, radius):
+        """Places the buttons of a layout_template around (x, y)"""
+        count = len(template.offsets)
+        if count > len(self.xs):
+            grow = count - len(self.xs)
+            self.xs.extend([0] * grow)
+            self.ys.extend([0] * grow)
+            self.actions.extend([None] * grow)
+            self.last_hit_times.extend([None] * grow)
+
+        xs = self.xs
+        ys = self.ys
+        for index in range(count):
+            dx, dy = template.offsets[index]
+            xs[index] = x + dx
+            ys[index] = y + dy
+            self.actions[index] = actions[index]
+            self.last_hit_times[index] = None
+
+        self.count = count
+        self.hit_index = -1
+        self.radius = radius
+        if count:
+            dx_min, dx_max, dy_min, dy_max = template.extents
+            self.x_min = x + dx_min - radius
+            self.x_max = x + dx_max + radius
+            self.y_min = y + dy_min - radius
+            self.y_max = y + dy_max + radius
+
+    def hit_test(self, x, y):
+        """Returns the index of the button under (x, y), or -1"""
+        if x < self.x_min or x > self.x_max or y < self.y_min or y > self.y_max:
+            return -1
+
+        radius = self.radius
+        xs = self.xs
+        ys = self.ys
+        for index in range(self.count - 1, -1, -1):
+            bx = xs[index]
+            by = ys[index]
+            if bx - radius <= x <= bx + radius and by - radius <= y <= by + radius:
+                return index
+        return -1
+
+    def update_hit(self, index, now):
+        """Starts the dwell timer of the button at index, resetting the timer
+        of the button that was hit before"""
+        if index == self.hit_index:
+            return
+
+        if self.hit_index >= 0:
+            self.last_hit_times[self.hit_index] = None
+        if index >= 0:
+            self.last_hit_times[index] = now
+        self.hit_index = index
+
+
+# what engine.step did with a sample
+EVENT_NONE = 0
+# the options were placed, see engine.buttons and engine.screen
+EVENT_SHOW = 1
+# the options were dismissed without an action
+EVENT_HIDE = 2
+# the action in engine.action was fired
+EVENT_ACTION = 3
+# the screen and layout of the next display were resolved early
+EVENT_WARM_UP = 4
+EVENT_NAMES = ("", "show", "hide", "action", "warm_up")
+
+
+class engine_settings:
+    """Every clickless mouse setting with its default, named after the Talon
+    setting without the clickless_mouse_ prefix (position_filter is
+    clickless_mouse_filter). clickless_mouse.py reads them from Talon into a
+    subclass; anything else can make one directly:
+
+        engine_settings(dwell_time=0.3, idle_time_before_display=0.2)
+
+    layout is a layout_spec from parse_layout, and action_delays a dict from
+    parse_action_delays in clickless_mouse.py"""
+
+    __slots__ = (
+        "radius",
+        "dwell_time",
+        "idle_time_before_display",
+        "auto_hide",
+        "auto_hide_time",
+        "prevent_redisplay_for_minor_motions",
+        "release_delay",
+        "vertical_offset",
+        "horizontal_offset",
+        "stroke_width",
+        "scroll_distance",
+        "scroll_interval",
+        "scroll_acceleration",
+        "scroll_max_speed",
+        "scroll_deceleration",
+        "horizontal_scroll",
+        "layout",
+        "layout_spacing",
+        "layout_adapt",
+        "idle_poll_interval",
+        "active_poll_interval",
+        "burst_poll_interval",
+        "poll_burst_time",
+        "worker",
+        "warm_up",
+        "position_filter",
+        "filter_smoothing",
+        "filter_min_cutoff",
+        "filter_beta",
+        "stop_tolerance",
+        "predictive_display",
+        "predictive_idle_time",
+        "flick",
+        "flick_min_speed",
+        "flick_min_distance",
+        "flick_angle",
+        "flick_max_time",
+        "dismiss_on_external_input",
+        "sprite_cache",
+        "dpi_scaling",
+        "auto_tune",
+        "auto_tune_path",
+        "auto_tune_min_dwell_time",
+        "trace_path",
+        "trace_records",
+        "instrumentation",
+        "click_interval",
+        "action_delays",
+    )
+
+    radius: int
+    dwell_time: float
+    idle_time_before_display: float
+    auto_hide: int
+    auto_hide_time: float
+    prevent_redisplay_for_minor_motions: int
+    release_delay: int
+    vertical_offset: float
+    horizontal_offset: float
+    stroke_width: int
+    scroll_distance: int
+    scroll_interval: int
+    scroll_acceleration: float
+    scroll_max_speed: float
+    scroll_deceleration: float
+    horizontal_scroll: int
+    layout: layout_spec
+    layout_spacing: float
+    layout_adapt: int
+    idle_poll_interval: int
+    active_poll_interval: int
+    burst_poll_interval: int
+    poll_burst_time: float
+    worker: int
+    warm_up: int
+    position_filter: str
+    filter_smoothing: float
+    filter_min_cutoff: float
+    filter_beta: float
+    stop_tolerance: float
+    predictive_display: int
+    predictive_idle_time: float
+    flick: int
+    flick_min_speed: float
+    flick_min_distance: float
+    flick_angle: float
+    flick_max_time: float
+    dismiss_on_external_input: int
+    sprite_cache: int
+    dpi_scaling: int
+    auto_tune: int
+    auto_tune_path: str
+    auto_tune_min_dwell_time: float
+    trace_path: str
+    trace_records: int
+    instrumentation: int
+    click_interval: int
+    action_delays: dict
+
+    def __init__(self, **overrides):
+        self.radius = 20
+        self.dwell_time = 0.25
+        self.idle_time_before_display = 0.5
+        self.auto_hide = 1
+        self.auto_hide_time = 1.25
+        self.prevent_redisplay_for_minor_motions = 0
+        self.release_delay = 150
+        self.vertical_offset = 2.25
+        self.horizontal_offset = 2.25
+        self.stroke_width = 3
+        self.scroll_distance = 5
+        self.scroll_interval = 50
+        self.scroll_acceleration = 1.0
+        self.scroll_max_speed = 4.0
+        self.scroll_deceleration = 0.25
+        self.horizontal_scroll = 0
+        self.layout = None
+        self.layout_spacing = 2.25
+        self.layout_adapt = 0
+        self.idle_poll_interval = 33
+        self.active_poll_interval = 16
+        self.burst_poll_interval = 16
+        self.poll_burst_time = 0.2
+        self.worker = 0
+        self.warm_up = 1
+        self.position_filter = "none"
+        self.filter_smoothing = 0.5
+        self.filter_min_cutoff = 1.0
+        self.filter_beta = 0.01
+        self.stop_tolerance = 0.0
+        self.predictive_display = 0
+        self.predictive_idle_time = 0.15
+        self.flick = 0
+        self.flick_min_speed = 800.0
+        self.flick_min_distance = 1.0
+        self.flick_angle = 20.0
+        self.flick_max_time = 0.25
+        self.dismiss_on_external_input = 1
+        self.sprite_cache = 1
+        self.dpi_scaling = 1
+        self.auto_tune = 0
+        self.auto_tune_path = ""
+        self.auto_tune_min_dwell_time = 0.15
+        self.trace_path = ""
+        self.trace_records = 1048576
+        self.instrumentation = 0
+        self.click_interval = 20
+        self.action_delays = {}
+
+        for name, value in overrides.items():
+            setattr(self, name, value)
+
+class screen_area:
+    """The bounds and layout scale of a screen, all the engine needs of one"""
+
+    __slots__ = ("x", "y", "width", "height", "layout_scale")
+
+    def __init__(self, x, y, width, height, layout_scale=1.0):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.layout_scale = layout_scale
+
+
+class timings:
+    """Dwell, idle and auto hide times that take the place of the settings,
+    such as the ones learned by clickless_mouse_tuning. Dwell times are by
+    action; anything missing or None falls back to the setting."""
+
+    __slots__ = ("dwell_times", "idle_time", "auto_hide_time")
+
+    def __init__(self, dwell_times=None, idle_time=None, auto_hide_time=None):
+        self.dwell_times = dwell_times or {}
+        self.idle_time = idle_time
+        self.auto_hide_time = auto_hide_time
+
+    def dwell(self, s, action):
+        return self.dwell_times.get(action, s.dwell_time)
+
+    def idle(self, s):
+        return s.idle_time_before_display if self.idle_time is None else self.idle_time
+
+    def auto_hide(self, s):
+        return s.auto_hide_time if self.auto_hide_time is None else self.auto_hide_time
+
+
+class engine:
+    """Stop detection, layout, hit testing and dwell timing for one cursor.
+
+    settings() returns the current settings, screen_at(x, y) the screen_area
+    (or anything with its attributes) containing a point and is_left_down()
+    whether the left button is held. Time is passed to step(), or read from
+    clock() by update()."""
+
+    def __init__(self, settings, screen_at, is_left_down=None, clock=None):
+        self.settings = settings
+        self.screen_at = screen_at
+        self.is_left_down = is_left_down or (lambda: False)
+        self.clock = clock
+
+        self.buttons = button_set()
+        self.screen = None
+
+        # the screen resolved (and its layout prepared) ahead of the display
+        # while stopped
+        self.warm_screen = None
+        self.x = self.y = 0
+        self.dwell_x = self.dwell_y = 0
+        self.state = STATE_MOUSE_IDLE
+        self.last_time = 0
+
+        # the action fired by the last step, if any
+        self.action = None
+
+        # while before this time, the cursor should be sampled at the burst rate
+        self.burst_until = 0
+
+        # after moving the mouse to perform an action,
+        # avoid a state change in the first update.
+        # this prevents an unnecessary re-display
+        self.suppress_next_update = False
+
+        # the bounds around the displayed options. if you go outside, options
+        # are hidden
+        self.y_min = self.y_max = self.x_min = self.x_max = 0
+
+        # smooths the cursor position used to detect motion and stops, built
+        # for the settings in filter_settings
+        self.filter = None
+        self.filter_settings = None
+
+        # the motion leading up to a stop, and whether the stop was predicted
+        # from it
+        self.motion = motion_history()
+
+        # quick strokes toward a button, with clickless_mouse_flick
+        self.flicks = flick_detector()
+        self.predicted_stop = False
+        self.predicted_displays = 0
+        self.timed_displays = 0
+
+        # compiled layouts by screen size and scale, for the settings in
+        # layout_settings
+        self.layout_tables = {}
+        self.layout_settings = None
+
+        # how often each action was fired, for clickless_mouse_layout_adapt,
+        # and the hover scrolling or ka was last counted for
+        self.uses = {}
+        self.counted_hit = None
+
+        self.timings = timings()
+
+    def reset(self, x, y):
+        """Forgets the options and any motion, with the cursor at (x, y)"""
+        self.state = STATE_MOUSE_IDLE
+        self.x, self.y = x, y
+        self.buttons.clear()
+        self.warm_screen = None
+        self.suppress_next_update = False
+        if self.filter:
+            self.filter.reset()
+
+    def position_filter(self, s):
+        """Returns the position filter for the settings"""
+        if s is not self.filter_settings:
+            self.filter_settings = s
+            kind = position_filters.get(s.position_filter)
+            if kind is None:
+                print("clickless mouse: unknown filter {}".format(s.position_filter))
+                kind = no_filter
+            self.filter = kind(s)
+        return self.filter
+
+    def layout_for(self, s, screen):
+        """Returns the compiled layout_table for the settings and the size and
+        scale of a screen"""
+        if s is not self.layout_settings:
+            self.layout_tables = {}
+            self.layout_settings = s
+
+        key = (screen.width, screen.height, screen.layout_scale)
+        table = self.layout_tables.get(key)
+        if table is None:
+            if s.layout is not None:
+                table = custom_layout_table(
+                    s, screen.width, screen.height, screen.layout_scale, self.ranked_actions(s)
+                )
+            else:
+                table = layout_table(s, screen.width, screen.height, screen.layout_scale)
+            self.layout_tables[key] = table
+        return table
+
+    def ranked_actions(self, s):
+        return s.layout.ranked(self.uses if s.layout_adapt >= 1 else None)
+
+    def count_use(self, s, index):
+        """Counts a fired action toward the order of a user-defined layout,
+        and moves the buttons of the next display to match. Scrolling and ka
+        fire on every step while hovered, they count once per hover."""
+        if s.layout is None or s.layout_adapt < 1:
+            return
+
+        action = self.buttons.actions[index]
+        if action in actions_keeping_options:
+            hit_time = self.buttons.last_hit_times[index]
+            if hit_time == self.counted_hit:
+                return
+            self.counted_hit = hit_time
+        self.uses[action] = self.uses.get(action, 0) + 1
+
+        if s is self.layout_settings:
+            order = self.ranked_actions(s)
+            for table in self.layout_tables.values():
+                table.assign(order)
+
+    def clear_layouts(self):
+        self.layout_tables = {}
+        self.layout_settings = None
+
+    def warm_up(self, s):
+        """Resolves the screen and prepares its layout table"""
+        self.warm_screen = self.screen_at(self.x, self.y)
+        self.layout_for(s, self.warm_screen)
+
+    def place_options(self, s, x, y):
+        self.x, self.y = x, y
+        self.dwell_x, self.dwell_y = x, y
+
+        table = self.layout_for(s, self.screen)
+        template = table.select(x - self.screen.x, y - self.screen.y)
+        actions = template.left_down_actions if self.is_left_down() else template.actions
+        self.buttons.load(template, actions, x, y, table.radius)
+
+        self.x_min = x + template.x_min
+        self.x_max = x + template.x_max
+        self.y_min = y + template.y_min
+        self.y_max = y + template.y_max
+
+    def perform(self, action, x, y):
+        """Moves on from a fired action. Every action but scrolling and ka
+        hides the options; the cursor is moved back to where they were shown,
+        except for x."""
+        if action in actions_keeping_options:
+            return
+
+        if action == "x":
+            self.x, self.y = x, y
+        else:
+            self.suppress_next_update = True
+            # the cursor jumps back, don't smooth across the jump
+            self.filter.reset()
+        self.state = STATE_MOUSE_IDLE
+
+    def update(self, x, y):
+        return self.step(self.clock(), x, y)
+
+    def step(self, now, x, y):
+        """Advances the state machine with the cursor at (x, y) at time now
+        and returns one of the EVENT_ constants"""
+        s = self.settings()
+        self.action = None
+        event = EVENT_NONE
+
+        # motion and stops are detected on the filtered position. the options
+        # are placed and hit tested at the actual cursor
+        position = self.position_filter(s)
+        position.add(x, y, now)
+        fx = position.x
+        fy = position.y
+        tolerance = s.stop_tolerance
+
+        if self.state == STATE_MOUSE_IDLE:
+            if self.suppress_next_update:
+                self.suppress_next_update = False
+                self.x, self.y = fx, fy
+            elif math.fabs(self.x - fx) > max(1, tolerance) or math.fabs(self.y - fy) > max(1, tolerance):
+                self.x, self.y = fx, fy
+                self.state = STATE_MOUSE_MOVING
+                self.motion.clear()
+                self.motion.add(now, fx, fy)
+                if s.poll_burst_time > 0:
+                    self.burst_until = now + s.poll_burst_time
+
+        elif self.state == STATE_MOUSE_MOVING:
+            self.motion.add(now, fx, fy)
+            if math.fabs(fx - self.x) <= tolerance and math.fabs(fy - self.y) <= tolerance:
+                self.x, self.y = fx, fy
+                self.last_time = now
+                self.state = STATE_MOUSE_STOPPED
+                self.predicted_stop = s.predictive_display >= 1 and self.motion.settling()
+            else:
+                self.x, self.y = fx, fy
+
+        elif self.state == STATE_MOUSE_STOPPED:
+            idle_time = self.timings.idle(s)
+            if self.predicted_stop:
+                idle_time = min(s.predictive_idle_time, idle_time)
+
+            if math.fabs(fx - self.x) <= tolerance and math.fabs(fy - self.y) <= tolerance:
+                if now - self.last_time >= idle_time:
+                    if self.predicted_stop:
+                        self.predicted_displays += 1
+                    else:
+                        self.timed_displays += 1
+                    self.last_time = now
+                    if self.warm_screen:
+                        self.screen = self.warm_screen
+                        self.warm_screen = None
+                    else:
+                        self.screen = self.screen_at(self.x, self.y)
+
+                    self.place_options(s, x, y)
+                    self.flicks.reset(now, x, y)
+                    self.state = STATE_DISPLAYING_OPTIONS
+                    event = EVENT_SHOW
+                elif (
+                    s.warm_up >= 1
+                    and not self.warm_screen
+                    and now - self.last_time >= idle_time * WARM_UP_FRACTION
+                ):
+                    self.warm_up(s)
+                    event = EVENT_WARM_UP
+            else:
+                self.x, self.y = fx, fy
+                self.state = STATE_MOUSE_MOVING
+                self.motion.add(now, fx, fy)
+                self.buttons.clear()
+                self.warm_screen = None
+
+        elif self.state == STATE_DISPLAYING_OPTIONS:
+            buttons = self.buttons
+            item_hit = buttons.hit_test(x, y)
+            buttons.update_hit(item_hit, now)
+            if item_hit >= 0:
+                self.last_time = now
+            flicked = self.flicks.add(s, now, x, y, buttons) if s.flick >= 1 else -1
+
+            if (
+                s.auto_hide >= 1
+                and item_hit < 0
+                and now - self.last_time >= self.timings.auto_hide(s)
+                and (self.dwell_x == x or self.dwell_y == y)
+            ):
+                # update the position to prevent re-display for minor moves within the bounds
+                # this may not be preferred.
+                if s.prevent_redisplay_for_minor_motions >= 1:
+                    self.x, self.y = x, y
+
+                self.state = STATE_MOUSE_IDLE
+                event = EVENT_HIDE
+
+            elif item_hit >= 0 and now - buttons.last_hit_times[item_hit] >= self.timings.dwell(
+                s, buttons.actions[item_hit]
+            ):
+                self.action = buttons.actions[item_hit]
+                self.count_use(s, item_hit)
+                self.perform(self.action, x, y)
+                event = EVENT_ACTION
+
+            elif flicked >= 0 and self.x_min <= x <= self.x_max and self.y_min <= y <= self.y_max:
+                self.flicks.fired += 1
+                self.action = buttons.actions[flicked]
+                self.count_use(s, flicked)
+                self.perform(self.action, x, y)
+                event = EVENT_ACTION
+
+            elif x > self.x_max or x < self.x_min or y > self.y_max or y < self.y_min:
+                self.state = STATE_MOUSE_IDLE
+                event = EVENT_HIDE
+
+            if self.state == STATE_DISPLAYING_OPTIONS and (self.dwell_x != x or self.dwell_y != y):
+                self.last_time = now
+                self.dwell_x, self.dwell_y = x, y
+
+        return event
+
+    def run(self, ts, xs, ys):
+        """Steps through whole arrays of samples and returns the
+        (t, event name, action) of every display, dismissal and action"""
+        s = self.settings()
+        if s.position_filter == "none" and len(ts) > 0 and load_numpy():
+            return self._run_skipping(
+                numpy.asarray(ts, dtype=float),
+                numpy.asarray(xs, dtype=float),
+                numpy.asarray(ys, dtype=float),
+            )
+
+        events = []
+        step = self.step
+        for t, x, y in zip(list(ts), list(xs), list(ys)):
+            event = step(t, x, y)
+            if event and event != EVENT_WARM_UP:
+                events.append((t, EVENT_NAMES[event], self.action))
+        return events
+
+    def _run_skipping(self, ts, xs, ys):
+        """run() for unfiltered positions. Stretches where only a deviation
+        from a fixed position or a timeout can change anything are searched
+        with numpy instead of stepped through one sample at a time."""
+        s = self.settings()
+        count = len(ts)
+        tolerance = s.stop_tolerance
+        move_threshold = max(1, tolerance)
+
+        # the next sample from each index on that is within the tolerance of
+        # the one before it, and the next one that differs from it at all
+        dx = numpy.abs(numpy.diff(xs))
+        dy = numpy.abs(numpy.diff(ys))
+        still = numpy.zeros(count, dtype=bool)
+        still[1:] = (dx <= tolerance) & (dy <= tolerance)
+        moved = numpy.ones(count, dtype=bool)
+        moved[1:] = (dx != 0) | (dy != 0)
+        next_still = _next_true(still).tolist()
+        next_moved = _next_true(moved).tolist()
+        moved_list = moved.tolist()
+
+        events = []
+        step = self.step
+        motion = self.motion
+        buttons = self.buttons
+        tl = ts.tolist()
+        xl = xs.tolist()
+        yl = ys.tolist()
+        index = 0
+        while index < count:
+            state = self.state
+            if state == STATE_MOUSE_IDLE:
+                # auto hide can leave the cursor resting away from where the
+                # options were, and then the very next step starts moving.
+                # only the samples that moved are searched, so the one before
+                # must not have been outside already
+                if not self.suppress_next_update and (
+                    index == 0
+                    or math.fabs(xl[index - 1] - self.x) <= move_threshold
+                    and math.fabs(yl[index - 1] - self.y) <= move_threshold
+                ):
+                    index = _first_outside(xl, yl, next_moved, index, self.x, self.y, move_threshold)
+
+            elif state == STATE_MOUSE_MOVING:
+                stop = next_still[index]
+                if stop > index:
+                    # only the last few samples matter to the motion history
+                    for previous in range(max(index, stop - motion.CAPACITY), stop):
+                        motion.add(tl[previous], xl[previous], yl[previous])
+                    self.x, self.y = xl[stop - 1], yl[stop - 1]
+                    index = stop
+
+            elif state == STATE_MOUSE_STOPPED:
+                idle_time = self.timings.idle(s)
+                if self.predicted_stop:
+                    idle_time = min(s.predictive_idle_time, idle_time)
+                if s.warm_up >= 1 and not self.warm_screen:
+                    idle_time *= WARM_UP_FRACTION
+                # step from the sample before the deadline, in case rounding
+                # puts it one sample early
+                due = bisect.bisect_left(tl, self.last_time + idle_time) - 1
+                if due > index:
+                    index = max(
+                        index, min(due, _first_outside(xl, yl, next_moved, index, self.x, self.y, tolerance))
+                    )
+
+            elif not moved_list[index] and not (s.flick >= 1 and self.flicks.active):
+                # the cursor rests where the last step left it: only the dwell
+                # or auto hide timers can fire
+                hit = buttons.hit_index
+                if hit >= 0:
+                    deadline = buttons.last_hit_times[hit] + self.timings.dwell(s, buttons.actions[hit])
+                elif s.auto_hide >= 1:
+                    deadline = self.last_time + self.timings.auto_hide(s)
+                else:
+                    deadline = None
+
+                end = next_moved[index]
+                if deadline is not None:
+                    end = min(end, bisect.bisect_left(tl, deadline) - 1)
+                if end > index:
+                    if hit >= 0:
+                        # every sample over a button restarts the auto hide timer
+                        self.last_time = tl[end - 1]
+                    # and every sample is the flick detector's last one
+                    self.flicks.last_t = tl[end - 1]
+                    index = end
+
+            if index >= count:
+                break
+            t = tl[index]
+            event = step(t, xl[index], yl[index])
+            if event and event != EVENT_WARM_UP:
+                events.append((t, EVENT_NAMES[event], self.action))
+            index += 1
+        return events
+
+
+def _next_true(mask):
+    """For each index, the first index from there on where mask is true, or
+    the length of mask"""
+    count = len(mask)
+    indices = numpy.where(mask, numpy.arange(count), count)
+    return numpy.minimum.accumulate(indices[::-1])[::-1]
+
+
+def _first_outside(xl, yl, next_moved, start, x, y, distance):
+    """The index of the first sample from start on more than distance away
+    from (x, y) on either axis, or the number of samples. The sample before
+    start must be within the distance; samples equal to the one before them
+    are hopped over with next_moved."""
+    count = len(xl)
+    index = next_moved[start] if start < count else count
+    while index < count:
+        if math.fabs(xl[index] - x) > distance or math.fabs(yl[index] - y) > distance:
+            return index
+        index = next_moved[index + 1] if index + 1 < count else count
+    return count
+
+
+def run_batch(settings, ts, xs, ys, screen=None, is_left_down=None):
+    """Runs a fresh engine over arrays of samples (seconds, pixels) and
+    returns its events. The screen defaults to 1920x1080 at the origin."""
+    screen = screen or screen_area(0, 0, 1920, 1080)
+    batch_engine = engine(lambda: settings, lambda x, y: screen, is_left_down)
+    if len(xs):
+        batch_engine.reset(xs[0], ys[0])
+    return batch_engine.run(ts, xs, ys)
@@ -0,0 +1,106 @@
+# binary cursor traces for the clickless mouse. recording writes fixed size
+# records into a ring buffer in a memory mapped file, so a long session costs
+# a bounded amount of disk and nothing is allocated per sample. read_trace
+# streams the records back in order without loading the file.
+#
+# this module does not depend on talon, traces can be analysed anywhere:
+#   python clickless_mouse_trace.py clickless_mouse.trace > trace.csv
+import mmap
+import struct
+
+# magic, version, record size, capacity (records), records written in total
+HEADER = struct.Struct("<4sHHIQ")
+HEADER_SIZE = 32
+MAGIC = b"CMTR"
+VERSION = 1
+
+# time (s), x, y, state, action code fired during the sample (0 = none)
+RECORD = struct.Struct("<dffBB2x")
+
+# action codes stored in the trace
+ACTIONS = ("", "l", "ld", "lt", "lh", "lr", "r", "rh", "su", "sd", "ka", "x", "sl", "sr")
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+# records read at a time when streaming a trace back
+READ_CHUNK = 4096
+
+
+class trace_recorder:
+    """Appends samples to a memory mapped ring buffer of `capacity` records"""
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.written = 0
+
+        size = HEADER_SIZE + capacity * RECORD.size
+        with open(path, "wb") as f:
+            f.truncate(size)
+        self.file = open(path, "r+b")
+        self.buffer = mmap.mmap(self.file.fileno(), size)
+        self._write_header()
+
+    def _write_header(self):
+        HEADER.pack_into(
+            self.buffer, 0, MAGIC, VERSION, RECORD.size, self.capacity, self.written
+        )
+
+    def record(self, t, x, y, state, action_code):
+        offset = HEADER_SIZE + (self.written % self.capacity) * RECORD.size
+        RECORD.pack_into(self.buffer, offset, t, x, y, state, action_code)
+        self.written += 1
+        # only the record count changes, at the end of the header
+        struct.pack_into("<Q", self.buffer, HEADER.size - 8, self.written)
+
+    def close(self):
+        if self.buffer is None:
+            return
+        self.buffer.flush()
+        self.buffer.close()
+        self.file.close()
+        self.buffer = None
+        self.file = None
+
+
+def is_trace(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_trace(path):
+    """Yields (t, x, y, state, action) tuples, oldest first. action is the
+    name of the action fired during the sample, or an empty string."""
+    with open(path, "rb") as f:
+        magic, version, record_size, capacity, written = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("{} is not a clickless mouse trace".format(path))
+        if version != VERSION or record_size != RECORD.size:
+            raise ValueError("unsupported trace version {} in {}".format(version, path))
+
+        # once the ring has wrapped, the oldest record follows the newest
+        if written > capacity:
+            first = written % capacity
+            spans = ((first, capacity), (0, first))
+        else:
+            spans = ((0, written),)
+
+        for start, end in spans:
+            f.seek(HEADER_SIZE + start * record_size)
+            remaining = end - start
+            while remaining > 0:
+                count = min(remaining, READ_CHUNK)
+                chunk = f.read(count * record_size)
+                remaining -= count
+                for t, x, y, state, action_code in RECORD.iter_unpack(chunk):
+                    yield t, x, y, state, ACTIONS[action_code] if action_code < len(ACTIONS) else "?"
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2:
+        sys.exit("usage: python clickless_mouse_trace.py TRACE > trace.csv")
+
+    print("t,x,y,state,action")
+    for record in read_trace(sys.argv[1]):
+        print("{:.6f},{:g},{:g},{},{}".format(*record))
@@ -0,0 +1,233 @@
+# learns dwell, idle and auto hide times from how the options are used.
+#
+# every hover over a button is recorded with how long the cursor sat on it
+# and whether its action fired, and every display with whether any action
+# was taken and the longest the cursor rested off the buttons. the last few
+# hundred of each are kept in a small json file, so the learned times carry
+# over between sessions and adapt as the user does:
+#
+#   dwell time (per action): half again the longest hovers that didn't fire,
+#     so brief passes over a button stay safe while deliberate dwells get
+#     faster. buttons with too few clicks keep the setting.
+#   idle time before display: shorter while nearly every display is used,
+#     longer when many are left without an action.
+#   auto hide time: half again the longest rest before an action.
+#
+# every learned time stays within bounds around its setting. like the engine,
+# this module does not depend on talon.
+import json
+import os
+
+from .clickless_mouse_engine import (
+    EVENT_ACTION,
+    EVENT_SHOW,
+    STATE_DISPLAYING_OPTIONS,
+    timings,
+)
+
+VERSION = 1
+
+# records kept per action and of displays, older ones are dropped
+HISTORY = 200
+
+# clicks of an action, or displays, needed before its time is learned
+MIN_SAMPLES = 20
+
+# learned times are at least this far above what the history shows is needed
+MARGIN = 1.5
+
+# the share of the history that may fall outside the learned time
+QUANTILE = 0.95
+
+# learned times stay within these fractions of their settings; dwell times
+# may also fall to clickless_mouse_auto_tune_min_dwell_time
+MIN_FACTOR = 0.5
+MAX_FACTOR = 1.5
+
+# the share of displays left without an action the idle time aims for
+TARGET_UNUSED = 0.2
+
+
+def quantile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def bounded(value, low, high):
+    return min(max(value, low), high)
+
+
+class dwell_tuner:
+    """Records how the options are used and learns timings from it.
+    observe() is called after every engine step."""
+
+    def __init__(self, path):
+        self.path = path
+
+        # {action: [[seconds on the button, 1 if it fired else 0], ...]}
+        self.hovers = {}
+        # [[1 if an action was taken else 0, longest rest off the buttons], ...]
+        self.displays = []
+        self.dirty = False
+        self.load()
+
+        # the display and hover in progress
+        self.displaying = False
+        self.acted = False
+        self.longest_rest = 0.0
+        self.hover_index = -1
+        self.hover_action = None
+        self.hover_start = 0.0
+        self.hover_fired = False
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                store = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        # a store from another version, or a damaged one, is started over
+        if not isinstance(store, dict) or store.get("version") != VERSION:
+            return
+        try:
+            self.hovers = {
+                str(action): [[float(seconds), int(fired)] for seconds, fired in records][-HISTORY:]
+                for action, records in store["hovers"].items()
+            }
+            self.displays = [
+                [int(acted), float(rest)] for acted, rest in store["displays"]
+            ][-HISTORY:]
+        except (KeyError, TypeError, ValueError, AttributeError):
+            self.hovers = {}
+            self.displays = []
+
+    def save(self):
+        """Writes the history if it changed, replacing the file in one step"""
+        if not self.dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"version": VERSION, "hovers": self.hovers, "displays": self.displays}, f)
+        os.replace(temporary, self.path)
+        self.dirty = False
+
+    def revert(self):
+        """Forgets the history, so every time falls back to its setting"""
+        self.hovers = {}
+        self.displays = []
+        self.dirty = False
+        self.displaying = False
+        self.hover_index = -1
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def observe(self, engine, event, now):
+        """Records what the last engine step did. Returns True when a display
+        ended, which is when the learned timings may change."""
+        if event == EVENT_SHOW:
+            self.displaying = True
+            self.acted = False
+            self.longest_rest = 0.0
+            self.hover_index = -1
+            # a flick fires without a hover, don't carry it into this display
+            self.hover_action = None
+            self.hover_fired = False
+            return False
+        if not self.displaying:
+            return False
+
+        displaying = engine.state == STATE_DISPLAYING_OPTIONS
+        buttons = engine.buttons
+        if event == EVENT_ACTION and not self.hover_fired:
+            # scrolling fires on every step while hovered, count it once
+            self.hover_fired = True
+            if engine.action != "x" and not self.acted:
+                self.acted = True
+                self.record_display(1)
+
+        hit = buttons.hit_index if displaying else -1
+        if hit != self.hover_index:
+            if self.hover_index >= 0:
+                self.record_hover(self.hover_action, now - self.hover_start, self.hover_fired)
+            self.hover_index = hit
+            self.hover_action = buttons.actions[hit] if hit >= 0 else None
+            self.hover_start = now
+            self.hover_fired = False
+        elif hit < 0 and displaying:
+            self.longest_rest = max(self.longest_rest, now - engine.last_time)
+
+        if not displaying:
+            self.displaying = False
+            if not self.acted:
+                self.record_display(0)
+            return True
+        return False
+
+    def record_hover(self, action, seconds, fired):
+        records = self.hovers.setdefault(action, [])
+        records.append([seconds, 1 if fired else 0])
+        del records[:-HISTORY]
+        self.dirty = True
+
+    def record_display(self, acted):
+        self.displays.append([acted, self.longest_rest])
+        del self.displays[:-HISTORY]
+        self.dirty = True
+
+    def timings(self, s):
+        """The timings learned so far, for the settings in s"""
+        dwell_times = {}
+        min_dwell_time = min(s.auto_tune_min_dwell_time, s.dwell_time)
+        for action, records in self.hovers.items():
+            if sum(fired for _, fired in records) < MIN_SAMPLES:
+                continue
+            passes = [seconds for seconds, fired in records if not fired]
+            needed = quantile(passes, QUANTILE) * MARGIN if passes else 0.0
+            dwell_times[action] = bounded(needed, min_dwell_time, s.dwell_time * MAX_FACTOR)
+
+        idle_time = auto_hide_time = None
+        if len(self.displays) >= MIN_SAMPLES:
+            unused = 1 - sum(acted for acted, _ in self.displays) / len(self.displays)
+            # the setting at the target, scaled linearly to the bounds at no
+            # unused displays and at twice the target
+            factor = bounded(
+                1 + (unused - TARGET_UNUSED) / TARGET_UNUSED * (MAX_FACTOR - 1), MIN_FACTOR, MAX_FACTOR
+            )
+            idle_time = s.idle_time_before_display * factor
+
+            rests = [rest for acted, rest in self.displays if acted]
+            if len(rests) >= MIN_SAMPLES:
+                auto_hide_time = bounded(
+                    quantile(rests, QUANTILE) * MARGIN,
+                    s.auto_hide_time * MIN_FACTOR,
+                    s.auto_hide_time * MAX_FACTOR,
+                )
+
+        return timings(dwell_times, idle_time, auto_hide_time)
+
+    def summary(self, s):
+        """The learned and configured times, with the history behind them"""
+        learned = self.timings(s)
+        actions = {}
+        for action, records in sorted(self.hovers.items()):
+            actions[action] = {
+                "dwell_time": learned.dwell(s, action),
+                "learned": action in learned.dwell_times,
+                "clicks": sum(fired for _, fired in records),
+                "near_misses": sum(1 for _, fired in records if not fired),
+            }
+        return {
+            "path": self.path,
+            "dwell_time": s.dwell_time,
+            "actions": actions,
+            "idle_time_before_display": learned.idle(s),
+            "auto_hide_time": learned.auto_hide(s),
+            "displays": len(self.displays),
+            "unused_displays": sum(1 for acted, _ in self.displays if not acted),
+        }